@@ -0,0 +1,196 @@
+"""Adaptive tests: each next question is chosen from the learner's answers so far.
+
+The learner's ability is an Elo rating. Every question has a difficulty on
+the same scale: its level's base rating (levels of a topic in name order,
+DEFAULT_RATING for the first and LEVEL_STEP more for each following one)
+plus the question's optional "difficulty" offset, or the quiz's. After each
+answer the ability moves towards the outcome by K * (outcome - expected),
+with K shrinking as evidence accumulates.
+
+Choosing the next question is a bisect per level into a precomputed, sorted
+array of difficulties (a DifficultyIndex, persisted and revalidated like the
+random-exam index), then a short walk outwards past questions already asked:
+O(levels * log n) whatever the size of the banks. The final pick among the
+few nearest candidates uses an RNG seeded by (seed, step), so an attempt is
+fully reproducible from its seed and answers.
+"""
+import bisect
+import os
+import random
+from array import array
+
+from answer_key import compile_answer_key, with_quiz_scoring
+from question_bank import load_cached_quiz, load_quiz_uncached
+from question_sampling import SampleIndex, level_signature
+from quiz_catalog import get_catalog
+from quiz_compiler import QuizSchemaError
+
+DEFAULT_RATING = 1000.0
+LEVEL_STEP = 200.0
+CANDIDATES = 4  # nearest unused questions the seeded RNG picks from
+
+
+class LevelDifficulty:
+    """Questions of one level sorted by difficulty offset."""
+    __slots__ = ("files", "offsets", "file_ids", "question_nos")
+
+    def __init__(self, files):
+        self.files = files  # [(file name, mtime_ns, size)]
+        self.offsets = array("d")
+        self.file_ids = array("I")
+        self.question_nos = array("I")
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+def build_level_difficulty(base_path, topic, level):
+    level_path = os.path.join(base_path, topic, level)
+    entries = []
+    files = []
+    for file_id, name in enumerate(sorted(get_catalog(base_path).quizzes(topic, level))):
+        files.append(level_signature(level_path, name))
+        try:
+            quiz = load_quiz_uncached(os.path.join(level_path, name))  # keep the QuizCache for learners
+        except QuizSchemaError:
+            continue
+        quiz_offset = float(quiz.get("difficulty", 0.0))
+        for question_no, question in enumerate(quiz["questions"]):
+            if question.get("type") not in ("SCQ", "MCQ") or float(question.get("weight", 1.0)) <= 0:
+                continue
+            entries.append((float(question.get("difficulty", quiz_offset)), file_id, question_no))
+    entries.sort()
+    index = LevelDifficulty(files)
+    for offset, file_id, question_no in entries:
+        index.offsets.append(offset)
+        index.file_ids.append(file_id)
+        index.question_nos.append(question_no)
+    return index
+
+
+class DifficultyIndex(SampleIndex):
+    """Per-level LevelDifficulty structures, persisted under CACHE_DIR/difficulty_index."""
+    index_name = "difficulty_index"
+
+    def build(self, topic, level):
+        return build_level_difficulty(self.base_path, topic, level)
+
+
+def level_rating(levels, level):
+    """Base rating of a level: its position among the topic's levels in name order."""
+    return DEFAULT_RATING + LEVEL_STEP * sorted(levels).index(level)
+
+
+def expected_score(ability, difficulty):
+    return 1.0 / (1.0 + 10.0 ** ((difficulty - ability) / 400.0))
+
+
+class AdaptiveAttempt:
+    """One adaptive test: the questions asked, their outcomes and the ability estimate."""
+    __slots__ = ("attempt_id", "topic", "seed", "length", "ability", "items", "outcomes", "exhausted")
+
+    def __init__(self, attempt_id, topic, seed, length, ability):
+        self.attempt_id = attempt_id
+        self.topic = topic
+        self.seed = seed
+        self.length = length  # as planned; the answer store keeps this size throughout
+        self.ability = ability
+        self.items = []  # [(level, file name, question number, difficulty)]
+        self.outcomes = []  # 1 correct / 0 wrong, for the items answered so far
+        self.exhausted = False  # the topic ran out of questions before length
+
+    @property
+    def finished(self):
+        return self.exhausted or len(self.outcomes) >= self.length
+
+    def k_factor(self):
+        return 32.0 + 96.0 / (1.0 + len(self.outcomes))
+
+    def record(self, correct):
+        """Update the ability estimate with the outcome of the latest question."""
+        difficulty = self.items[len(self.outcomes)][3]
+        outcome = 1 if correct else 0
+        self.ability += self.k_factor() * (outcome - expected_score(self.ability, difficulty))
+        self.outcomes.append(outcome)
+
+
+class AdaptiveEngine:
+    """Selects questions for AdaptiveAttempts from a DifficultyIndex."""
+
+    def __init__(self, base_path="Quiz", index=None):
+        self.base_path = base_path
+        self.index = index or DifficultyIndex(base_path)
+
+    def start(self, attempt_id, topic, level, seed, length):
+        """New attempt with the ability set to the chosen level's rating, and its first question."""
+        levels = get_catalog(self.base_path).levels(topic)
+        attempt = AdaptiveAttempt(attempt_id, topic, seed, length, level_rating(levels, level))
+        self.select_next(attempt)
+        return attempt
+
+    def select_next(self, attempt):
+        """Append the unused question closest to the current ability; False when none is left."""
+        used = {item[:3] for item in attempt.items}
+        levels = get_catalog(self.base_path).levels(attempt.topic)
+        candidates = []
+        for level in sorted(levels):
+            index = self.index.level(attempt.topic, level)
+            base = level_rating(levels, level)
+            position = bisect.bisect_left(index.offsets, attempt.ability - base)
+            # Walk outwards from the insertion point, collecting the nearest unused questions
+            lo, hi = position - 1, position
+            found = 0
+            while found < CANDIDATES and (lo >= 0 or hi < len(index)):
+                if hi >= len(index) or (lo >= 0 and attempt.ability - base - index.offsets[lo]
+                                        <= index.offsets[hi] - (attempt.ability - base)):
+                    i, lo = lo, lo - 1
+                else:
+                    i, hi = hi, hi + 1
+                name = index.files[index.file_ids[i]][0]
+                ref = (level, name, index.question_nos[i])
+                if ref in used:
+                    continue
+                difficulty = base + index.offsets[i]
+                candidates.append((abs(difficulty - attempt.ability), ref, difficulty))
+                found += 1
+        if not candidates:
+            return False
+        candidates.sort()
+        rng = random.Random(attempt.seed * 1000003 + len(attempt.items))
+        _, ref, difficulty = rng.choice(candidates[:CANDIDATES])
+        attempt.items.append(ref + (difficulty,))
+        return True
+
+    def question(self, attempt, position):
+        level, name, question_no, _ = attempt.items[position]
+        quiz = load_cached_quiz(os.path.join(self.base_path, attempt.topic, level, name))
+        return with_quiz_scoring(quiz["questions"][question_no], quiz)
+
+    def quiz(self, attempt):
+        """The questions asked so far as a one-question-at-a-time quiz dict."""
+        return {
+            "title": f"{attempt.topic}: adaptive test",
+            "question_display": "1",
+            "questions": [self.question(attempt, i) for i in range(len(attempt.items))],
+        }
+
+    def answer(self, attempt, response):
+        """Score the latest question's encoded response, update the ability and pick the next question."""
+        question = self.question(attempt, len(attempt.outcomes))
+        correct = compile_answer_key({"questions": [question]}).questions[0].correct
+        attempt.record(response == correct)
+        if not attempt.finished and not self.select_next(attempt):
+            attempt.exhausted = True
+        return attempt
+
+
+_engines = {}
+
+
+def get_adaptive_engine(base_path="Quiz"):
+    """Return the process-wide AdaptiveEngine for base_path."""
+    key = os.path.abspath(base_path)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines.setdefault(key, AdaptiveEngine(base_path))
+    return engine
@@ -0,0 +1,246 @@
+"""Precompiled answer keys.
+
+A quiz is compiled once into an AnswerKey that knows, for every question, the
+widget keys it is rendered under, an option-text -> index dict and the correct
+answer in encoded form. Scoring is then a single pass over the questions
+instead of a scan and string-parse of every key in the session.
+
+Encoded responses, shared by the interactive and offline scorers:
+  SCQ -> 1-based option index, 0 when unanswered
+  MCQ -> bitmask with bit j set when option j+1 is selected
+
+Scoring rules come from the quiz JSON, per question or as quiz-wide defaults
+under "scoring" (see SCORING_FIELDS). They are compiled into integer point
+tables in units of 1/scale point, so a response is scored with integer
+arithmetic only: a table lookup for SCQ, a dot product of the option bitmask
+with per-option points for partial-credit MCQ, and a comparison for
+all-or-nothing MCQ.
+"""
+import math
+
+# Question fields (or quiz-level "scoring" defaults) that control scoring:
+#   points          score for a fully correct answer (default 1)
+#   penalty         deducted for a wrong answer; per wrong option with partial credit (default 0)
+#   partial_credit  MCQ: points / len(answers) per correct option selected (default false)
+#   min_points      lowest score a question can contribute (default: no limit)
+SCORING_FIELDS = ("points", "penalty", "partial_credit", "min_points")
+POINT_SCALE = 100  # points and penalties are exact to 1/100 point
+
+SCQ = "SCQ"
+MCQ = "MCQ"
+
+
+def scq_widget_key(question_no):
+    return f"question_{question_no}"
+
+
+def mcq_widget_key(question_no, option_index):
+    return f"question_{question_no}_option_{option_index}"
+
+
+def answers_to_mask(answers):
+    """Encode 1-based option numbers as a bitmask."""
+    mask = 0
+    for answer in answers:
+        mask |= 1 << (answer - 1)
+    return mask
+
+
+def mask_to_answers(mask):
+    """Decode a bitmask back into sorted 1-based option numbers."""
+    answers = []
+    option = 1
+    while mask:
+        if mask & 1:
+            answers.append(option)
+        mask >>= 1
+        option += 1
+    return answers
+
+
+class QuestionKey:
+    """Compiled answer and scoring rule for one question.
+
+    Points are integers in units of 1/AnswerKey.scale. option_points is the
+    table for SCQ (indexed by the encoded response, entry 0 for unanswered)
+    and per option for partial-credit MCQ; it is None for all-or-nothing MCQ,
+    which scores full_points for the exact set and -penalty for any other
+    non-empty one.
+    """
+    __slots__ = ("kind", "widget_key", "option_keys", "option_index", "n_options", "correct",
+                 "full_points", "penalty", "option_points", "min_points")
+
+    def __init__(self, kind, widget_key, option_keys, option_index, n_options, correct,
+                 full_points=0, penalty=0, option_points=None, min_points=None):
+        self.kind = kind
+        self.widget_key = widget_key
+        self.option_keys = option_keys
+        self.option_index = option_index
+        self.n_options = n_options
+        self.correct = correct
+        self.full_points = full_points
+        self.penalty = penalty
+        self.option_points = option_points
+        self.min_points = min_points
+
+    def points(self, response):
+        """Points for one encoded response, in units of 1/AnswerKey.scale."""
+        if self.kind is None:
+            return 0
+        table = self.option_points
+        if table is None:
+            if response == self.correct:
+                value = self.full_points
+            else:
+                value = -self.penalty if response else 0
+        elif self.kind == SCQ:
+            value = table[response] if 0 <= response < len(table) else 0
+        else:
+            # Dot product of the selection bitmask with the per-option points
+            value = 0
+            while response:
+                low = response & -response
+                bit = low.bit_length() - 1
+                if bit < len(table):
+                    value += table[bit]
+                response ^= low
+        if self.min_points is not None and value < self.min_points:
+            return self.min_points
+        return value
+
+    def encode(self, state):
+        """Read this question's widgets from state and return the encoded response."""
+        if self.kind == MCQ:
+            mask = 0
+            for bit, key in enumerate(self.option_keys):
+                if state.get(key):
+                    mask |= 1 << bit
+            return mask
+        value = state.get(self.widget_key)
+        if isinstance(value, str):  # radio widgets store the option text
+            return self.option_index.get(value, 0)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return 0
+
+
+class AnswerKey:
+    """Compiled answer key for a whole quiz."""
+    __slots__ = ("questions", "scale", "exact_count")
+
+    def __init__(self, questions, scale=POINT_SCALE, exact_count=False):
+        self.questions = questions
+        self.scale = scale
+        # One point per exactly correct answer and nothing else: scoring is a count
+        self.exact_count = exact_count
+
+    @property
+    def total(self):
+        """Number of questions (the width of an encoded submission)."""
+        return len(self.questions)
+
+    @property
+    def max_score(self):
+        """Score of a fully correct attempt."""
+        return from_units(sum(q.full_points for q in self.questions), self.scale)
+
+    def encode_session(self, state):
+        """Return the encoded response for every question, read from widget state."""
+        return [question.encode(state) for question in self.questions]
+
+    def score_units(self, responses):
+        """Total points in units of 1/scale."""
+        if self.exact_count:
+            count = 0
+            for question, response in zip(self.questions, responses):
+                if question.kind is not None and response == question.correct:
+                    count += 1
+            return count * self.scale
+        return sum(question.points(response) for question, response in zip(self.questions, responses))
+
+    def score(self, responses):
+        """Score an attempt's encoded responses under the quiz's scoring rules."""
+        return from_units(self.score_units(responses), self.scale)
+
+    def score_session(self, state):
+        return self.score(self.encode_session(state))
+
+
+def from_units(units, scale):
+    """Points as an int when whole, else a float rounded to 1/100 point."""
+    whole, rest = divmod(units, scale)
+    return whole if not rest else to_cents(units, scale) / 100
+
+
+def to_cents(units, scale):
+    """Units rounded to whole 1/100 points, halves up, in exact integer arithmetic.
+
+    Works on NumPy arrays too, so batch grading rounds exactly like the app.
+    """
+    return (units * 200 + scale) // (2 * scale)
+
+
+def _to_units(value, scale):
+    return round(value * POINT_SCALE) * (scale // POINT_SCALE)
+
+
+def scoring_rule(question, defaults=None):
+    """The question's scoring fields, falling back to the quiz-level defaults."""
+    rule = {"points": 1, "penalty": 0, "partial_credit": False, "min_points": None}
+    for source in (defaults or {}), question:
+        for field in SCORING_FIELDS:
+            if field in source:
+                rule[field] = source[field]
+    return rule
+
+
+def with_quiz_scoring(question, quiz):
+    """The question with its quiz's "scoring" defaults filled in, to score it outside that quiz."""
+    defaults = quiz.get("scoring") or {}
+    inherited = {field: defaults[field] for field in SCORING_FIELDS if field in defaults and field not in question}
+    return {**question, **inherited} if inherited else question
+
+
+def compile_answer_key(quiz):
+    """Build the AnswerKey for a quiz dict, with its scoring rules as integer point tables."""
+    defaults = quiz.get("scoring")
+    rules = [scoring_rule(question, defaults) for question in quiz["questions"]]
+    # Partial credit splits a question's points between its correct options.
+    # Points are whole multiples of 1/POINT_SCALE, so with POINT_SCALE times the
+    # lcm of those counts as the unit every share is a whole number of units.
+    scale = POINT_SCALE * math.lcm(1, *(
+        len(question["answers"]) for question, rule in zip(quiz["questions"], rules)
+        if rule["partial_credit"] and question.get("type") == MCQ))
+    exact_count = True
+    questions = []
+    for i, (question, rule) in enumerate(zip(quiz["questions"], rules), start=1):
+        kind = question.get("type")
+        options = question.get("options", ())
+        option_index = {}
+        for j, option in enumerate(options, start=1):
+            # Duplicate option texts resolve to the first occurrence, like list.index
+            option_index.setdefault(option, j)
+        full = _to_units(rule["points"], scale)
+        penalty = _to_units(rule["penalty"], scale)
+        floor = None if rule["min_points"] is None else _to_units(rule["min_points"], scale)
+        table = None
+        if kind == MCQ:
+            option_keys = tuple(mcq_widget_key(i, j) for j in range(len(options)))
+            correct = answers_to_mask(question["answers"])
+            if rule["partial_credit"]:
+                share = full // len(question["answers"])
+                table = tuple(share if correct >> j & 1 else -penalty for j in range(len(options)))
+        elif kind == SCQ:
+            option_keys = ()
+            correct = question["answer"]
+            table = (0,) + tuple(full if j == correct else -penalty for j in range(1, len(options) + 1))
+        else:
+            kind, option_keys, correct = None, (), None
+            full = penalty = 0
+        if kind is not None and (full != scale or penalty or floor is not None or rule["partial_credit"]):
+            exact_count = False
+        questions.append(QuestionKey(
+            kind, scq_widget_key(i), option_keys, option_index, len(options), correct,
+            full, penalty, table, floor,
+        ))
+    return AnswerKey(tuple(questions), scale, exact_count)
@@ -0,0 +1,91 @@
+"""Compact per-session answer storage.
+
+One AnswerStore replaces the session_state key that every radio and checkbox
+used to own. Answers are kept in a single array of unsigned 64-bit ints, one
+slot per question, using the encoding from answer_key: the 1-based option for
+an SCQ (0 when unanswered) and the option bitmask for an MCQ. A 200-question
+quiz therefore costs 1.6 KB per session and serializes as one bytes object.
+
+Every change also sets the question's dirty bit, so the autosaver can save
+just the answers that changed since its last look (take_changes).
+"""
+from array import array
+
+
+class AnswerStore:
+    """Fixed-size array of encoded answers for one quiz attempt."""
+    __slots__ = ("quiz_id", "_values", "_dirty")
+
+    def __init__(self, quiz_id, total_questions):
+        self.quiz_id = quiz_id
+        self._values = array("Q", bytes(8 * total_questions))
+        self._dirty = 0  # bit i set when answer i changed since the last take_changes()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return (AnswerStore.from_bytes, (self.quiz_id, self.to_bytes()))
+
+    def get(self, question_index):
+        """Return the encoded answer for a question."""
+        return self._values[question_index]
+
+    def choice(self, question_index):
+        """Return the selected 1-based SCQ option, or 0 when unanswered."""
+        return self._values[question_index]
+
+    def set_choice(self, question_index, option_no):
+        if self._values[question_index] != option_no:
+            self._values[question_index] = option_no
+            self._dirty |= 1 << question_index
+
+    def is_selected(self, question_index, option_index):
+        """Return whether the 0-based MCQ option is selected."""
+        return bool(self._values[question_index] >> option_index & 1)
+
+    def set_selected(self, question_index, option_index, selected):
+        value = self._values[question_index]
+        if selected:
+            value |= 1 << option_index
+        else:
+            value &= ~(1 << option_index) & 0xFFFFFFFFFFFFFFFF
+        self.set_choice(question_index, value)
+
+    def responses(self):
+        """Return the encoded answers in question order, ready for AnswerKey.score."""
+        return self._values
+
+    def head(self, count):
+        """A copy holding only the first count answers (an adaptive test cut short)."""
+        return AnswerStore.from_bytes(self.quiz_id, self._values[:count].tobytes())
+
+    def clear(self):
+        for i in range(len(self._values)):
+            self.set_choice(i, 0)
+
+    def take_changes(self):
+        """Return [(question index, encoded answer)] changed since the last call, and reset the dirty bits."""
+        dirty, self._dirty = self._dirty, 0
+        changes = []
+        while dirty:
+            low = dirty & -dirty
+            i = low.bit_length() - 1
+            changes.append((i, self._values[i]))
+            dirty ^= low
+        return changes
+
+    def update(self, answers):
+        """Apply saved {question index: encoded answer} without marking them dirty."""
+        for i, value in answers.items():
+            if 0 <= i < len(self._values):
+                self._values[i] = value
+
+    def to_bytes(self):
+        return self._values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, quiz_id, data):
+        store = cls(quiz_id, 0)
+        store._values.frombytes(data)
+        return store
@@ -0,0 +1,133 @@
+"""Content-addressed cache for question images and code snippets.
+
+Questions reference assets by a path relative to the Quiz tree (keep them
+next to the quizzes, e.g. Quiz/<Topic>/<Level>/assets/, where the catalog
+does not list them):
+
+    {"type": "SCQ", "question": "...", "image": "Python/Basics/assets/loop.png",
+     "code_file": "Python/Basics/assets/loop.py", "language": "python", ...}
+
+Each path is remembered with the (mtime, size) it was read at and the sha256
+of its content, like an ETag: while the file is unchanged a lookup is a stat
+and two dict hits, and a changed file is re-read but only stored again if its
+content is new. Content is stored once per digest, however many paths share
+it, and evicted least recently used once the byte budget is exceeded.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+
+class AssetError(ValueError):
+    """An asset reference is missing or points outside the Quiz tree."""
+
+
+class Asset:
+    __slots__ = ("digest", "data", "mime_type", "_text")
+
+    def __init__(self, digest, data, mime_type):
+        self.digest = digest
+        self.data = data
+        self.mime_type = mime_type
+        self._text = None
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+    def text(self):
+        """The content decoded as UTF-8 (code snippets), decoded once."""
+        if self._text is None:
+            self._text = self.data.decode("utf-8", errors="replace")
+        return self._text
+
+
+def resolve_asset(base_path, relative_path):
+    """Absolute path of an asset, refusing anything that escapes base_path."""
+    if os.path.isabs(relative_path):
+        raise AssetError(f"{relative_path}: asset paths must be relative to the Quiz tree")
+    root = os.path.realpath(base_path)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root:
+        raise AssetError(f"{relative_path}: asset path leaves the Quiz tree")
+    return path
+
+
+class AssetCache:
+    """Thread-safe LRU of asset content keyed by sha256, with per-path ETags."""
+
+    def __init__(self, base_path="Quiz", max_bytes=32 * 1024 * 1024):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._etags = {}  # resolved path -> ((mtime_ns, size), digest)
+        self._blobs = OrderedDict()  # digest -> Asset, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, relative_path):
+        """Return the Asset for a path relative to the Quiz tree."""
+        path = resolve_asset(self.base_path, relative_path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise AssetError(f"{relative_path}: asset not found") from None
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            known = self._etags.get(path)
+            if known is not None and known[0] == signature:
+                asset = self._blobs.get(known[1])
+                if asset is not None:
+                    self._blobs.move_to_end(known[1])
+                    self.hits += 1
+                    return asset
+            self.misses += 1
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._etags[path] = (signature, digest)
+            asset = self._blobs.get(digest)
+            if asset is None:
+                asset = Asset(digest, data, mimetypes.guess_type(path)[0] or "application/octet-stream")
+                self._blobs[digest] = asset
+                self.total_bytes += len(data)
+                self._evict()
+            else:
+                self._blobs.move_to_end(digest)
+            return asset
+
+    def _evict(self):
+        # Always keep the newest asset, even if it alone exceeds the budget
+        while len(self._blobs) > 1 and self.total_bytes > self.max_bytes:
+            _, evicted = self._blobs.popitem(last=False)
+            self.total_bytes -= len(evicted.data)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "assets": len(self._blobs),
+                "bytes": self.total_bytes,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_asset_cache(base_path="Quiz"):
+    """Return the process-wide AssetCache for base_path."""
+    key = os.path.abspath(base_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = AssetCache(base_path)
+        return cache
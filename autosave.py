@@ -0,0 +1,315 @@
+"""Autosave of in-progress answers, so a dropped connection loses nothing.
+
+At the end of each rerun the session's AnswerStore hands over only the
+answers whose dirty bit is set, together with the current question index.
+Nothing is written in the script thread: changes are merged into one pending
+record per (session, quiz), where a later answer to the same question simply
+replaces the earlier one. A background thread writes a record once its
+session has been quiet for `debounce` seconds, or at the latest `max_delay`
+seconds after its first unsaved change, and writes all records due at that
+moment in one transaction. A learner clicking through a checkbox list thus
+costs one small write per pause rather than one per click.
+
+restore() merges what is stored with what is still pending in this process,
+so a reconnect sees the latest answers whichever side they are on.
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from quiz_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUTOSAVE_DB_PATH = os.environ.get(
+    "QUIZMASTER_AUTOSAVE_DB", os.path.join(CACHE_DIR, "autosave.sqlite3"))
+
+_SIGN = 1 << 63  # encoded answers are uint64; SQLite integers are signed
+
+
+def _to_signed(value):
+    return value - (1 << 64) if value >= _SIGN else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class PendingSave:
+    """Unsaved changes of one session's attempt at one quiz."""
+    __slots__ = ("session_id", "quiz_id", "n_questions", "answers", "position", "first_at", "last_at")
+
+    def __init__(self, session_id, quiz_id, n_questions, position, now):
+        self.session_id = session_id
+        self.quiz_id = quiz_id
+        self.n_questions = n_questions
+        self.answers = {}  # question index -> encoded answer, latest wins
+        self.position = position  # current_question_index
+        self.first_at = now
+        self.last_at = now
+
+    def merge(self, newer):
+        """Fold a newer PendingSave for the same attempt into this one."""
+        self.answers.update(newer.answers)
+        self.position = newer.position
+        self.n_questions = newer.n_questions
+        self.last_at = max(self.last_at, newer.last_at)
+
+
+class AutosaveBackend:
+    """Storage interface used by the Autosaver."""
+
+    def write_batch(self, saves):
+        """Persist a list of PendingSaves atomically."""
+        raise NotImplementedError
+
+    def load(self, session_id, quiz_id):
+        """Return (n_questions, position, {question: answer}) for an attempt, or None."""
+        raise NotImplementedError
+
+    def purge(self, before):
+        """Forget attempts not saved since the epoch time before."""
+
+    def close(self):
+        pass
+
+
+class SQLiteAutosaveBackend(AutosaveBackend):
+    """One row per saved answer plus one per attempt, in a local SQLite database (WAL mode)."""
+
+    def __init__(self, path=DEFAULT_AUTOSAVE_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The flush thread writes and script threads restore; the lock serializes them
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS autosave_attempts ("
+            " session_id TEXT NOT NULL,"
+            " quiz_id TEXT NOT NULL,"
+            " n_questions INTEGER NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (session_id, quiz_id))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS autosave_answers ("
+            " session_id TEXT NOT NULL,"
+            " quiz_id TEXT NOT NULL,"
+            " question INTEGER NOT NULL,"
+            " answer INTEGER NOT NULL,"
+            " PRIMARY KEY (session_id, quiz_id, question))")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def write_batch(self, saves):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO autosave_attempts"
+                " (session_id, quiz_id, n_questions, position, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(save.session_id, save.quiz_id, save.n_questions, save.position, now) for save in saves])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO autosave_answers (session_id, quiz_id, question, answer)"
+                " VALUES (?, ?, ?, ?)",
+                [(save.session_id, save.quiz_id, question, _to_signed(answer))
+                 for save in saves for question, answer in save.answers.items()])
+
+    def load(self, session_id, quiz_id):
+        with self._lock:
+            attempt = self._conn.execute(
+                "SELECT n_questions, position FROM autosave_attempts WHERE session_id = ? AND quiz_id = ?",
+                (session_id, quiz_id)).fetchone()
+            if attempt is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT question, answer FROM autosave_answers WHERE session_id = ? AND quiz_id = ?",
+                (session_id, quiz_id)).fetchall()
+        return attempt[0], attempt[1], {question: _to_unsigned(answer) for question, answer in rows}
+
+    def purge(self, before):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM autosave_answers WHERE (session_id, quiz_id) IN"
+                " (SELECT session_id, quiz_id FROM autosave_attempts WHERE updated_at < ?)", (before,))
+            self._conn.execute("DELETE FROM autosave_attempts WHERE updated_at < ?", (before,))
+
+    def close(self):
+        self._conn.close()
+
+
+class Autosaver:
+    """Coalesces answer changes per attempt and flushes them in debounced batches."""
+
+    def __init__(self, backend, debounce=0.5, max_delay=2.0, retry_delay=1.0,
+                 max_age=7 * 24 * 3600, remembered=10000):
+        self.backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.max_age = max_age
+        self.remembered = remembered
+        self.recorded = 0  # answer changes handed over by reruns
+        self.written = 0  # answers written, after coalescing
+        self.flushes = 0
+        self.failures = 0
+        self._pending = {}  # (session id, quiz id) -> PendingSave
+        self._positions = OrderedDict()  # (session id, quiz id) -> last recorded position
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._purged_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def record(self, session_id, store, position):
+        """Queue the store's changed answers and the current position; never blocks on I/O."""
+        changes = store.take_changes()
+        key = (session_id, store.quiz_id)
+        with self._wakeup:
+            moved = self._positions.get(key) != position
+            if not changes and not moved:
+                return 0
+            self._positions[key] = position
+            self._positions.move_to_end(key)
+            while len(self._positions) > self.remembered:
+                self._positions.popitem(last=False)
+            now = time.monotonic()
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = PendingSave(session_id, store.quiz_id, len(store), position, now)
+            pending.answers.update(changes)
+            pending.position = position
+            pending.n_questions = len(store)
+            pending.last_at = now
+            self.recorded += len(changes)
+            self._wakeup.notify()
+        return len(changes)
+
+    def restore(self, session_id, quiz_id, n_questions):
+        """Return ({question: answer}, position) saved for an attempt, or None.
+
+        Attempts saved for a different number of questions (the quiz changed) are ignored.
+        """
+        try:
+            stored = self.backend.load(session_id, quiz_id)
+        except Exception:
+            logger.exception("restoring autosaved answers for %s failed", session_id)
+            stored = None
+        with self._wakeup:
+            pending = self._pending.get((session_id, quiz_id))
+            if stored is None and pending is None:
+                return None
+            size, position, answers = stored if stored is not None else (n_questions, 0, {})
+            if pending is not None:
+                answers.update(pending.answers)
+                size, position = pending.n_questions, pending.position
+            self._positions[(session_id, quiz_id)] = position
+        if size != n_questions:
+            return None
+        return answers, position
+
+    def _due(self, now, everything=False):
+        with self._wakeup:
+            due = [key for key, save in self._pending.items() if everything
+                   or now - save.last_at >= self.debounce or now - save.first_at >= self.max_delay]
+            return [self._pending.pop(key) for key in due]
+
+    def _next_due(self, now):
+        # Seconds until the earliest pending record is due; None when nothing is pending
+        if not self._pending:
+            return None
+        return max(0.0, min(min(s.last_at + self.debounce, s.first_at + self.max_delay)
+                            for s in self._pending.values()) - now)
+
+    def _write(self, batch):
+        try:
+            self.backend.write_batch(batch)
+        except Exception:
+            self.failures += 1
+            logger.exception("autosaving %d attempts failed; retrying", len(batch))
+            with self._wakeup:
+                # Put them back under anything recorded meanwhile, which is newer
+                for save in batch:
+                    key = (save.session_id, save.quiz_id)
+                    newer = self._pending.get(key)
+                    if newer is not None:
+                        save.merge(newer)
+                    self._pending[key] = save
+            return False
+        self.flushes += 1
+        self.written += sum(len(save.answers) for save in batch)
+        return True
+
+    def flush(self):
+        """Write everything pending now (used at exit); returns False if the write failed."""
+        batch = self._due(time.monotonic(), everything=True)
+        return self._write(batch) if batch else True
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._stopping:
+                    wait = self._next_due(time.monotonic())
+                    if wait == 0.0:
+                        break
+                    self._wakeup.wait(wait)
+                if self._stopping:
+                    return
+            batch = self._due(time.monotonic())
+            if batch and not self._write(batch):
+                time.sleep(self.retry_delay)
+            now = time.time()
+            if now - self._purged_at > 3600:
+                self._purged_at = now
+                try:
+                    self.backend.purge(now - self.max_age)
+                except Exception:
+                    logger.exception("purging old autosaves failed")
+
+    def close(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(5.0)
+        self.flush()
+        self.backend.close()
+
+    def stats(self):
+        with self._wakeup:
+            pending = len(self._pending)
+        return {"pending": pending, "recorded": self.recorded, "written": self.written,
+                "flushes": self.flushes, "failures": self.failures}
+
+
+def default_autosave_backend():
+    """Backend chosen by QUIZMASTER_AUTOSAVE: sqlite (default) or none."""
+    kind = os.environ.get("QUIZMASTER_AUTOSAVE", "sqlite")
+    if kind == "none":
+        return None
+    if kind == "sqlite":
+        return SQLiteAutosaveBackend()
+    raise ValueError(f"unknown QUIZMASTER_AUTOSAVE {kind!r}")
+
+
+_autosaver = None
+_configured = False
+_autosaver_lock = threading.Lock()
+
+
+def get_autosaver():
+    """Return the process-wide Autosaver, or None when autosave is disabled."""
+    global _autosaver, _configured
+    if not _configured:
+        with _autosaver_lock:
+            if not _configured:
+                backend = default_autosave_backend()
+                if backend is not None:
+                    _autosaver = Autosaver(backend)
+                    atexit.register(_autosaver.flush)
+                _configured = True
+    return _autosaver
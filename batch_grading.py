@@ -0,0 +1,234 @@
+"""Headless, vectorized grading of stored submissions.
+
+Submissions are encoded with the same AnswerKey the interactive scorer uses,
+into one option-index matrix for the SCQ questions and one bitmask matrix for
+the MCQ questions. A whole batch is then scored with two array comparisons,
+so re-grading after an answer-key fix never needs a Streamlit session.
+
+A stored submission is a JSON object {"id": ..., "answers": ...} where answers
+is either a list aligned with the quiz questions (SCQ: 1-based option number,
+option text or null; MCQ: list of 1-based option numbers) or the widget-state
+dict captured from a session ({"question_1": "True", "question_2_option_0": true}).
+"""
+import json
+
+import numpy as np
+
+from answer_key import MCQ, SCQ, answers_to_mask, to_cents
+
+
+class EncodedSubmissions:
+    """Submissions for one quiz as dense arrays."""
+    __slots__ = ("ids", "scq", "mcq")
+
+    def __init__(self, ids, scq, mcq):
+        self.ids = ids
+        self.scq = scq  # int32 [submissions, scq questions], 0 = unanswered
+        self.mcq = mcq  # uint64 [submissions, mcq questions], bit j = option j+1
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class GradeReport:
+    """Scores plus per-question statistics for a batch of submissions."""
+    __slots__ = ("ids", "scores", "total", "question_stats")
+
+    def __init__(self, ids, scores, total, question_stats):
+        self.ids = ids
+        self.scores = scores
+        self.total = total  # score of a fully correct attempt
+        self.question_stats = question_stats
+
+
+def _columns(answer_key):
+    scq_columns = [i for i, q in enumerate(answer_key.questions) if q.kind == SCQ]
+    mcq_columns = [i for i, q in enumerate(answer_key.questions) if q.kind == MCQ]
+    for i in mcq_columns:
+        if answer_key.questions[i].n_options > 64:
+            raise ValueError(f"question {i + 1} has more than 64 options")
+    return scq_columns, mcq_columns
+
+
+def encode_response(question, answer):
+    """Encode one stored answer exactly as QuestionKey.encode would from widget state."""
+    if answer is None:
+        return 0
+    if question.kind == MCQ:
+        if isinstance(answer, int) and not isinstance(answer, bool):
+            return answer  # already a bitmask
+        options = (question.option_index.get(a, 0) if isinstance(a, str) else a for a in answer)
+        return answers_to_mask(option for option in options if option > 0)
+    if isinstance(answer, str):
+        return question.option_index.get(answer, 0)
+    if isinstance(answer, int) and not isinstance(answer, bool):
+        return answer
+    return 0
+
+
+def encode_responses(answer_key, answers):
+    """Return the encoded response list for one submission's answers."""
+    if isinstance(answers, dict):
+        return answer_key.encode_session(answers)
+    return [encode_response(q, a) for q, a in zip(answer_key.questions, answers)] + [0] * (
+        len(answer_key.questions) - len(answers)
+    )
+
+
+def encode_submissions(answer_key, submissions):
+    """Encode an iterable of {"id", "answers"} submissions into dense arrays."""
+    scq_columns, mcq_columns = _columns(answer_key)
+    ids = []
+    rows = []
+    for n, submission in enumerate(submissions):
+        ids.append(submission.get("id", n))
+        rows.append(encode_responses(answer_key, submission["answers"]))
+    return encode_rows(answer_key, ids, rows, scq_columns, mcq_columns)
+
+
+def encode_rows(answer_key, ids, rows, scq_columns=None, mcq_columns=None):
+    """Pack already-encoded response rows into EncodedSubmissions."""
+    if scq_columns is None:
+        scq_columns, mcq_columns = _columns(answer_key)
+    scq = np.array([[row[i] for i in scq_columns] for row in rows], dtype=np.int32)
+    mcq = np.array([[row[i] for i in mcq_columns] for row in rows], dtype=np.uint64)
+    scq = scq.reshape(len(rows), len(scq_columns))
+    mcq = mcq.reshape(len(rows), len(mcq_columns))
+    return EncodedSubmissions(ids, scq, mcq)
+
+
+def _option_counts_scq(column, n_options):
+    # Index 0 collects unanswered and out-of-range responses
+    column = np.where((column >= 1) & (column <= n_options), column, 0)
+    return np.bincount(column, minlength=n_options + 1)
+
+
+def _option_counts_mcq(column, n_options):
+    bits = np.arange(n_options, dtype=np.uint64)
+    selected = (column[:, None] >> bits[None, :]) & np.uint64(1)
+    return selected.sum(axis=0)
+
+
+def score_units(answer_key, encoded, scq_columns=None, mcq_columns=None):
+    """Every submission's points in units of 1/answer_key.scale, like AnswerKey.score_units.
+
+    Works on one integer points matrix per question type.
+    """
+    if scq_columns is None:
+        scq_columns, mcq_columns = _columns(answer_key)
+    questions = answer_key.questions
+    n = len(encoded)
+    units = np.zeros(n, dtype=np.int64)
+    if scq_columns:
+        # SCQ: a lookup into each question's points table (index 0 = unanswered)
+        width = max(len(questions[i].option_points) for i in scq_columns)
+        table = np.zeros((len(scq_columns), width + 1), dtype=np.int64)
+        for c, i in enumerate(scq_columns):
+            table[c, :len(questions[i].option_points)] = questions[i].option_points
+        responses = np.where((encoded.scq >= 0) & (encoded.scq < width), encoded.scq, width)
+        points = table[np.arange(len(scq_columns)), responses]
+        units += _floored(points, [questions[i] for i in scq_columns]).sum(axis=1)
+    if mcq_columns:
+        points = np.empty((n, len(mcq_columns)), dtype=np.int64)
+        for c, i in enumerate(mcq_columns):
+            question = questions[i]
+            column = encoded.mcq[:, c]
+            if question.option_points is None:
+                points[:, c] = np.where(column == np.uint64(question.correct), question.full_points,
+                                        np.where(column != 0, -question.penalty, 0))
+            else:
+                # Partial credit: dot product of the selection bits with the per-option points
+                bits = np.arange(len(question.option_points), dtype=np.uint64)
+                selected = ((column[:, None] >> bits[None, :]) & np.uint64(1)).astype(np.int64)
+                points[:, c] = selected @ np.array(question.option_points, dtype=np.int64)
+        units += _floored(points, [questions[i] for i in mcq_columns]).sum(axis=1)
+    return units
+
+
+def _scores(answer_key, encoded, scq_columns, mcq_columns):
+    """Scores under the compiled scoring rules: whole points as ints, else rounded to 1/100."""
+    units = score_units(answer_key, encoded, scq_columns, mcq_columns)
+    whole = units % answer_key.scale == 0
+    if whole.all():
+        return units // answer_key.scale
+    # Mixed: an object array, so whole scores stay ints (3, not 3.0) like from_units
+    scores = (to_cents(units, answer_key.scale) / 100).astype(object)
+    scores[whole] = (units[whole] // answer_key.scale).astype(object)
+    return scores
+
+
+def _floored(points, questions):
+    floors = [q.min_points for q in questions]
+    if all(floor is None for floor in floors):
+        return points
+    limits = np.array([np.iinfo(np.int64).min if floor is None else floor for floor in floors], dtype=np.int64)
+    return np.maximum(points, limits)
+
+
+def grade(answer_key, encoded):
+    """Score every submission at once and collect per-question statistics."""
+    scq_columns, mcq_columns = _columns(answer_key)
+    questions = answer_key.questions
+    key_scq = np.array([questions[i].correct for i in scq_columns], dtype=np.int32)
+    key_mcq = np.array([questions[i].correct for i in mcq_columns], dtype=np.uint64)
+
+    scq_correct = encoded.scq == key_scq
+    mcq_correct = encoded.mcq == key_mcq
+    if answer_key.exact_count:
+        scores = scq_correct.sum(axis=1, dtype=np.int64) + mcq_correct.sum(axis=1, dtype=np.int64)
+    else:
+        scores = _scores(answer_key, encoded, scq_columns, mcq_columns)
+
+    n = len(encoded)
+    stats = [None] * len(questions)
+    for c, i in enumerate(scq_columns):
+        column = encoded.scq[:, c]
+        counts = _option_counts_scq(column, questions[i].n_options)
+        stats[i] = {
+            "question": i + 1,
+            "type": SCQ,
+            "correct": int(scq_correct[:, c].sum()),
+            "answered": int(n - counts[0]),
+            "option_counts": counts[1:].tolist(),
+        }
+    for c, i in enumerate(mcq_columns):
+        column = encoded.mcq[:, c]
+        stats[i] = {
+            "question": i + 1,
+            "type": MCQ,
+            "correct": int(mcq_correct[:, c].sum()),
+            "answered": int(np.count_nonzero(column)),
+            "option_counts": _option_counts_mcq(column, questions[i].n_options).tolist(),
+        }
+    for i, stat in enumerate(stats):
+        if stat is None:
+            stats[i] = {"question": i + 1, "type": None, "correct": 0, "answered": 0, "option_counts": []}
+    for stat in stats:
+        stat["p_value"] = stat["correct"] / n if n else 0.0
+    return GradeReport(encoded.ids, scores, answer_key.max_score, stats)
+
+
+def read_submissions(path):
+    """Stream submissions from a JSON Lines file."""
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def save_encoded(path, encoded):
+    """Store encoded submissions as .npz so later re-grades skip the JSON decode.
+
+    The ids are kept as one JSON string, so numbers come back as numbers.
+    """
+    ids = np.array(json.dumps(list(encoded.ids)))
+    np.savez_compressed(path, ids=ids, scq=encoded.scq, mcq=encoded.mcq)
+
+
+def load_encoded(path):
+    data = np.load(path)
+    ids = data["ids"]
+    # Files written before the ids were JSON hold them as an array of strings
+    ids = json.loads(ids.item()) if ids.ndim == 0 else ids.tolist()
+    return EncodedSubmissions(ids, data["scq"], data["mcq"])
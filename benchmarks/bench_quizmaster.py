@@ -0,0 +1,328 @@
+"""Load and latency benchmarks for the rerun and grading hot paths.
+
+Generates a synthetic Quiz tree, then measures:
+
+  * catalog listing (list_topics / list_levels / list_quizzes) against the raw
+    os.listdir walk it replaced,
+  * load_quiz through the shared cache, cold and warm,
+  * AnswerKey scoring throughput (what the grading pool runs),
+  * full app reruns under N concurrent simulated learners using Streamlit's
+    AppTest harness: select a quiz, answer, page through, submit. AppTest is
+    not thread-safe, so concurrent learners run in separate processes.
+
+Results are written as JSON so runs can be compared:
+
+    python benchmarks/bench_quizmaster.py --learners 8 --output bench.json
+    python benchmarks/bench_quizmaster.py --compare bench.json --output bench2.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+APP_PATH = os.path.join(REPO_ROOT, "streamlit_app.py")
+
+
+def generate_tree(root, topics, levels, files, questions, options, display="page", seed=0):
+    """Write a synthetic Quiz/<Topic>/<Level>/<quiz>.json tree under root."""
+    rng = random.Random(seed)
+    base_path = os.path.join(root, "Quiz")
+    for t in range(topics):
+        for l in range(levels):
+            level_path = os.path.join(base_path, f"Topic{t}", f"Level{l}")
+            os.makedirs(level_path, exist_ok=True)
+            for f in range(files):
+                quiz_questions = []
+                for q in range(questions):
+                    opts = [f"Option {o} of question {q}" for o in range(options)]
+                    if rng.random() < 0.5:
+                        quiz_questions.append({"type": "SCQ", "question": f"Question {q}?",
+                                               "options": opts, "answer": rng.randint(1, options)})
+                    else:
+                        answers = sorted(rng.sample(range(1, options + 1), rng.randint(1, options)))
+                        quiz_questions.append({"type": "MCQ", "question": f"Question {q}?",
+                                               "options": opts, "answers": answers})
+                quiz = {"title": f"Quiz {t}.{l}.{f}", "question_display": display,
+                        "questions": quiz_questions}
+                with open(os.path.join(level_path, f"Quiz{f}.json"), 'w') as file:
+                    json.dump(quiz, file)
+    return base_path
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] * 1000.0
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000.0,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_catalog(base_path, repeat):
+    from quiz_catalog import QuizCatalog
+
+    def raw_walk():
+        for topic in os.listdir(base_path):
+            topic_path = os.path.join(base_path, topic)
+            if os.path.isdir(topic_path):
+                for level in os.listdir(topic_path):
+                    level_path = os.path.join(topic_path, level)
+                    if os.path.isdir(level_path):
+                        [n for n in os.listdir(level_path) if n.endswith(".json")]
+
+    catalog = QuizCatalog(base_path)
+    cold = timed(catalog.build, 1)
+
+    def rerun_listing():
+        # What one rerun of main() asks for once a quiz is selected
+        topic = catalog.topics()[0]
+        level = catalog.levels(topic)[0]
+        catalog.quizzes(topic, level)
+
+    return {
+        "catalog_build_cold": summarize(cold),
+        "catalog_rerun_listing": summarize(timed(rerun_listing, repeat)),
+        "raw_listdir_walk": summarize(timed(raw_walk, max(1, repeat // 100))),
+    }
+
+
+def bench_load_quiz(base_path, repeat):
+    from question_bank import load_cached_quiz
+    from quiz_cache import get_quiz_cache, load_json
+
+    paths = []
+    for root, _, names in os.walk(base_path):
+        paths.extend(os.path.join(root, n) for n in names if n.endswith(".json"))
+    paths.sort()
+    cold = timed(lambda: load_json(paths[0]), min(repeat, 200))
+    load_cached_quiz(paths[0])
+    warm = timed(lambda: load_cached_quiz(paths[0]), repeat)
+    return {
+        "load_quiz_uncached": summarize(cold),
+        "load_quiz_cached": summarize(warm),
+        "quiz_cache": get_quiz_cache().stats(),
+    }
+
+
+def bench_scoring(base_path, submissions):
+    from answer_key import MCQ, compile_answer_key
+    from answer_store import AnswerStore
+    from question_bank import load_cached_quiz
+
+    level_path = os.path.join(base_path, "Topic0", "Level0")
+    quiz = load_cached_quiz(os.path.join(level_path, "Quiz0.json"))
+    answer_key = compile_answer_key(quiz)
+    rng = random.Random(1)
+    stores = []
+    for _ in range(min(submissions, 2000)):
+        store = AnswerStore("bench", answer_key.total)
+        for i, question in enumerate(answer_key.questions):
+            if question.kind == MCQ:
+                for j in range(question.n_options):
+                    store.set_selected(i, j, rng.random() < 0.5)
+            else:
+                store.set_choice(i, rng.randint(0, question.n_options))
+        stores.append(store)
+    started = time.perf_counter()
+    for n in range(submissions):
+        answer_key.score(stores[n % len(stores)].responses())
+    elapsed = time.perf_counter() - started
+    return {"score_throughput": {
+        "questions": answer_key.total,
+        "submissions": submissions,
+        "seconds": elapsed,
+        "submissions_per_second": submissions / elapsed if elapsed else None,
+    }}
+
+
+def share_script_bytecode():
+    """Compile the app once for all AppTest instances.
+
+    AppTest builds a fresh ScriptCache for every run, so each simulated rerun
+    would recompile streamlit_app.py, which a real server does once. Parallel
+    ast.parse calls also trip a CPython 3.11 race, so compilation is serialized.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    compiled = {}
+    lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def shared_get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    ScriptCache.get_bytecode = shared_get_bytecode
+
+
+def simulate_learner(learner, topics, levels, files, steps, rerun_samples, errors, timeout):
+    """One learner: pick a quiz, answer the visible questions, page, submit."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(learner)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def rerun(element, label):
+        started = time.perf_counter()
+        element.run()
+        rerun_samples.setdefault(label, []).append(time.perf_counter() - started)
+        if at.exception:
+            errors.append(f"learner {learner} {label}: {at.exception[0].value}")
+
+    rerun(at, "initial")
+    rerun(at.sidebar.selectbox[0].select(f"Topic{rng.randrange(topics)}"), "select_topic")
+    rerun(at.sidebar.selectbox[1].select(f"Level{rng.randrange(levels)}"), "select_level")
+    rerun(at.sidebar.selectbox[2].select(f"Quiz{rng.randrange(files)}.json"), "select_quiz")
+    for _ in range(steps):
+        if at.main.checkbox and rng.random() < 0.5:
+            box = rng.choice(list(at.main.checkbox))
+            rerun(box.set_value(not box.value), "answer")
+        elif at.main.radio:
+            radio = rng.choice(list(at.main.radio))
+            rerun(radio.set_value(rng.choice(radio.options)), "answer")
+        nxt = [b for b in at.main.button if b.label == "Next"]
+        if nxt and rng.random() < 0.3:
+            rerun(nxt[0].click(), "navigate")
+    submit = [b for b in at.main.button if b.label == "Submit Quiz"]
+    if submit:
+        rerun(submit[0].click(), "submit")
+
+
+def _learner_worker(root, worker, args):
+    """Run args.sessions learner sessions back to back in this process."""
+    os.chdir(root)  # the app resolves "Quiz" relative to the working directory
+    share_script_bytecode()
+    samples = {}
+    errors = []
+    for session in range(args.sessions):
+        simulate_learner(worker * args.sessions + session, args.topics, args.levels, args.files,
+                         args.steps, samples, errors, args.timeout)
+    return samples, errors
+
+
+def bench_learners(root, args):
+    # AppTest swaps a process-global Runtime in and out around every run, so
+    # simulated learners cannot share a process; each one gets a worker process.
+    rerun_samples = {}
+    errors = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.learners) as pool:
+        futures = [pool.submit(_learner_worker, root, worker, args) for worker in range(args.learners)]
+        for future in futures:
+            samples, worker_errors = future.result()
+            errors.extend(worker_errors)
+            for label, values in samples.items():
+                rerun_samples.setdefault(label, []).extend(values)
+    elapsed = time.perf_counter() - started
+    all_reruns = [v for values in rerun_samples.values() for v in values]
+    report = {f"rerun_{label}": summarize(values) for label, values in sorted(rerun_samples.items())}
+    report["rerun_all"] = summarize(all_reruns)
+    report["learners"] = {"concurrent": args.learners, "sessions": args.learners * args.sessions,
+                          "seconds": elapsed, "reruns_per_second": len(all_reruns) / elapsed,
+                          "errors": errors[:20], "error_count": len(errors)}
+    return report
+
+
+def compare(previous, current, threshold):
+    """Print p50/p99 changes beyond threshold (fractional) versus a previous report."""
+    regressions = []
+    for name, stats in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if not isinstance(stats, dict) or not isinstance(old, dict):
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if metric in stats and old.get(metric):
+                change = stats[metric] / old[metric] - 1.0
+                if abs(change) >= threshold:
+                    kind = "REGRESSION" if change > 0 else "improvement"
+                    line = f"{kind:11s} {name}.{metric}: {old[metric]:.3f} -> {stats[metric]:.3f} ms ({change:+.0%})"
+                    print(line, file=sys.stderr)
+                    if change > 0:
+                        regressions.append(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=10)
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--files", type=int, default=20, help="quiz files per level")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--display", default="page", choices=["all", "1", "page"])
+    parser.add_argument("--learners", type=int, default=4, help="concurrent simulated learners")
+    parser.add_argument("--sessions", type=int, default=2, help="sequential sessions per learner process")
+    parser.add_argument("--steps", type=int, default=10, help="answer/navigate actions per session")
+    parser.add_argument("--repeat", type=int, default=1000, help="iterations for micro benchmarks")
+    parser.add_argument("--submissions", type=int, default=100000, help="submissions for scoring throughput")
+    parser.add_argument("--timeout", type=float, default=30.0, help="AppTest per-rerun timeout")
+    parser.add_argument("--skip-app", action="store_true", help="skip the AppTest learner simulation")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change reported by --compare")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="quizmaster-bench-") as root:
+        os.environ.setdefault("QUIZMASTER_CACHE_DIR", os.path.join(root, ".quizmaster"))
+        base_path = generate_tree(root, args.topics, args.levels, args.files, args.questions,
+                                  args.options, args.display)
+        results = {}
+        results.update(bench_catalog(base_path, args.repeat))
+        results.update(bench_load_quiz(base_path, args.repeat))
+        results.update(bench_scoring(base_path, args.submissions))
+        if not args.skip_app:
+            results.update(bench_learners(root, args))
+
+    report = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            if compare(json.load(file), report, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Asynchronous grading in a bounded pool of worker processes.
+
+Scoring an attempt used to run in the script thread of the rerun that
+clicked "Submit Quiz". That is cheap for exact-match questions, but a large
+exam (or a grading rule that does real work) would hold the learner's rerun
+and a server thread for as long as it takes. GradingPool.submit() instead
+returns a GradingJob handle at once; the page polls the handle, and blocking
+callers can wait on it with a timeout.
+
+Capacity is bounded, and the pool sheds load instead of doing the work in
+the caller's thread:
+- at most max_pending jobs (eight per worker by default) are in flight; a
+  submit that finds every slot taken returns a job already resolved as BUSY;
+- a job still unresolved past its timeout, or whose worker failed, is
+  resolved as FAILED. A timed-out job still waiting for a worker is
+  cancelled; one a worker has started cannot be interrupted, so it keeps its
+  slot until it finishes and its late result is ignored;
+- only small answer keys (fewer than inline_below questions), where shipping
+  them to another process would cost more than it saves, are graded inline,
+  as is everything when the pool has no workers.
+The learner resubmits a BUSY or FAILED attempt. Every job is resolved exactly
+once, and its on_done callback (e.g. queueing the Submission) runs exactly
+once, for the jobs that produced a score.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+BUSY = "busy"  # turned away: every slot was taken
+FAILED = "failed"  # timed out, or the worker failed
+
+
+def grade_responses(answer_key, responses):
+    """Worker entry point: the score of one attempt's encoded responses."""
+    return answer_key.score(responses)
+
+
+class GradingJob:
+    """Handle for one submitted attempt."""
+    __slots__ = ("job_id", "total", "submitted_at", "deadline", "score", "via",
+                 "_status", "_payload", "_on_done", "_future", "_done", "_lock")
+
+    def __init__(self, job_id, total, timeout, payload, on_done):
+        self.job_id = job_id
+        self.total = total  # the answer key's max_score
+        self.submitted_at = time.monotonic()
+        self.deadline = self.submitted_at + timeout
+        self.score = None  # None unless the status is DONE
+        self.via = None  # "pool", "inline", "busy", "timeout" or "failed"
+        self._status = PENDING
+        self._payload = payload  # (answer_key, responses) until resolved, for inline grading
+        self._on_done = on_done
+        self._future = None  # the pool's Future while the job is in flight
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        return self._status
+
+    def done(self):
+        """True once resolved, with a score or not."""
+        return self._done.is_set()
+
+    @property
+    def failed(self):
+        """True when the job was turned away or failed, and should be resubmitted."""
+        return self._status in (BUSY, FAILED)
+
+    def _resolve(self, score, via, status=DONE):
+        with self._lock:
+            if self._done.is_set():
+                return False  # resolved already; a late pool result is dropped
+            self.score = score
+            self.via = via
+            self._status = status
+            self._payload = None
+            on_done, self._on_done = self._on_done, None
+            future, self._future = self._future, None
+            self._done.set()
+        if future is not None:
+            future.cancel()  # frees the queue slot if no worker has picked it up yet
+        if on_done is not None:
+            try:
+                on_done(self)
+            except Exception:
+                logger.exception("grading callback for job %s failed", self.job_id)
+        return True
+
+    def _grade_inline(self):
+        with self._lock:
+            payload = self._payload
+        if payload is None:
+            return  # resolved concurrently
+        self._resolve(grade_responses(*payload), "inline")
+
+
+class GradingPool:
+    """Bounded process pool returning GradingJob handles."""
+
+    def __init__(self, workers=None, max_pending=None, timeout=10.0, admit_timeout=0.0,
+                 inline_below=50, remembered=10000):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or 8 * max(self.workers, 1)
+        self.timeout = timeout
+        self.admit_timeout = admit_timeout
+        self.inline_below = inline_below
+        self.remembered = remembered
+        self.counts = {"pool": 0, "inline": 0, "busy": 0, "timeout": 0, "failed": 0}
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._in_flight = 0
+        self._executor = None  # started on the first job that needs it
+        self._jobs = OrderedDict()  # job id -> GradingJob, oldest first
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Imported here: multiprocessing is only needed once a job reaches the pool
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # Never fork the multi-threaded server; workers start from a clean process
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def _reset_pool(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, job):
+        with self._lock:
+            self.counts[job.via] += 1
+
+    def _remember(self, job):
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.remembered:
+                self._jobs.popitem(last=False)
+
+    def submit(self, answer_key, responses, on_done=None):
+        """Start grading one attempt; never grades a large attempt in the calling thread.
+
+        on_done(job) runs once the job has a score, in whichever thread resolved
+        it. The returned job may already be resolved: graded inline (small
+        keys), or BUSY when every slot is taken.
+        """
+        responses = list(responses)
+        job = GradingJob(uuid.uuid4().hex, answer_key.max_score, self.timeout, (answer_key, responses),
+                         self._counted(on_done))
+        self._remember(job)
+        if self.workers <= 0 or answer_key.total < self.inline_below:
+            job._grade_inline()
+            return job
+        if not self._slots.acquire(timeout=self.admit_timeout):
+            job._resolve(None, "busy", BUSY)
+            return job
+        with self._lock:
+            self._in_flight += 1
+        try:
+            executor = self._pool()
+            future = executor.submit(grade_responses, answer_key, responses)
+        except Exception:
+            # Broken or shut-down pool: start a fresh one for the next job
+            logger.exception("grading pool unavailable; job %s failed", job.job_id)
+            if self._executor is not None:
+                self._reset_pool(self._executor)
+            self._release()
+            job._resolve(None, "failed", FAILED)
+            return job
+        job._future = future
+        future.add_done_callback(lambda f: self._finished(job, executor, f))
+        return job
+
+    def _counted(self, on_done):
+        def resolved(job):
+            self._count(job)
+            if on_done is not None and job.status == DONE:
+                on_done(job)
+        return resolved
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _finished(self, job, executor, future):
+        self._release()
+        if future.cancelled():
+            return  # timed out while still queued
+        error = future.exception()
+        if error is None:
+            job._resolve(future.result(), "pool")  # ignored if the job timed out meanwhile
+            return
+        from concurrent.futures.process import BrokenProcessPool
+
+        if isinstance(error, BrokenProcessPool):
+            self._reset_pool(executor)
+        logger.warning("grading job %s failed in the pool (%r)", job.job_id, error)
+        job._resolve(None, "failed", FAILED)
+
+    def job(self, job_id):
+        """The GradingJob for an id, or None if it is unknown to this process."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def poll(self, job):
+        """Non-blocking check; a job past its timeout is resolved as FAILED. Returns job.done()."""
+        if not job.done() and time.monotonic() >= job.deadline:
+            logger.warning("grading job %s timed out", job.job_id)
+            job._resolve(None, "timeout", FAILED)
+        return job.done()
+
+    def result(self, job, timeout=None):
+        """Wait for a job's score, for at most timeout seconds or until the job's own timeout.
+
+        None means the job is still pending (the caller's shorter timeout ran
+        out first) or was resolved without a score; see job.status.
+        """
+        remaining = job.deadline - time.monotonic()
+        wait = remaining if timeout is None else min(timeout, remaining)
+        job._done.wait(max(wait, 0.0))
+        self.poll(job)
+        return job.score
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, in_flight=self._in_flight, workers=self.workers)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_grading_pool():
+    """Return the process-wide GradingPool.
+
+    QUIZMASTER_GRADING_WORKERS (default: one per CPU, 0 grades everything
+    inline), QUIZMASTER_GRADING_MAX_PENDING (jobs in flight, default eight
+    per worker), QUIZMASTER_GRADING_TIMEOUT (seconds per job, default 10) and
+    QUIZMASTER_GRADING_INLINE_BELOW (questions, default 50) configure it.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = os.environ.get("QUIZMASTER_GRADING_WORKERS")
+                max_pending = os.environ.get("QUIZMASTER_GRADING_MAX_PENDING")
+                pool = GradingPool(
+                    workers=None if workers is None else int(workers),
+                    max_pending=None if max_pending is None else int(max_pending),
+                    timeout=float(os.environ.get("QUIZMASTER_GRADING_TIMEOUT", 10.0)),
+                    inline_below=int(os.environ.get("QUIZMASTER_GRADING_INLINE_BELOW", 50)))
+                atexit.register(pool.shutdown)
+                _pool = pool
+    return _pool
@@ -0,0 +1,274 @@
+"""Incremental item analysis over graded submissions.
+
+For every quiz the engine keeps running aggregates: per question the number
+of correct and answered responses, per-option tallies and the sum of the
+total scores of the learners who got it right, plus the score histogram and
+the sums needed for the score variance. Scores follow the quiz's scoring rules
+(the same points AnswerKey.score_units gives) and are kept in integer units of
+1/AnswerKey.scale. Every statistic a dashboard shows
+(difficulty/p-value, point-biserial discrimination, distractor counts, score
+distribution) is then derived from the aggregates in O(questions), without
+looking at a single submission again.
+
+Aggregates are fed by the SubmissionWriter (each flushed batch is folded in
+with a few NumPy passes) and, the first time a quiz is asked for, backfilled
+from the stored submissions in vectorized chunks.
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+from answer_key import MCQ, SCQ, from_units
+from batch_grading import EncodedSubmissions, score_units
+
+BACKFILL_CHUNK = 10000
+_NEVER = np.uint64(0xFFFFFFFFFFFFFFFF)  # key value no response can match
+
+
+class QuizAggregate:
+    """Running totals for one quiz under one version of its answer key."""
+    __slots__ = ("answer_key", "fingerprint", "kinds", "n_options", "key", "scq_columns", "mcq_columns",
+                 "submissions", "score_sum", "score_sq_sum", "score_counts",
+                 "correct", "answered", "correct_score_sum", "option_counts")
+
+    def __init__(self, answer_key):
+        questions = answer_key.questions
+        self.answer_key = answer_key
+        self.fingerprint = answer_key_fingerprint(answer_key)
+        self.kinds = [q.kind for q in questions]
+        self.n_options = [q.n_options for q in questions]
+        self.key = np.array([_NEVER if q.kind is None else q.correct for q in questions], dtype=np.uint64)
+        self.scq_columns = np.array([i for i, q in enumerate(questions) if q.kind == SCQ], dtype=np.intp)
+        self.mcq_columns = np.array([i for i, q in enumerate(questions) if q.kind == MCQ], dtype=np.intp)
+        n = len(questions)
+        self.submissions = 0
+        self.score_sum = 0
+        self.score_sq_sum = 0
+        self.score_counts = {}  # score in units -> submissions
+        self.correct = np.zeros(n, dtype=np.int64)
+        self.answered = np.zeros(n, dtype=np.int64)
+        self.correct_score_sum = np.zeros(n, dtype=np.int64)
+        self.option_counts = np.zeros((n, max(self.n_options, default=0)), dtype=np.int64)
+
+    def add(self, responses):
+        """Fold in a [submissions, questions] uint64 matrix of encoded responses."""
+        if not len(responses):
+            return
+        correct = responses == self.key
+        scores = self.scores(responses, correct)
+        self.submissions += len(responses)
+        self.score_sum += int(scores.sum())
+        self.score_sq_sum += int((scores * scores).sum())
+        for score, count in zip(*np.unique(scores, return_counts=True)):
+            self.score_counts[int(score)] = self.score_counts.get(int(score), 0) + int(count)
+        self.correct += correct.sum(axis=0)
+        self.answered += np.count_nonzero(responses, axis=0)
+        self.correct_score_sum += scores @ correct
+        width = self.option_counts.shape[1]
+        if len(self.scq_columns):
+            scq = responses[:, self.scq_columns].astype(np.int64)
+            rows = np.broadcast_to(self.scq_columns, scq.shape)
+            limits = np.array([self.n_options[i] for i in self.scq_columns])
+            valid = (scq >= 1) & (scq <= limits)
+            np.add.at(self.option_counts, (rows[valid], scq[valid] - 1), 1)
+        if len(self.mcq_columns) and width:
+            bits = np.arange(width, dtype=np.uint64)
+            selected = (responses[:, self.mcq_columns, None] >> bits) & np.uint64(1)
+            self.option_counts[self.mcq_columns] += selected.sum(axis=0, dtype=np.int64)
+
+    def scores(self, responses, correct):
+        """Every submission's total score in units, under the answer key's scoring rules."""
+        answer_key = self.answer_key
+        if answer_key.exact_count:
+            return correct.sum(axis=1, dtype=np.int64) * answer_key.scale
+        encoded = EncodedSubmissions(
+            range(len(responses)),
+            responses[:, self.scq_columns].astype(np.int64),
+            responses[:, self.mcq_columns],
+        )
+        return score_units(answer_key, encoded, self.scq_columns.tolist(), self.mcq_columns.tolist())
+
+    def report(self):
+        """Dashboard statistics, derived from the aggregates in O(questions)."""
+        n = self.submissions
+        scale = self.answer_key.scale
+        mean = self.score_sum / n if n else 0.0
+        variance = self.score_sq_sum / n - mean * mean if n else 0.0
+        std = math.sqrt(max(variance, 0.0))
+        questions = []
+        for i, kind in enumerate(self.kinds):
+            correct = int(self.correct[i])
+            p = correct / n if n else 0.0
+            discrimination = None
+            if n and std > 0 and 0 < correct < n:
+                # Point-biserial correlation between the item and the total score
+                mean_correct = self.correct_score_sum[i] / correct
+                mean_wrong = (self.score_sum - self.correct_score_sum[i]) / (n - correct)
+                discrimination = float((mean_correct - mean_wrong) / std * math.sqrt(p * (1.0 - p)))
+            questions.append({
+                "question": i + 1,
+                "type": kind,
+                "p_value": p,
+                "discrimination": discrimination,
+                "answered": int(self.answered[i]),
+                "correct": correct,
+                "option_counts": self.option_counts[i, :self.n_options[i]].tolist(),
+            })
+        return {
+            "submissions": n,
+            "mean_score": mean / scale,
+            "score_std": std / scale,
+            "score_distribution": [
+                {"score": from_units(score, scale), "submissions": count}
+                for score, count in sorted(self.score_counts.items())
+            ],
+            "questions": questions,
+        }
+
+
+def answer_key_fingerprint(answer_key):
+    """Everything the aggregates depend on: the correct answers and the scoring rules."""
+    return (answer_key.scale,) + tuple(
+        (q.kind, q.n_options, q.correct, q.full_points, q.penalty, q.option_points, q.min_points)
+        for q in answer_key.questions
+    )
+
+
+def responses_matrix(submissions, total):
+    """Stack AnswerStore bytes into a uint64 matrix, skipping attempts of another length."""
+    width = 8 * total
+    blobs = [s.answers for s in submissions if len(s.answers) == width]
+    if not blobs or not total:
+        return np.zeros((len(blobs), total), dtype=np.uint64)
+    return np.frombuffer(b"".join(blobs), dtype=np.uint64).reshape(len(blobs), total)
+
+
+def default_answer_key(quiz_id, base_path="Quiz"):
+    """Answer key for a submission's quiz_id (topic/level/file), or None if it has no file."""
+    from question_bank import load_cached_answer_key
+
+    path = os.path.join(base_path, quiz_id)
+    if not os.path.isfile(path):
+        return None  # e.g. random exams, which are drawn rather than stored
+    return load_cached_answer_key(path)
+
+
+def _submission_key(submission):
+    return (submission.session_id, submission.submitted_at)
+
+
+class _Backfill:
+    """One running backfill: submissions delivered meanwhile, and a flag set when it ends."""
+    __slots__ = ("pending", "done")
+
+    def __init__(self):
+        self.pending = []
+        self.done = threading.Event()
+
+
+class ItemAnalysis:
+    """Per-quiz aggregates, backfilled lazily and kept current from the write-behind queue."""
+
+    def __init__(self, backend=None, resolve_answer_key=default_answer_key):
+        self.backend = backend  # SubmissionBackend used for backfills, or None
+        self.resolve_answer_key = resolve_answer_key
+        self._aggregates = {}  # quiz id -> QuizAggregate
+        self._backfilling = {}  # quiz id -> its running _Backfill
+        self._lock = threading.Lock()
+
+    def on_batch(self, submissions):
+        """SubmissionWriter listener: fold a flushed batch into the loaded quizzes."""
+        by_quiz = {}
+        with self._lock:
+            for submission in submissions:
+                if submission.quiz_id in self._backfilling:
+                    self._backfilling[submission.quiz_id].pending.append(submission)
+                elif submission.quiz_id in self._aggregates:
+                    by_quiz.setdefault(submission.quiz_id, []).append(submission)
+            # Quizzes nobody has looked at yet are skipped; their backfill reads them
+            for quiz_id, batch in by_quiz.items():
+                aggregate = self._aggregates[quiz_id]
+                aggregate.add(responses_matrix(batch, len(aggregate.kinds)))
+
+    def backfill(self, quiz_id, answer_key):
+        """Rebuild one quiz's aggregates from the stored submissions, in vectorized chunks.
+
+        Only one backfill of a quiz runs at a time; a concurrent caller waits for
+        it and uses its result when it was built from the same answer key.
+        """
+        aggregate = QuizAggregate(answer_key)
+        while True:
+            with self._lock:
+                running = self._backfilling.get(quiz_id)
+                if running is None:
+                    running = self._backfilling[quiz_id] = _Backfill()
+                    break
+            running.done.wait()
+            with self._lock:
+                current = self._aggregates.get(quiz_id)
+            if current is not None and current.fingerprint == aggregate.fingerprint:
+                return current
+        seen = set()
+        complete = False
+        try:
+            if self.backend is not None:
+                chunk = []
+                for submission in self.backend.iter_submissions(quiz_id):
+                    chunk.append(submission)
+                    seen.add(_submission_key(submission))
+                    if len(chunk) >= BACKFILL_CHUNK:
+                        aggregate.add(responses_matrix(chunk, answer_key.total))
+                        chunk = []
+                aggregate.add(responses_matrix(chunk, answer_key.total))
+            complete = True
+        finally:
+            with self._lock:
+                if self._backfilling.get(quiz_id) is running:
+                    del self._backfilling[quiz_id]
+                if complete:
+                    # Batches written after the backfill's read started were not in it
+                    late = [s for s in running.pending if _submission_key(s) not in seen]
+                    aggregate.add(responses_matrix(late, answer_key.total))
+                    self._aggregates[quiz_id] = aggregate
+            running.done.set()
+        return aggregate
+
+    def aggregate(self, quiz_id, answer_key=None):
+        """Return the current aggregate for a quiz, backfilling on first use or after a key change."""
+        if answer_key is None:
+            answer_key = self.resolve_answer_key(quiz_id)
+            if answer_key is None:
+                return None
+        with self._lock:
+            aggregate = self._aggregates.get(quiz_id)
+        if aggregate is None or aggregate.fingerprint != answer_key_fingerprint(answer_key):
+            aggregate = self.backfill(quiz_id, answer_key)
+        return aggregate
+
+    def report(self, quiz_id, answer_key=None):
+        aggregate = self.aggregate(quiz_id, answer_key)
+        if aggregate is None:
+            return None
+        with self._lock:
+            return aggregate.report()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_item_analysis():
+    """Return the process-wide ItemAnalysis, fed by the process-wide SubmissionWriter."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from submission_store import get_submission_writer
+
+                writer = get_submission_writer()
+                engine = ItemAnalysis(writer.backend)
+                writer.listeners.append(engine.on_batch)
+                _engine = engine
+    return _engine
@@ -0,0 +1,184 @@
+"""Memory-mapped question banks for very large quizzes.
+
+A bank is a JSON Lines file: the first line is the quiz header (title, timed,
+question_display, page_size, ...) and every following line is one question in
+the usual quiz schema. A sidecar "<bank>.idx" file stores the byte offset of
+every line, so opening a bank reads only the header and the offset table and
+each question is parsed from the memory-mapped file when it is first needed.
+
+Banks must be replaced atomically (write a new file, then os.replace) rather
+than rewritten in place, since open sessions keep reading the old mapping.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping, Sequence
+
+from quiz_cache import freeze, get_quiz_cache
+from quiz_compiler import CompiledQuiz, QuizSchemaError, answer_key_of, load_compiled
+
+BANK_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"QMIDX001"
+_INDEX_HEADER = struct.Struct("<8sqq")  # magic, source mtime_ns, source size
+
+
+def _scan_offsets(data):
+    """Return the start offset of every non-empty line, plus the end of data."""
+    offsets = array("Q")
+    start = 0
+    end = len(data)
+    while start < end:
+        newline = data.find(b"\n", start)
+        stop = end if newline == -1 else newline
+        if data[start:stop].strip():
+            offsets.append(start)
+        start = stop + 1
+    offsets.append(end)
+    return offsets
+
+
+def _read_index(index_path, st):
+    try:
+        with open(index_path, 'rb') as file:
+            magic, mtime_ns, size = _INDEX_HEADER.unpack(file.read(_INDEX_HEADER.size))
+            if magic != _INDEX_MAGIC or mtime_ns != st.st_mtime_ns or size != st.st_size:
+                return None
+            offsets = array("Q")
+            offsets.frombytes(file.read())
+            return offsets
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def _write_index(index_path, st, offsets):
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, st.st_mtime_ns, st.st_size))
+            file.write(offsets.tobytes())
+        os.replace(tmp_path, index_path)
+    except OSError:
+        # Read-only content storage: keep the in-memory index only
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+class BankQuestions(Sequence):
+    """Lazy, read-only sequence of the questions in a bank."""
+
+    def __init__(self, data, offsets):
+        self._data = data
+        # offsets[0] is the header line, offsets[-1] the end of the file
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("question index out of range")
+        start = self._offsets[index + 1]
+        stop = self._offsets[index + 2]
+        return freeze(json.loads(self._data[start:stop]))
+
+
+class QuestionBank(Mapping):
+    """A quiz backed by a memory-mapped JSON Lines bank.
+
+    Behaves like the frozen quiz dict returned for .json files: header fields
+    are plain keys and "questions" is a lazily parsed sequence.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            if st.st_size == 0:
+                raise QuizSchemaError(path, ["empty question bank"])
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_path = path + INDEX_SUFFIX
+        offsets = _read_index(index_path, st)
+        if offsets is None:
+            offsets = _scan_offsets(self._data)
+            _write_index(index_path, st, offsets)
+        if len(offsets) < 2:
+            raise QuizSchemaError(path, ["missing quiz header line"])
+        try:
+            header = json.loads(self._data[offsets[0]:offsets[1]])
+        except ValueError as exc:
+            raise QuizSchemaError(path, [f"invalid quiz header line: {exc}"]) from None
+        if not isinstance(header, dict) or "questions" in header:
+            raise QuizSchemaError(path, ["first line must be the quiz header"])
+        self._fields = dict(freeze(header))
+        self._fields["questions"] = BankQuestions(self._data, offsets)
+        self.index_bytes = offsets.itemsize * len(offsets)
+
+    def __getitem__(self, key):
+        return self._fields[key]
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+
+def open_question_bank(path):
+    """Loader for QuizCache: open a bank, building its sidecar index if needed."""
+    return QuestionBank(path)
+
+
+def bank_weight(bank, st):
+    """Cache weight of an open bank: its offset table, not the mapped file."""
+    return bank.index_bytes
+
+
+def quiz_loader(quiz_path):
+    """Return the (loader, weigh) pair QuizCache should use for this quiz file."""
+    if quiz_path.endswith(BANK_SUFFIX):
+        # Large banks are memory-mapped and parsed one question at a time
+        return open_question_bank, bank_weight
+    # .json quizzes come from their `quizmaster compile` artifact when current
+    return load_compiled, None
+
+
+def load_cached_quiz(quiz_path):
+    """Load a .json quiz or .jsonl bank through the shared QuizCache."""
+    value = get_quiz_cache().get(quiz_path, *quiz_loader(quiz_path))
+    return value.quiz if isinstance(value, CompiledQuiz) else value
+
+
+def load_quiz_uncached(quiz_path):
+    """Load a .json quiz or .jsonl bank without going through (or evicting from) the QuizCache.
+
+    For whole-level scans such as index builds, which touch every file once.
+    """
+    loader, _ = quiz_loader(quiz_path)
+    value = loader(quiz_path)
+    return value.quiz if isinstance(value, CompiledQuiz) else value
+
+
+def load_cached_answer_key(quiz_path):
+    """Return a quiz's AnswerKey, precompiled or built once per version of the file."""
+    return get_quiz_cache().derived(quiz_path, "answer_key", answer_key_of, *quiz_loader(quiz_path))
+
+
+def write_question_bank(quiz, path):
+    """Write a quiz dict as a JSON Lines bank (atomically) and index it."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    header = {k: v for k, v in quiz.items() if k != "questions"}
+    with open(tmp_path, 'w') as file:
+        file.write(json.dumps(header) + "\n")
+        for question in quiz["questions"]:
+            file.write(json.dumps(question) + "\n")
+    os.replace(tmp_path, path)
+    return QuestionBank(path)
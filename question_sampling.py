@@ -0,0 +1,255 @@
+"""Reproducible random exams drawn from large question banks.
+
+For every Quiz/<Topic>/<Level> directory a LevelIndex is built ahead of time:
+per question type, parallel arrays of (file, question number) references and,
+when questions carry a "weight", a Vose alias table for weighted draws. The
+index is pickled under CACHE_DIR and rebuilt only when a file in the level
+changes. Drawing an exam of N questions is O(N) and fetches just those N
+questions (bank questions come straight from the mmap via the bank's offset
+index), so a bank is never loaded whole.
+"""
+import os
+import pickle
+import random
+import threading
+import time
+from array import array
+
+from answer_key import with_quiz_scoring
+from question_bank import load_cached_quiz, load_quiz_uncached
+from quiz_cache import CACHE_DIR, freeze
+from quiz_compiler import QuizSchemaError
+from quiz_catalog import get_catalog
+
+QUESTION_TYPES = ("SCQ", "MCQ")
+MAX_REJECTIONS = 64  # repeated alias draws tolerated before switching to keyed sampling
+
+
+def build_alias_table(weights):
+    """Vose's alias method: O(n) build, O(1) per weighted draw."""
+    n = len(weights)
+    total = float(sum(weights))
+    if n == 0 or total <= 0:
+        raise ValueError("weights must contain a positive value")
+    prob = array("d", [0.0] * n)
+    alias = array("I", [0] * n)
+    scaled = [w * n / total for w in weights]
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        g = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = g
+        scaled[g] = scaled[g] + scaled[s] - 1.0
+        (small if scaled[g] < 1.0 else large).append(g)
+    for i in large + small:  # leftovers are 1.0 up to rounding
+        prob[i] = 1.0
+        alias[i] = i
+    return prob, alias
+
+
+class TypeGroup:
+    """All questions of one type in one level."""
+    __slots__ = ("file_ids", "question_nos", "weights", "prob", "alias")
+
+    def __init__(self):
+        self.file_ids = array("I")
+        self.question_nos = array("I")
+        self.weights = array("d")
+        self.prob = None
+        self.alias = None
+
+    def __len__(self):
+        return len(self.file_ids)
+
+    def finish(self):
+        if any(w != 1.0 for w in self.weights):
+            self.prob, self.alias = build_alias_table(self.weights)
+        else:
+            self.weights = array("d")  # uniform: plain index sampling, no table needed
+
+    def draw(self, rng, count):
+        """Pick count distinct positions.
+
+        O(count) expected, except for a weighted group when count * 2 > n or
+        when a few heavy questions make the alias draws keep repeating: those
+        fall back to Efraimidis-Spirakis keyed sampling, which sorts the
+        remaining keys in O(n log n).
+        """
+        n = len(self)
+        count = min(count, n)
+        if self.prob is None:
+            return rng.sample(range(n), count)
+        if count * 2 > n:
+            # Rejection gets slow when drawing most of the group; use keyed
+            # weighted sampling (Efraimidis-Spirakis) instead.
+            return self._keyed(rng, range(n), count)
+        picked = []
+        seen = set()
+        rejections = 0
+        while len(picked) < count:
+            column = rng.randrange(n)
+            i = column if rng.random() < self.prob[column] else self.alias[column]
+            if i not in seen:
+                seen.add(i)
+                picked.append(i)
+            else:
+                rejections += 1
+                if rejections > MAX_REJECTIONS:
+                    # Both are sequential weighted sampling without replacement,
+                    # so the keyed draw can pick up where the rejections left off
+                    rest = [j for j in range(n) if j not in seen]
+                    picked.extend(self._keyed(rng, rest, count - len(picked)))
+                    break
+        return picked
+
+    def _keyed(self, rng, positions, count):
+        keys = sorted(positions, key=lambda i: rng.random() ** (1.0 / self.weights[i]), reverse=True)
+        return keys[:count]
+
+
+class LevelIndex:
+    """Sampling index for one Quiz/<Topic>/<Level> directory."""
+    __slots__ = ("files", "groups")
+
+    def __init__(self, files, groups):
+        self.files = files  # [(file name, mtime_ns, size)]
+        self.groups = groups  # question type -> TypeGroup
+
+
+def level_signature(level_path, name):
+    st = os.stat(os.path.join(level_path, name))
+    return (name, st.st_mtime_ns, st.st_size)
+
+
+def build_level_index(base_path, topic, level):
+    """Read every quiz in a level once and group its questions by type.
+
+    Files are read around the shared QuizCache: a build touches every quiz in the
+    level once and would otherwise push out the quizzes learners are taking.
+    """
+    level_path = os.path.join(base_path, topic, level)
+    files = []
+    groups = {}
+    for file_id, name in enumerate(sorted(get_catalog(base_path).quizzes(topic, level))):
+        files.append(level_signature(level_path, name))
+        try:
+            quiz = load_quiz_uncached(os.path.join(level_path, name))
+        except QuizSchemaError:
+            continue  # malformed files are reported by `quizmaster compile`, not sampled
+        for question_no, question in enumerate(quiz["questions"]):
+            weight = float(question.get("weight", 1.0))
+            if weight <= 0:
+                continue  # weight 0 retires a question from random exams
+            group = groups.get(question.get("type"))
+            if group is None:
+                group = groups[question.get("type")] = TypeGroup()
+            group.file_ids.append(file_id)
+            group.question_nos.append(question_no)
+            group.weights.append(weight)
+    for group in groups.values():
+        group.finish()
+    return LevelIndex(files, groups)
+
+
+class SampleIndex:
+    """Process-wide, lazily loaded LevelIndexes persisted under CACHE_DIR.
+
+    Subclasses persist other per-level structures the same way by overriding
+    index_name and build(); the structure only needs a `files` signature list.
+    """
+    index_name = "sample_index"
+
+    def __init__(self, base_path="Quiz", cache_dir=CACHE_DIR, check_interval=2.0):
+        self.base_path = base_path
+        self.index_dir = os.path.join(cache_dir, self.index_name)
+        # Like the catalog, a level's files are re-stat'ed at most once per interval
+        self.check_interval = check_interval
+        self._levels = {}  # (topic, level) -> (LevelIndex, monotonic time last validated)
+        self._lock = threading.Lock()
+
+    def _index_path(self, topic, level):
+        return os.path.join(self.index_dir, topic, level + ".pickle")
+
+    def build(self, topic, level):
+        return build_level_index(self.base_path, topic, level)
+
+    def _is_current(self, index, topic, level):
+        level_path = os.path.join(self.base_path, topic, level)
+        names = sorted(get_catalog(self.base_path).quizzes(topic, level))
+        try:
+            return index.files == [level_signature(level_path, name) for name in names]
+        except FileNotFoundError:
+            return False
+
+    def level(self, topic, level):
+        """Return the LevelIndex for a level, rebuilding it only if a file changed."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._levels.get((topic, level))
+            if cached is not None:
+                index, checked_at = cached
+                if now - checked_at < self.check_interval:
+                    return index
+                if self._is_current(index, topic, level):
+                    self._levels[(topic, level)] = (index, now)
+                    return index
+            path = self._index_path(topic, level)
+            try:
+                with open(path, 'rb') as file:
+                    index = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                index = None
+            if index is None or not self._is_current(index, topic, level):
+                index = self.build(topic, level)
+                self._save(path, index)
+            self._levels[(topic, level)] = (index, now)
+            return index
+
+    def _save(self, path, index):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def counts(self, topic, level):
+        """Number of available questions per type."""
+        return {kind: len(group) for kind, group in self.level(topic, level).groups.items()}
+
+    def draw(self, topic, level, counts, seed):
+        """Assemble a reproducible exam: counts maps question type -> N."""
+        index = self.level(topic, level)
+        level_path = os.path.join(self.base_path, topic, level)
+        rng = random.Random(seed)
+        questions = []
+        for kind in sorted(counts):
+            group = index.groups.get(kind)
+            if group is None or counts[kind] <= 0:
+                continue
+            for position in group.draw(rng, counts[kind]):
+                name = index.files[group.file_ids[position]][0]
+                quiz = load_cached_quiz(os.path.join(level_path, name))
+                questions.append(with_quiz_scoring(quiz["questions"][group.question_nos[position]], quiz))
+        rng.shuffle(questions)
+        return freeze({
+            "title": f"{topic} {level}: random exam",
+            "question_display": "page",
+            "seed": seed,
+            "questions": questions,
+        })
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sample_index(base_path="Quiz"):
+    """Return the process-wide SampleIndex for base_path."""
+    key = os.path.abspath(base_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SampleIndex(base_path)
+        return index
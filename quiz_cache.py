@@ -0,0 +1,211 @@
+"""Shared, process-wide cache of parsed quiz files.
+
+Every session reruns load_quiz on each interaction, so hundreds of learners on
+the same exam would otherwise parse the same JSON thousands of times a second.
+Entries are validated against the file's mtime and size, evicted LRU once the
+entry count or byte budget is exceeded, and handed out frozen so that no
+session can mutate the copy every other session is reading.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Derived artifacts (indexes, snapshots, compiled quizzes) live next to the
+# Quiz tree, never inside it, so they can't show up as topics.
+CACHE_DIR = os.environ.get("QUIZMASTER_CACHE_DIR", ".quizmaster")
+
+
+class FrozenDict(dict):
+    """A dict that refuses in-place modification."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached quiz data is read-only; use thaw() for a private copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value):
+    """Recursively turn dicts into FrozenDicts and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Return a private, mutable deep copy of frozen quiz data (copy-on-write)."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def load_json(path):
+    """Parse a quiz JSON file into frozen form."""
+    with open(path, 'r') as file:
+        return freeze(json.load(file))
+
+
+class _Entry:
+    __slots__ = ("signature", "value", "nbytes", "uses", "lock", "derived")
+
+    def __init__(self, signature, value, nbytes, uses=1):
+        self.signature = signature
+        self.value = value
+        self.nbytes = nbytes
+        self.uses = uses  # lookups served, carried over when the file changes
+        self.lock = threading.Lock()
+        self.derived = {}  # name -> value computed once from this version of the file
+
+
+class QuizCache:
+    """Thread-safe LRU cache of parsed quizzes keyed on path + (mtime, size)."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        # The byte budget is accounted in source-file bytes, which tracks the
+        # parsed size closely enough to bound memory without walking objects.
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # path -> _Entry, least recently used first
+        self._lock = threading.Lock()
+        self._loading = {}  # path -> lock held while one thread parses it
+
+    def get(self, path, loader=load_json, weigh=None):
+        """Return the frozen contents of path, parsing it only if it changed.
+
+        weigh(value, stat) gives the bytes charged against the budget; by
+        default that is the size of the source file.
+        """
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                entry.uses += 1
+                self.hits += 1
+                return entry.value
+            load_lock = self._loading.setdefault(path, threading.Lock())
+
+        # Only one thread parses a given file; the others wait and reuse it.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(path)
+                    entry.uses += 1
+                    self.hits += 1
+                    return entry.value
+                self.misses += 1
+            try:
+                value = loader(path)
+                nbytes = st.st_size if weigh is None else weigh(value, st)
+                with self._lock:
+                    old = self._entries.get(path)
+                    self._store(path, _Entry(signature, value, nbytes, 1 if old is None else old.uses + 1))
+            finally:
+                # Also when the loader raises: a malformed file must not leave its lock behind
+                with self._lock:
+                    if self._loading.get(path) is load_lock:
+                        del self._loading[path]
+            return value
+
+    def derived(self, path, name, factory, loader=load_json, weigh=None):
+        """Return factory(quiz) for the current version of path, computing it once."""
+        value = self.get(path, loader, weigh)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None or entry.value is not value:
+            # Evicted or replaced between the two lookups; don't cache the result.
+            return factory(value)
+        with entry.lock:
+            if name not in entry.derived:
+                entry.derived[name] = factory(value)
+            return entry.derived[name]
+
+    def _store(self, path, entry):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self.total_bytes -= old.nbytes
+        self._entries[path] = entry
+        self.total_bytes += entry.nbytes
+        # Always keep the newest entry, even if it alone exceeds the budget.
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def invalidate(self, path=None):
+        """Drop one path, or everything when path is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.total_bytes = 0
+            else:
+                entry = self._entries.pop(path, None)
+                if entry is not None:
+                    self.total_bytes -= entry.nbytes
+
+    def peek(self, path):
+        """(signature, value) of a cached path without counting a lookup, or None."""
+        with self._lock:
+            entry = self._entries.get(path)
+            return None if entry is None else (entry.signature, entry.value)
+
+    def seed(self, path, signature, value, nbytes, uses=1):
+        """Insert a value loaded elsewhere (e.g. a warm-start snapshot) unless path is cached."""
+        with self._lock:
+            if path in self._entries:
+                return False
+            self._store(path, _Entry(signature, value, nbytes, uses))
+            return True
+
+    def most_used(self, limit):
+        """Paths of the cached quizzes with the most lookups, most used first."""
+        with self._lock:
+            ranked = sorted(self._entries.items(), key=lambda item: item[1].uses, reverse=True)
+        return [(path, entry.uses) for path, entry in ranked[:limit]]
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_quiz_cache():
+    """Return the process-wide quiz cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuizCache()
+    return _cache
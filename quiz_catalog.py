@@ -0,0 +1,170 @@
+"""Process-wide index of the Quiz/<Topic>/<Level>/<quiz>.json(l) tree.
+
+Streamlit re-executes the app script on every interaction, so listing the
+tree with os.listdir on each rerun costs a directory read plus an isdir stat
+per entry. The catalog walks the tree once, keeps it in memory and only
+re-reads a directory when its mtime changes (adding, removing or renaming an
+entry always bumps the parent directory's mtime).
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUIZ_SUFFIXES = (".json", ".jsonl")
+
+
+class _DirNode:
+    """Cached listing of one directory."""
+    __slots__ = ("mtime_ns", "entries", "checked_at")
+
+    def __init__(self, mtime_ns, entries, checked_at):
+        self.mtime_ns = mtime_ns
+        self.entries = entries
+        self.checked_at = checked_at
+
+
+class QuizCatalog:
+    """In-memory topic -> level -> quiz index with per-directory mtime checks."""
+
+    def __init__(self, base_path="Quiz", check_interval=2.0):
+        self.base_path = base_path
+        # Directories are re-stat'ed at most once per interval; within it the
+        # cached listing is served without touching the file system at all.
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._nodes = {}  # (topic, level) prefix tuple -> _DirNode
+        self.scans = 0
+
+    def _path(self, parts):
+        return os.path.join(self.base_path, *parts)
+
+    def _scan(self, parts, mtime_ns, now):
+        """Read one directory: sub-directories for root/topic, quiz files for a level."""
+        want_dirs = len(parts) < 2
+        entries = []
+        with os.scandir(self._path(parts)) as it:
+            for entry in it:
+                # scandir exposes d_type, so is_dir() normally needs no extra stat
+                if want_dirs:
+                    if entry.is_dir():
+                        entries.append(entry.name)
+                elif entry.name.endswith(QUIZ_SUFFIXES):
+                    entries.append(entry.name)
+        self.scans += 1
+        node = _DirNode(mtime_ns, entries, now)
+        self._nodes[parts] = node
+        return node
+
+    def _forget(self, parts):
+        for key in [k for k in self._nodes if k[:len(parts)] == parts]:
+            del self._nodes[key]
+
+    def _entries(self, parts):
+        now = time.monotonic()
+        with self._lock:
+            node = self._nodes.get(parts)
+            if node is not None and now - node.checked_at < self.check_interval:
+                return list(node.entries)
+            try:
+                mtime_ns = os.stat(self._path(parts)).st_mtime_ns
+            except FileNotFoundError:
+                self._forget(parts)
+                raise
+            if node is None or node.mtime_ns != mtime_ns:
+                node = self._scan(parts, mtime_ns, now)
+            else:
+                node.checked_at = now
+            return list(node.entries)
+
+    def snapshot(self):
+        """The cached listings as {parts: (mtime_ns, entries)}, for restore() in another process."""
+        with self._lock:
+            return {parts: (node.mtime_ns, list(node.entries)) for parts, node in self._nodes.items()}
+
+    def restore(self, snapshot):
+        """Adopt listings from snapshot() without touching the file system; returns how many.
+
+        Each adopted listing is re-checked by mtime on its first use, so one
+        that changed since the snapshot is rescanned then, like any other.
+        """
+        with self._lock:
+            for parts, (mtime_ns, entries) in snapshot.items():
+                self._nodes.setdefault(parts, _DirNode(mtime_ns, list(entries), float("-inf")))
+        return len(snapshot)
+
+    def build(self):
+        """Walk the whole tree once so the first learner does not pay for it."""
+        for topic in self.topics():
+            for level in self.levels(topic):
+                self.quizzes(topic, level)
+        return self
+
+    def build_in_background(self):
+        """Run build() in a daemon thread; failures are logged and left to first use."""
+        def run():
+            try:
+                self.build()
+            except OSError:
+                logger.exception("catalog build of %s failed", self.base_path)
+
+        thread = threading.Thread(target=run, name="catalog-build", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self):
+        """Re-check every known directory now, rescanning only those whose mtime changed."""
+        with self._lock:
+            for node in self._nodes.values():
+                node.checked_at = float("-inf")
+        return self.build()
+
+    def topics(self):
+        """List all quiz topics."""
+        return self._entries(())
+
+    def levels(self, topic):
+        """List all levels within a topic."""
+        return self._entries((topic,))
+
+    def quizzes(self, topic, level):
+        """List all quizzes within a level of a topic."""
+        return self._entries((topic, level))
+
+    def tree(self):
+        """Return the catalog as a nested {topic: {level: [quiz, ...]}} dict."""
+        return {
+            topic: {level: self.quizzes(topic, level) for level in self.levels(topic)}
+            for topic in self.topics()
+        }
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(base_path="Quiz"):
+    """Return the process-wide catalog for base_path.
+
+    The first call adopts the previous process's listings from the warm-start
+    snapshot (see quiz_prewarm) and leaves walking the tree to a background
+    thread, so no request waits for a full build: whatever is not known yet is
+    listed on first use, one directory at a time.
+    """
+    key = os.path.abspath(base_path)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                from quiz_prewarm import catalog_snapshot
+
+                catalog = QuizCatalog(base_path)
+                snapshot = catalog_snapshot(base_path)
+                if snapshot:
+                    catalog.restore(snapshot)
+                _catalogs[key] = catalog
+                catalog.build_in_background()
+    return catalog
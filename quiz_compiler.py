@@ -0,0 +1,381 @@
+"""Build-time validation and precompilation of the Quiz tree.
+
+`quizmaster compile` checks every quiz under Quiz/ against the schema below
+and normalizes it once: `timed` becomes seconds or None, `question_display`
+and `page_size` get their defaults, and every question gains an `answers`
+frozenset of 1-based option numbers (SCQ questions keep `answer` as well).
+The frozen quiz and its AnswerKey are pickled to CACHE_DIR/compiled, so the
+app loads a quiz without re-validating it or recompiling its answer key.
+
+A manifest records the (mtime, size) each artifact was built from; only
+changed files are rebuilt, in a process pool when there are many of them.
+Question banks (.jsonl) are validated but stay memory-mapped rather than
+being pickled whole.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+from answer_key import MCQ, POINT_SCALE, SCORING_FIELDS, SCQ, compile_answer_key
+from quiz_cache import CACHE_DIR, freeze
+
+QUESTION_DISPLAYS = ("all", "1", "page")
+DEFAULT_PAGE_SIZE = 10
+MANIFEST_NAME = "manifest.json"
+# Bumped whenever CompiledQuiz or AnswerKey change shape; older artifacts are rebuilt
+ARTIFACT_VERSION = 2
+# Below this many changed files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+
+class QuizSchemaError(ValueError):
+    """A quiz file does not match the schema; problems lists every violation."""
+
+    def __init__(self, path, problems):
+        super().__init__(f"{path}: " + "; ".join(problems))
+        self.path = path
+        self.problems = problems
+
+
+class CompiledQuiz:
+    """What a compiled artifact holds: the normalized quiz and its answer key."""
+    __slots__ = ("source", "signature", "quiz", "answer_key", "version")
+
+    def __init__(self, source, signature, quiz, answer_key):
+        self.version = ARTIFACT_VERSION
+        self.source = source
+        self.signature = signature  # (mtime_ns, size) of the source it was built from
+        self.quiz = quiz
+        self.answer_key = answer_key
+
+
+def time_limit(quiz):
+    """Seconds allowed for a quiz, or None when untimed (accepts raw and normalized quizzes)."""
+    timed = quiz.get("timed")
+    if timed is None or timed is False or timed == "no":
+        return None
+    if isinstance(timed, str):
+        timed = int(timed)
+    return int(timed) if timed > 0 else None
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate_tags(container, where):
+    tags = container.get("tags", ())
+    if not isinstance(tags, (list, tuple)) or not all(isinstance(tag, str) for tag in tags):
+        return [f"{where}tags: must be a list of strings"]
+    return []
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate_scoring(rules, where):
+    """Problems with the scoring fields of a question or of the quiz-level "scoring" object."""
+    problems = []
+    for field in ("points", "penalty", "min_points"):
+        if field not in rules:
+            continue
+        value = rules[field]
+        if not _is_number(value) or (field != "min_points" and value < 0):
+            kind = "a number" if field == "min_points" else "a non-negative number"
+            problems.append(f"{where}{field}: must be {kind}")
+        elif abs(value * POINT_SCALE - round(value * POINT_SCALE)) > 1e-9:
+            problems.append(f"{where}{field}: must be a multiple of {1 / POINT_SCALE}")
+    if "partial_credit" in rules and not isinstance(rules["partial_credit"], bool):
+        problems.append(f"{where}partial_credit: must be true or false")
+    return problems
+
+
+ASSET_FIELDS = ("image", "code_file")
+TEXT_FIELDS = ("image", "image_caption", "code", "code_file", "language")
+
+
+def _validate_assets(question, where, base_path):
+    from asset_cache import AssetError, resolve_asset
+
+    problems = []
+    for field in ASSET_FIELDS:
+        if isinstance(question.get(field), str):
+            try:
+                if not os.path.isfile(resolve_asset(base_path, question[field])):
+                    problems.append(f"{where}.{field}: {question[field]} does not exist")
+            except AssetError as exc:
+                problems.append(f"{where}.{field}: {exc}")
+    return problems
+
+
+def validate_question(question, where="question", base_path=None):
+    """Return the schema violations of one question as messages.
+
+    With base_path (the Quiz tree root) referenced asset files must exist too.
+    """
+    if not isinstance(question, dict):
+        return [f"{where}: must be an object"]
+    problems = []
+    kind = question.get("type")
+    if kind not in (SCQ, MCQ):
+        problems.append(f"{where}.type: must be {SCQ!r} or {MCQ!r}, not {kind!r}")
+    if not isinstance(question.get("question"), str):
+        problems.append(f"{where}.question: must be a string")
+    options = question.get("options")
+    if not isinstance(options, (list, tuple)) or not options:
+        problems.append(f"{where}.options: must be a non-empty list")
+        return problems
+    if not all(isinstance(option, str) for option in options):
+        problems.append(f"{where}.options: must all be strings")
+    if len(options) > 64:
+        problems.append(f"{where}.options: at most 64 options are supported")
+    if kind == SCQ:
+        answer = question.get("answer")
+        if not _is_int(answer) or not 1 <= answer <= len(options):
+            problems.append(f"{where}.answer: must be an option number from 1 to {len(options)}")
+    elif kind == MCQ:
+        answers = question.get("answers")
+        if (not isinstance(answers, (list, tuple)) or not answers
+                or not all(_is_int(a) and 1 <= a <= len(options) for a in answers)):
+            problems.append(f"{where}.answers: must be a non-empty list of option numbers "
+                            f"from 1 to {len(options)}")
+        elif len(set(answers)) != len(answers):
+            problems.append(f"{where}.answers: contains duplicates")
+    weight = question.get("weight", 1)
+    if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight < 0:
+        problems.append(f"{where}.weight: must be a non-negative number")
+    problems.extend(_validate_scoring(question, f"{where}."))
+    problems.extend(_validate_tags(question, f"{where}."))
+    for field in TEXT_FIELDS:
+        if field in question and not isinstance(question[field], str):
+            problems.append(f"{where}.{field}: must be a string")
+    if base_path is not None:
+        problems.extend(_validate_assets(question, where, base_path))
+    return problems
+
+
+def validate_header(quiz):
+    """Return the schema violations of the quiz-level fields."""
+    problems = []
+    if not isinstance(quiz.get("title"), str):
+        problems.append("title: must be a string")
+    try:
+        time_limit(quiz)
+    except (TypeError, ValueError):
+        problems.append(f"timed: must be \"no\" or a number of seconds, not {quiz.get('timed')!r}")
+    if quiz.get("question_display", "all") not in QUESTION_DISPLAYS:
+        problems.append(f"question_display: must be one of {', '.join(QUESTION_DISPLAYS)}")
+    page_size = quiz.get("page_size", DEFAULT_PAGE_SIZE)
+    if not _is_int(page_size) or page_size < 1:
+        problems.append("page_size: must be a positive integer")
+    scoring = quiz.get("scoring", {})
+    if not isinstance(scoring, dict):
+        problems.append("scoring: must be an object")
+    else:
+        problems.extend(f"scoring.{field}: unknown scoring rule" for field in scoring if field not in SCORING_FIELDS)
+        problems.extend(_validate_scoring(scoring, "scoring."))
+    problems.extend(_validate_tags(quiz, ""))
+    return problems
+
+
+def validate_quiz(quiz, base_path=None):
+    """Return every schema violation in a quiz dict (empty when valid)."""
+    if not isinstance(quiz, dict):
+        return ["quiz: must be an object"]
+    problems = validate_header(quiz)
+    questions = quiz.get("questions")
+    if not isinstance(questions, (list, tuple)):
+        problems.append("questions: must be a list")
+        return problems
+    for i, question in enumerate(questions, start=1):
+        problems.extend(validate_question(question, f"questions[{i}]", base_path))
+    return problems
+
+
+def normalize_question(question):
+    normalized = dict(question)
+    if question["type"] == SCQ:
+        normalized["answers"] = frozenset((question["answer"],))
+    else:
+        normalized["answers"] = frozenset(question["answers"])
+    return normalized
+
+
+def normalize_quiz(quiz):
+    """Return a validated quiz dict in normalized, frozen form."""
+    normalized = dict(quiz)
+    normalized["timed"] = time_limit(quiz)
+    normalized["question_display"] = quiz.get("question_display", "all")
+    normalized["page_size"] = quiz.get("page_size", DEFAULT_PAGE_SIZE)
+    normalized["questions"] = [normalize_question(q) for q in quiz["questions"]]
+    return freeze(normalized)
+
+
+def compile_quiz_file(path, base_path=None):
+    """Validate, normalize and compile one .json quiz; raises QuizSchemaError."""
+    st = os.stat(path)
+    try:
+        with open(path, 'r') as file:
+            raw = json.load(file)
+    except ValueError as exc:
+        raise QuizSchemaError(path, [f"invalid JSON: {exc}"]) from None
+    problems = validate_quiz(raw, base_path)
+    if problems:
+        raise QuizSchemaError(path, problems)
+    quiz = normalize_quiz(raw)
+    return CompiledQuiz(path, (st.st_mtime_ns, st.st_size), quiz, compile_answer_key(quiz))
+
+
+def validate_bank_file(path, base_path=None):
+    """Validate a .jsonl bank question by question; returns its question count."""
+    from question_bank import QuestionBank
+
+    try:
+        bank = QuestionBank(path)
+        problems = validate_header(bank)
+        for i, question in enumerate(bank["questions"], start=1):
+            problems.extend(validate_question(question, f"questions[{i}]", base_path))
+        count = len(bank["questions"])
+    except ValueError as exc:
+        raise QuizSchemaError(path, [f"invalid bank: {exc}"]) from None
+    if problems:
+        raise QuizSchemaError(path, problems)
+    return count
+
+
+def artifact_path(quiz_path, cache_dir=CACHE_DIR):
+    """Where the compiled artifact for a quiz file lives."""
+    digest = hashlib.sha1(os.path.abspath(quiz_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, "compiled", f"{digest}-{os.path.basename(quiz_path)}.pickle")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_compiled(quiz_path, cache_dir=CACHE_DIR):
+    """Return the CompiledQuiz for a .json quiz, from its artifact when that is current.
+
+    Files that have not been compiled (or changed since) are validated and
+    compiled in-process instead; QuizSchemaError reports a malformed file.
+    """
+    st = os.stat(quiz_path)
+    try:
+        with open(artifact_path(quiz_path, cache_dir), 'rb') as file:
+            compiled = pickle.load(file)
+        if (getattr(compiled, "version", None) == ARTIFACT_VERSION
+                and compiled.signature == (st.st_mtime_ns, st.st_size)):
+            return compiled
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    return compile_quiz_file(quiz_path)
+
+
+def answer_key_of(value):
+    """AnswerKey for a cached quiz: precompiled for CompiledQuiz, built for anything else."""
+    if isinstance(value, CompiledQuiz):
+        return value.answer_key
+    return compile_answer_key(value)
+
+
+def _compile_one(path, cache_dir, base_path):
+    """Worker: compile one file; returns (path, signature, questions, artifact, problems)."""
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    try:
+        if path.endswith(".jsonl"):
+            return path, signature, validate_bank_file(path, base_path), None, []
+        compiled = compile_quiz_file(path, base_path)
+        target = artifact_path(path, cache_dir)
+        _write_atomic(target, pickle.dumps(compiled, protocol=pickle.HIGHEST_PROTOCOL))
+        return path, compiled.signature, len(compiled.quiz["questions"]), target, []
+    except QuizSchemaError as exc:
+        return path, signature, 0, None, exc.problems
+
+
+class CompileReport:
+    __slots__ = ("compiled", "unchanged", "removed", "errors")
+
+    def __init__(self):
+        self.compiled = []
+        self.unchanged = []
+        self.removed = []
+        self.errors = {}  # path -> problems
+
+
+def _read_manifest(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def compile_tree(base_path="Quiz", cache_dir=CACHE_DIR, jobs=None, force=False):
+    """Compile every quiz under base_path, rebuilding only files that changed."""
+    from quiz_catalog import QuizCatalog
+
+    manifest_path = os.path.join(cache_dir, "compiled", MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+    report = CompileReport()
+
+    catalog = QuizCatalog(base_path, check_interval=0)
+    sources = []
+    for topic in catalog.topics():
+        for level in catalog.levels(topic):
+            for name in catalog.quizzes(topic, level):
+                sources.append(os.path.join(base_path, topic, level, name))
+
+    pending = []
+    for path in sources:
+        key = os.path.abspath(path)
+        entry = manifest.get(key)
+        st = os.stat(path)
+        if (not force and entry is not None and not entry.get("problems")
+                and entry.get("version") == ARTIFACT_VERSION
+                and (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size)
+                and (entry["artifact"] is None or os.path.exists(entry["artifact"]))):
+            report.unchanged.append(path)
+        else:
+            pending.append(path)
+
+    if len(pending) >= PARALLEL_THRESHOLD and jobs != 1:
+        # Imported here: multiprocessing is a noticeable share of the app's import time
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_compile_one, pending, [cache_dir] * len(pending),
+                                    [base_path] * len(pending), chunksize=4))
+    else:
+        results = [_compile_one(path, cache_dir, base_path) for path in pending]
+
+    for path, signature, questions, target, problems in results:
+        manifest[os.path.abspath(path)] = {
+            "mtime_ns": signature[0], "size": signature[1],
+            "questions": questions, "artifact": target, "problems": problems,
+            "version": ARTIFACT_VERSION,
+        }
+        if problems:
+            report.errors[path] = problems
+        else:
+            report.compiled.append(path)
+
+    current = {os.path.abspath(path) for path in sources}
+    for key in list(manifest):
+        if key.startswith(os.path.abspath(base_path) + os.sep) and key not in current:
+            artifact = manifest.pop(key)["artifact"]
+            if artifact:
+                try:
+                    os.remove(artifact)
+                except OSError:
+                    pass
+            report.removed.append(key)
+
+    _write_atomic(manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return report
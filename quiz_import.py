@@ -0,0 +1,499 @@
+"""Bulk import of quiz content drops, and streaming export of the whole tree.
+
+Sources are read one record at a time, never as a whole:
+- .zip and .tar(.gz/.bz2/.xz) archives holding <Topic>/<Level>/<quiz>.json(l)
+  files (any leading directories are ignored) and their
+  <Topic>/<Level>/assets/... files;
+- .jsonl files of {"topic", "level", "name", "quiz"} records, the format
+  export_jsonl() writes;
+- .csv files with one question per row (see CSV_COLUMNS), the rows of one
+  quiz next to each other.
+
+Quizzes are validated in a process pool, with a bounded number in flight, and
+compared by content digest with each other and with the quizzes already in
+the tree (digests of existing files are kept under CACHE_DIR and recomputed
+only for files that changed). New quizzes are written atomically; invalid
+ones and duplicates are reported and skipped. Archive assets are staged
+under CACHE_DIR and written once their level's quizzes have all passed, never
+over a different existing file without --overwrite. A source that cannot be
+read is reported like an invalid quiz. Afterwards the compiled
+artifacts and the search index are brought up to date. Running app processes
+notice the new files through the catalog's directory mtime checks.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from collections import deque
+
+from question_bank import BANK_SUFFIX
+from quiz_cache import CACHE_DIR
+from quiz_catalog import QUIZ_SUFFIXES, QuizCatalog
+from quiz_compiler import PARALLEL_THRESHOLD, _read_manifest, _write_atomic, validate_quiz
+
+DIGESTS_NAME = "content_digests.json"
+ASSETS_DIR = "assets"
+CSV_COLUMNS = ("topic", "level", "quiz", "type", "question", "options", "answer")
+CSV_OPTIONAL = ("title", "timed", "question_display", "tags")
+CSV_SEPARATOR = "|"  # between options, answer numbers and tags inside one cell
+# Raised while reading a whole source: missing file, bad archive, bad CSV header
+SOURCE_ERRORS = (OSError, ValueError, csv.Error, zipfile.BadZipFile, tarfile.TarError)
+
+
+class ImportReport:
+    __slots__ = ("imported", "replaced", "duplicates", "errors", "assets", "skipped")
+
+    def __init__(self):
+        self.imported = []  # paths written
+        self.replaced = []  # paths written over a different existing quiz (--overwrite)
+        self.duplicates = {}  # source name -> path of the identical quiz kept
+        self.errors = {}  # source name -> problems
+        self.assets = []  # asset paths written (or staged, in a dry run)
+        self.skipped = []  # archive members that are neither quizzes nor assets
+
+
+def _safe_name(part):
+    return bool(part) and part not in (".", "..") and not part.startswith(".") and "\\" not in part
+
+
+def _quiz_path(base_path, topic, level, name):
+    """Target path of a quiz, or None when a component is unsafe or the name is not a quiz file."""
+    if not all(_safe_name(part) for part in (topic, level, name)) or not name.endswith(QUIZ_SUFFIXES):
+        return None
+    return os.path.join(base_path, topic, level, name)
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_digest(quiz):
+    """sha256 of a quiz's content, independent of formatting and of .json vs .jsonl storage."""
+    digest = hashlib.sha256()
+    digest.update(_canonical({k: v for k, v in quiz.items() if k != "questions"}).encode())
+    for question in quiz["questions"]:
+        digest.update(b"\n")
+        digest.update(_canonical(question).encode())
+    return digest.hexdigest()
+
+
+def parse_quiz_bytes(name, data):
+    """Parse a .json quiz or a .jsonl bank from bytes into a quiz dict."""
+    if name.endswith(BANK_SUFFIX):
+        lines = [line for line in data.splitlines() if line.strip()]
+        if not lines:
+            raise ValueError("empty question bank")
+        header = json.loads(lines[0])
+        if not isinstance(header, dict) or "questions" in header:
+            raise ValueError("first line must be the quiz header")
+        return dict(header, questions=[json.loads(line) for line in lines[1:]])
+    return json.loads(data)
+
+
+def quiz_bytes(name, quiz):
+    """Serialize a quiz dict for a .json file or a .jsonl bank."""
+    if name.endswith(BANK_SUFFIX):
+        header = {k: v for k, v in quiz.items() if k != "questions"}
+        lines = [json.dumps(header, ensure_ascii=False)]
+        lines.extend(json.dumps(question, ensure_ascii=False) for question in quiz["questions"])
+        return ("\n".join(lines) + "\n").encode()
+    return (json.dumps(quiz, indent=2, ensure_ascii=False) + "\n").encode()
+
+
+# Records flowing through the pipeline: (source name, topic, level, quiz file name, payload)
+# where payload is the file's bytes (archives) or an already parsed quiz dict.
+
+
+def check_record(record):
+    """Worker: parse and validate one record; returns (record key, data to write, digest, problems)."""
+    source, topic, level, name, payload = record
+    try:
+        if isinstance(payload, bytes):
+            quiz = parse_quiz_bytes(name, payload)
+            data = payload
+        else:
+            quiz = payload
+            data = None
+        problems = validate_quiz(quiz)
+        if problems:
+            return source, topic, level, name, None, None, problems
+        if data is None:
+            data = quiz_bytes(name, quiz)
+        return source, topic, level, name, data, content_digest(quiz), []
+    except (ValueError, TypeError, AttributeError) as exc:
+        return source, topic, level, name, None, None, [f"unreadable quiz: {exc}"]
+
+
+def _split_member(member_name):
+    """(kind, topic, level, rest) for an archive member; kind is "quiz", "asset" or None."""
+    parts = [part for part in member_name.replace("\\", "/").split("/") if part]
+    if ASSETS_DIR in parts[:-1]:
+        i = len(parts) - 1 - parts[::-1].index(ASSETS_DIR)
+        if i >= 2:
+            return "asset", parts[i - 2], parts[i - 1], parts[i:]
+    if len(parts) >= 3 and parts[-1].endswith(QUIZ_SUFFIXES):
+        return "quiz", parts[-3], parts[-2], [parts[-1]]
+    return None, None, None, None
+
+
+def _iter_zip(path):
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                with archive.open(info) as member:
+                    yield info.filename, member.read()
+
+
+def _iter_tar(path):
+    # Stream mode: members are read in order and never seeked back to
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if info.isfile():
+                yield info.name, archive.extractfile(info).read()
+
+
+def _iter_jsonl(path):
+    with open(path, 'r', encoding="utf-8") as file:
+        for n, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            source = f"{path}:{n}"
+            try:
+                record = json.loads(line)
+                yield source, record["topic"], record["level"], record["name"], record["quiz"]
+            except (ValueError, KeyError, TypeError) as exc:
+                yield source, None, None, None, exc
+
+
+def _split_cell(value):
+    return [part.strip() for part in value.split(CSV_SEPARATOR)] if value and value.strip() else []
+
+
+def _csv_question(row):
+    options = _split_cell(row["options"])
+    answers = [int(answer) for answer in _split_cell(row["answer"])]
+    question = {"type": row["type"].strip().upper(), "question": row["question"], "options": options}
+    if question["type"] == "MCQ":
+        question["answers"] = answers
+    else:
+        question["answer"] = answers[0] if len(answers) == 1 else answers
+    return question
+
+
+def _csv_header(row):
+    quiz = {"title": row.get("title") or os.path.splitext(row["quiz"])[0]}
+    if row.get("timed"):
+        quiz["timed"] = int(row["timed"]) if row["timed"].isdigit() else row["timed"]
+    if row.get("question_display"):
+        quiz["question_display"] = row["question_display"]
+    if row.get("tags"):
+        quiz["tags"] = _split_cell(row["tags"])
+    return quiz
+
+
+def _iter_csv(path):
+    """One record per quiz; holds only the quiz being assembled."""
+    with open(path, 'r', encoding="utf-8", newline="") as file:
+        reader = csv.DictReader(file)
+        missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path}: missing CSV columns {', '.join(missing)}")
+        current, quiz, seen = None, None, set()
+        for n, row in enumerate(reader, start=2):
+            key = (row["topic"], row["level"], row["quiz"])
+            if key != current:
+                if current is not None:
+                    yield f"{path}:{'/'.join(current)}", *current, quiz
+                if key in seen:
+                    quiz = ValueError(f"line {n}: rows of {'/'.join(key)} must be next to each other")
+                else:
+                    quiz = dict(_csv_header(row), questions=[])
+                current = key
+                seen.add(key)
+            if isinstance(quiz, Exception):
+                continue
+            try:
+                quiz["questions"].append(_csv_question(row))
+            except (ValueError, IndexError) as exc:
+                quiz = ValueError(f"line {n}: {exc}")
+        if current is not None:
+            yield f"{path}:{'/'.join(current)}", *current, quiz
+
+
+def _source_format(path):
+    name = path.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")):
+        return "tar"
+    if name.endswith(".jsonl"):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"{path}: unsupported import format (zip, tar, jsonl or csv)")
+
+
+class ContentIndex:
+    """Digests of the quizzes in a tree, kept incrementally by (mtime, size)."""
+
+    def __init__(self, base_path="Quiz", cache_dir=CACHE_DIR, jobs=None):
+        self.base_path = base_path
+        self.path = os.path.join(cache_dir, DIGESTS_NAME)
+        self.jobs = jobs
+        self._entries = _read_manifest(self.path)  # abs path -> [mtime_ns, size, digest]
+        self.by_digest = {}  # digest -> path
+
+    def refresh(self):
+        if not os.path.isdir(self.base_path):
+            self._entries, self.by_digest = {}, {}
+            return self
+        catalog = QuizCatalog(self.base_path, check_interval=0)
+        paths = [os.path.join(self.base_path, topic, level, name)
+                 for topic in catalog.topics() for level in catalog.levels(topic)
+                 for name in catalog.quizzes(topic, level)]
+        stale = []
+        current = {}
+        for path in paths:
+            key = os.path.abspath(path)
+            st = os.stat(path)
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == [st.st_mtime_ns, st.st_size]:
+                current[key] = entry
+            else:
+                stale.append(path)
+        for path, entry in zip(stale, _map(digest_file, stale, self.jobs)):
+            if entry is not None:
+                current[os.path.abspath(path)] = entry
+        self._entries = current
+        self.by_digest = {entry[2]: path for path, entry in current.items()}
+        return self
+
+    def discard(self, path):
+        """Forget the digest of a file that is being replaced or removed."""
+        key = os.path.abspath(path)
+        entry = self._entries.pop(key, None)
+        if entry is None or self.by_digest.get(entry[2]) != key:
+            return
+        del self.by_digest[entry[2]]
+        for other, other_entry in self._entries.items():
+            if other_entry[2] == entry[2]:
+                self.by_digest[entry[2]] = other  # the same content is still elsewhere in the tree
+                break
+
+    def add(self, path, digest):
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        self.discard(key)
+        self._entries[key] = [st.st_mtime_ns, st.st_size, digest]
+        self.by_digest[digest] = key
+
+    def save(self):
+        _write_atomic(self.path, json.dumps(self._entries, sort_keys=True).encode())
+
+
+def digest_file(path):
+    """Worker: [mtime_ns, size, digest] of a quiz file, or None if it is unreadable."""
+    st = os.stat(path)
+    try:
+        with open(path, 'rb') as file:
+            quiz = parse_quiz_bytes(path, file.read())
+        return [st.st_mtime_ns, st.st_size, content_digest(quiz)]
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _map(fn, items, jobs):
+    if len(items) >= PARALLEL_THRESHOLD and jobs != 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(fn, items, chunksize=16))
+    return [fn(item) for item in items]
+
+
+class _PendingAssets:
+    """Archive assets held back in a staging directory until their level's quizzes are checked."""
+
+    def __init__(self, staging_dir, overwrite):
+        self.staging_dir = staging_dir  # None in a dry run: nothing is kept
+        self.overwrite = overwrite
+        self._items = []  # (source name, topic, level, target, staged path or None)
+
+    def add(self, source_name, topic, level, target, data, report):
+        if os.path.isfile(target):
+            with open(target, 'rb') as file:
+                if file.read() == data:
+                    return  # already in place
+            if not self.overwrite:
+                report.errors[source_name] = [f"{target} exists with different content (use --overwrite)"]
+                return
+        staged = None
+        if self.staging_dir is not None:
+            fd, staged = tempfile.mkstemp(dir=self.staging_dir)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+        self._items.append((source_name, topic, level, target, staged))
+
+    def commit(self, rejected, report):
+        """Write the staged assets of every level none of whose quizzes was rejected."""
+        for source_name, topic, level, target, staged in self._items:
+            if (topic, level) in rejected:
+                report.errors[source_name] = [f"not written: {topic}/{level} has rejected quizzes"]
+                continue
+            if staged is not None:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp_path = f"{target}.{os.getpid()}.tmp"
+                shutil.copyfile(staged, tmp_path)
+                os.replace(tmp_path, target)
+            report.assets.append(target)
+
+
+def _records(source, report, base_path, assets):
+    """Quiz records from a source; archive assets are handed to assets on the way."""
+    kind = _source_format(source)
+    if kind == "jsonl":
+        yield from _iter_jsonl(source)
+        return
+    if kind == "csv":
+        yield from _iter_csv(source)
+        return
+    members = _iter_zip(source) if kind == "zip" else _iter_tar(source)
+    for member_name, data in members:
+        member_kind, topic, level, rest = _split_member(member_name)
+        if member_kind == "quiz":
+            yield f"{source}:{member_name}", topic, level, rest[0], data
+        elif member_kind == "asset" and all(_safe_name(part) for part in [topic, level] + rest):
+            target = os.path.join(base_path, topic, level, *rest)
+            assets.add(f"{source}:{member_name}", topic, level, target, data, report)
+        else:
+            report.skipped.append(member_name)
+
+
+def _checked(records, report, jobs, window):
+    """Validate records in a process pool (in order), at most window in flight."""
+    buffered = []
+    for record in records:
+        if isinstance(record[4], Exception):
+            report.errors[record[0]] = [str(record[4])]
+            continue
+        buffered.append(record)
+        if len(buffered) >= PARALLEL_THRESHOLD and jobs != 1:
+            break
+    else:
+        # A small drop: not worth starting worker processes
+        yield from (check_record(record) for record in buffered)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        in_flight = deque(pool.submit(check_record, record) for record in buffered)
+        for record in records:
+            if isinstance(record[4], Exception):
+                report.errors[record[0]] = [str(record[4])]
+                continue
+            in_flight.append(pool.submit(check_record, record))
+            while len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def import_quizzes(source, base_path="Quiz", cache_dir=CACHE_DIR, jobs=None,
+                   overwrite=False, dry_run=False, window=64):
+    """Stream a content drop into the tree; returns an ImportReport.
+
+    Problems, including a source that cannot be read at all, are recorded in
+    report.errors rather than raised. Quizzes read before a source turned out
+    to be truncated are still imported; its assets are not written.
+    """
+    report = ImportReport()
+    index = ContentIndex(base_path, cache_dir, jobs).refresh()
+    staging_dir = None
+    if not dry_run:
+        os.makedirs(cache_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix="import-", dir=cache_dir)
+    assets = _PendingAssets(staging_dir, overwrite)
+    rejected = set()  # (topic, level) of quizzes not imported for a problem
+    try:
+        records = _records(source, report, base_path, assets)
+        for source_name, topic, level, name, data, digest, problems in _checked(records, report, jobs, window):
+            target = _quiz_path(base_path, topic, level, name)
+            if target is None:
+                report.errors[source_name] = [f"unsafe or unsupported quiz path {topic}/{level}/{name}"]
+                rejected.add((topic, level))
+                continue
+            if problems:
+                report.errors[source_name] = problems
+                rejected.add((topic, level))
+                continue
+            existing = index.by_digest.get(digest)
+            if existing is not None:
+                report.duplicates[source_name] = existing
+                continue
+            if os.path.exists(target):
+                if not overwrite:
+                    report.errors[source_name] = [f"{target} exists with different content (use --overwrite)"]
+                    rejected.add((topic, level))
+                    continue
+                report.replaced.append(target)
+            if not dry_run:
+                _write_atomic(target, data)
+                index.add(target, digest)
+            else:
+                index.discard(target)
+                index.by_digest[digest] = os.path.abspath(target)
+            report.imported.append(target)
+        assets.commit(rejected, report)
+    except SOURCE_ERRORS as exc:
+        report.errors[source] = [f"cannot read source: {exc}"]
+    finally:
+        if staging_dir is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        if not dry_run:
+            index.save()
+    return report
+
+
+def refresh_indexes(base_path="Quiz", cache_dir=CACHE_DIR, jobs=None):
+    """Recompile changed quizzes and re-index search after an import; returns the CompileReport."""
+    from quiz_compiler import compile_tree
+    from quiz_search import SearchIndex
+
+    report = compile_tree(base_path, cache_dir, jobs=jobs)
+    SearchIndex(base_path, cache_dir).refresh(force=True)
+    return report
+
+
+def export_jsonl(base_path="Quiz", out=None):
+    """Write every quiz as one {"topic", "level", "name", "quiz"} line; returns the count.
+
+    Only one quiz is in memory at a time, and banks are streamed question by
+    question from their memory map.
+    """
+    from question_bank import QuestionBank
+    from quiz_cache import load_json
+
+    catalog = QuizCatalog(base_path, check_interval=0)
+    count = 0
+    for topic in catalog.topics():
+        for level in catalog.levels(topic):
+            for name in catalog.quizzes(topic, level):
+                path = os.path.join(base_path, topic, level, name)
+                prefix = f'{{"topic": {json.dumps(topic)}, "level": {json.dumps(level)}, "name": {json.dumps(name)}, "quiz": '
+                if name.endswith(BANK_SUFFIX):
+                    bank = QuestionBank(path)
+                    header = {k: v for k, v in bank.items() if k != "questions"}
+                    out.write(prefix + json.dumps(header, ensure_ascii=False)[:-1])
+                    out.write(', "questions": [' if header else '"questions": [')
+                    for i, question in enumerate(bank["questions"]):
+                        out.write((", " if i else "") + json.dumps(question, ensure_ascii=False))
+                    out.write("]}}\n")
+                else:
+                    out.write(prefix + json.dumps(load_json(path), ensure_ascii=False) + "}\n")
+                count += 1
+    return count
@@ -0,0 +1,307 @@
+"""Low-overhead instrumentation for the rerun hot paths.
+
+Stage timings (catalog listing, quiz loading, rendering, grading, whole
+reruns) go into fixed-bucket histograms: recording one observation is a
+bisect and two additions under a lock. Gauges from other components (cache
+hit counters, submission queue depth, ...) are pulled lazily through
+registered collectors when the metrics are rendered.
+
+Everything is exposed in the Prometheus text format, either on a local HTTP
+endpoint (QUIZMASTER_METRICS_PORT) or rewritten periodically to a file
+(QUIZMASTER_METRICS_FILE). With QUIZMASTER_PROFILE=1 a sampling profiler can
+be switched on for single sessions; it writes collapsed stacks usable with
+flamegraph tools.
+"""
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from quiz_cache import CACHE_DIR
+
+# 100us .. ~13s, doubling
+DEFAULT_BUCKETS = tuple(0.0001 * 2 ** i for i in range(18))
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds."""
+    __slots__ = ("bounds", "counts", "total", "count", "_lock")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+STAGE_METRIC = "quizmaster_stage_seconds"
+_stages = {}
+_stages_lock = threading.Lock()
+_collectors = {}
+
+
+def stage_histogram(stage):
+    histogram = _stages.get(stage)
+    if histogram is None:
+        with _stages_lock:
+            histogram = _stages.setdefault(stage, Histogram())
+    return histogram
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of the with-block under stage."""
+    histogram = stage_histogram(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+def instrument(stage):
+    """Decorator form of timed()."""
+    def decorate(fn):
+        histogram = stage_histogram(stage)
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate
+
+
+def register_collector(name, collect):
+    """Register collect() -> iterable of (metric, type, help, value); replaces same name."""
+    _collectors[name] = collect
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Return all metrics in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {STAGE_METRIC} Time spent in each hot-path stage.",
+        f"# TYPE {STAGE_METRIC} histogram",
+    ]
+    for stage in sorted(_stages):
+        histogram = _stages[stage]
+        counts, total, count = histogram.snapshot()
+        cumulative = 0
+        for bound, n in zip(histogram.bounds + (float("inf"),), counts):
+            cumulative += n
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {_format_value(total)}')
+        lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {count}')
+    for name in sorted(_collectors):
+        try:
+            samples = list(_collectors[name]())
+        except Exception as exc:
+            lines.append(f"# collector {name} failed: {exc!r}")
+            continue
+        for metric, kind, help_text, value in samples:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a local port from a daemon thread."""
+    # Imported here so processes without a metrics port don't load http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_metrics_file(path, interval=15.0):
+    """Rewrite path with the current metrics every interval seconds (node-exporter textfile style)."""
+    def run():
+        while True:
+            time.sleep(interval)
+            write_metrics_file(path)
+
+    threading.Thread(target=run, name="metrics-file", daemon=True).start()
+
+
+def write_metrics_file(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Start the exporters configured by environment, once per process."""
+    global _exporters_started
+    if _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        port = os.environ.get("QUIZMASTER_METRICS_PORT")
+        if port:
+            start_metrics_server(int(port))
+        path = os.environ.get("QUIZMASTER_METRICS_FILE")
+        if path:
+            start_metrics_file(path)
+
+
+def profiling_enabled():
+    """True when QUIZMASTER_PROFILE=1 lets sessions opt into profiling with ?profile=1."""
+    return os.environ.get("QUIZMASTER_PROFILE") == "1"
+
+
+class SamplingProfiler:
+    """One background thread sampling the stacks of registered threads.
+
+    Threads are registered only while a profiled session's rerun is running,
+    so sessions that did not opt in pay nothing. Samples are merged into the
+    session's file every flush_interval seconds and then dropped from memory;
+    between flushes a session keeps at most max_stacks distinct stacks.
+    """
+
+    def __init__(self, interval=0.005, output_dir=os.path.join(CACHE_DIR, "profiles"),
+                 flush_interval=10.0, max_stacks=10000):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.max_stacks = max_stacks
+        self._targets = {}  # thread ident -> session id
+        # session id -> stack counts since the last flush
+        self._stacks = collections.defaultdict(collections.Counter)
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._targets:
+                    self._cond.wait()
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            samples = []
+            for ident, session_id in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                samples.append((session_id, ";".join(reversed(stack))))
+            with self._cond:
+                for session_id, stack in samples:
+                    stacks = self._stacks[session_id]
+                    if stack not in stacks and len(stacks) >= self.max_stacks:
+                        stack = "[other stacks]"
+                    stacks[stack] += 1
+            time.sleep(self.interval)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    @contextmanager
+    def profile(self, session_id):
+        """Sample the calling thread for the duration of the with-block."""
+        ident = threading.get_ident()
+        with self._cond:
+            self._targets[ident] = session_id
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+                threading.Thread(target=self._flush_periodically, name="profile-writer", daemon=True).start()
+            self._cond.notify()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._targets.pop(ident, None)
+
+    def flush(self):
+        """Merge the samples taken since the last flush into each session's file; returns the paths written."""
+        with self._cond:
+            pending, self._stacks = self._stacks, collections.defaultdict(collections.Counter)
+        return [self._merge(session_id, stacks) for session_id, stacks in pending.items() if stacks]
+
+    def _merge(self, session_id, stacks):
+        """Add stacks to the session's collapsed stacks file ("frame;frame;frame count" lines)."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{session_id}.folded")
+        try:
+            with open(path) as file:
+                for line in file:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    stacks[stack] += int(count)
+        except (OSError, ValueError):
+            pass
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+_profiler = None
+
+
+def get_profiler():
+    """Return the process-wide SamplingProfiler."""
+    global _profiler
+    if _profiler is None:
+        with _exporters_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+    return _profiler
@@ -0,0 +1,215 @@
+"""Warm start for new server processes.
+
+A fresh replica starts with an empty catalog and quiz cache, so the first
+learners pay for walking the Quiz tree and parsing the quizzes everyone is
+taking. Each process therefore keeps a snapshot under CACHE_DIR of what it
+has learned: the catalog listings with their directory mtimes, and the
+compiled form of its most used quizzes with the (mtime, size) they were read
+at. The next process's catalog adopts the listings as soon as it is created
+(see get_catalog) and checks them lazily by mtime; the quizzes are adopted in
+order of use by a background warm-up that stops once the startup budget is
+spent. Anything not prewarmed is simply loaded on first use as before.
+"""
+import atexit
+import logging
+import os
+import pickle
+import threading
+import time
+
+from quiz_cache import CACHE_DIR, get_quiz_cache
+from quiz_catalog import get_catalog
+from quiz_compiler import ARTIFACT_VERSION, CompiledQuiz
+from quiz_metrics import register_collector, stage_histogram
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_BUDGET = 0.5  # seconds
+MOST_USED = 32  # quizzes kept in the snapshot
+
+
+def snapshot_path(cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, "prewarm_snapshot.pickle")
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def take_snapshot(base_path="Quiz", limit=MOST_USED):
+    """What a later process needs to start warm, as a picklable dict."""
+    cache = get_quiz_cache()
+    quizzes = []
+    for path, uses in cache.most_used(limit):
+        entry = cache.peek(path)
+        if entry is None:
+            continue
+        signature, value = entry
+        # Question banks are memory-mapped and cheap to open; only carry compiled quizzes
+        quizzes.append((path, uses, signature, value if isinstance(value, CompiledQuiz) else None))
+    return {
+        "version": SNAPSHOT_VERSION,
+        "base_path": os.path.abspath(base_path),
+        "catalog": get_catalog(base_path).snapshot(),
+        "quizzes": quizzes,
+    }
+
+
+def write_snapshot(base_path="Quiz", cache_dir=CACHE_DIR):
+    """Atomically replace the snapshot file with this process's state."""
+    path = snapshot_path(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(take_snapshot(base_path), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(base_path="Quiz", cache_dir=CACHE_DIR):
+    """The previous process's snapshot for base_path, or None."""
+    try:
+        with open(snapshot_path(cache_dir), 'rb') as file:
+            snapshot = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if (not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION
+            or snapshot.get("base_path") != os.path.abspath(base_path)):
+        return None
+    return snapshot
+
+
+def _budget():
+    return float(os.environ.get("QUIZMASTER_PREWARM_BUDGET", DEFAULT_BUDGET))
+
+
+def catalog_snapshot(base_path="Quiz", cache_dir=CACHE_DIR):
+    """The catalog listings of the last snapshot for base_path, or None (also when warm start is off)."""
+    if _budget() <= 0:
+        return None
+    snapshot = read_snapshot(base_path, cache_dir)
+    return None if snapshot is None else snapshot.get("catalog")
+
+
+class PrewarmReport:
+    __slots__ = ("elapsed", "budget", "directories", "quizzes_seeded", "quizzes_loaded",
+                 "quizzes_stale", "quizzes_skipped")
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.elapsed = 0.0
+        self.directories = 0
+        self.quizzes_seeded = 0  # adopted from the snapshot without parsing
+        self.quizzes_loaded = 0  # loaded through the cache (changed files, banks)
+        self.quizzes_stale = 0  # gone from the tree since the snapshot
+        self.quizzes_skipped = 0  # left for first use when the budget ran out
+
+    def __repr__(self):
+        return (f"PrewarmReport(elapsed={self.elapsed:.3f}s, budget={self.budget}s, "
+                f"directories={self.directories}, seeded={self.quizzes_seeded}, "
+                f"loaded={self.quizzes_loaded}, stale={self.quizzes_stale}, skipped={self.quizzes_skipped})")
+
+
+def prewarm(base_path="Quiz", budget=DEFAULT_BUDGET, cache_dir=CACHE_DIR):
+    """Warm the quiz cache from the last snapshot, within budget seconds.
+
+    The catalog restores its own listings when get_catalog() first creates it;
+    this only makes sure that has happened.
+    """
+    from question_bank import load_cached_quiz
+
+    started = time.perf_counter()
+    deadline = started + budget
+    report = PrewarmReport(budget)
+    snapshot = read_snapshot(base_path, cache_dir) or {}
+    report.directories = len(get_catalog(base_path).snapshot())
+    cache = get_quiz_cache()
+    for i, (path, uses, signature, value) in enumerate(snapshot.get("quizzes", ())):
+        if time.perf_counter() >= deadline:
+            report.quizzes_skipped = len(snapshot["quizzes"]) - i
+            break
+        try:
+            current = _signature(path)
+        except OSError:
+            report.quizzes_stale += 1
+            continue
+        current_artifact = value is not None and getattr(value, "version", None) == ARTIFACT_VERSION
+        if current_artifact and current == signature:
+            if cache.seed(path, signature, value, current[1], uses):
+                report.quizzes_seeded += 1
+            continue
+        try:
+            load_cached_quiz(path)
+        except (OSError, ValueError):  # includes QuizSchemaError
+            report.quizzes_stale += 1
+            continue
+        report.quizzes_loaded += 1
+    report.elapsed = time.perf_counter() - started
+    stage_histogram("prewarm").observe(report.elapsed)
+    return report
+
+
+_report = None
+_started = False
+_prewarm_lock = threading.Lock()
+
+
+def _collect():
+    report = _report
+    if report is None:
+        return
+    yield "quizmaster_prewarm_seconds", "gauge", "Time spent warming caches at startup.", report.elapsed
+    yield "quizmaster_prewarm_quizzes", "gauge", "Quizzes in the cache after the startup warm-up.", \
+        report.quizzes_seeded + report.quizzes_loaded
+
+
+def start_snapshot_writer(base_path="Quiz", interval=60.0, cache_dir=CACHE_DIR):
+    """Rewrite the snapshot every interval seconds and once more at exit."""
+    def write():
+        try:
+            write_snapshot(base_path, cache_dir)
+        except OSError:
+            pass  # a read-only cache dir only costs the next process its warm start
+
+    def run():
+        while True:
+            time.sleep(interval)
+            write()
+
+    threading.Thread(target=run, name="prewarm-snapshot", daemon=True).start()
+    atexit.register(write)
+
+
+def _prewarm_in_background(base_path, budget):
+    global _report
+    try:
+        report = prewarm(base_path, budget)
+    except Exception:
+        logger.exception("prewarm failed")
+        report = PrewarmReport(budget)
+    _report = report
+    start_snapshot_writer(base_path)
+
+
+def prewarm_once(base_path="Quiz"):
+    """Start the warm-up and then the snapshot writer in a background thread, once per process.
+
+    Never blocks: returns the PrewarmReport once the warm-up has finished, else
+    None. QUIZMASTER_PREWARM_BUDGET sets the budget in seconds (0 disables both).
+    """
+    global _report, _started
+    if _started:
+        return _report
+    with _prewarm_lock:
+        if not _started:
+            budget = _budget()
+            register_collector("prewarm", _collect)
+            if budget > 0:
+                threading.Thread(target=_prewarm_in_background, args=(base_path, budget),
+                                 name="prewarm", daemon=True).start()
+            else:
+                _report = PrewarmReport(budget)
+            _started = True
+    return _report
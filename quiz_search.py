@@ -0,0 +1,359 @@
+"""Full-text and tag search over the quiz catalog.
+
+An inverted index maps every term in a quiz's title, tags, topic/level names,
+question texts and options to the quizzes containing it, with per-field
+weights (a hit in the title counts more than one in an option). Queries are
+answered from memory alone with BM25 ranking; the last query term also
+matches as a prefix, so results update while the learner types.
+
+The index follows the catalog: refresh() re-reads only quiz files whose
+(mtime, size) changed, drops deleted ones, and persists the result under
+CACHE_DIR so a restarted process does not re-read the whole tree. A refresh
+builds a new snapshot of the index while searches keep reading the last one,
+so the app runs it in a background thread and never waits for it.
+"""
+import bisect
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import time
+
+from question_bank import BANK_SUFFIX, open_question_bank
+from quiz_cache import CACHE_DIR, load_json
+from quiz_catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {"title": 5, "tags": 4, "path": 3, "question": 2, "option": 1}
+MAX_PREFIX_EXPANSIONS = 64
+_BM25_K1 = 1.2
+_BM25_B = 0.5
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to what which who why with".split())
+
+
+def tokenize(text):
+    """Lower-cased word tokens without stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class SearchResult:
+    __slots__ = ("topic", "level", "quiz", "title", "score")
+
+    def __init__(self, topic, level, quiz, title, score):
+        self.topic = topic
+        self.level = level
+        self.quiz = quiz
+        self.title = title
+        self.score = score
+
+    def __repr__(self):
+        return f"SearchResult({self.topic!r}, {self.level!r}, {self.quiz!r}, score={self.score:.3f})"
+
+
+def _tags(value):
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [tag for tag in value if isinstance(tag, str)]
+    return []
+
+
+def quiz_terms(topic, level, quiz):
+    """Weighted term frequencies for one quiz: term -> summed field weights."""
+    terms = {}
+
+    def add(text, field):
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + weight
+
+    add(f"{topic} {level}", "path")
+    if isinstance(quiz.get("title"), str):
+        add(quiz["title"], "title")
+    for tag in _tags(quiz.get("tags")):
+        add(tag, "tags")
+    for question in quiz.get("questions", ()):
+        if not isinstance(question, dict):
+            continue
+        if isinstance(question.get("question"), str):
+            add(question["question"], "question")
+        for option in question.get("options") or ():
+            if isinstance(option, str):
+                add(option, "option")
+        for tag in _tags(question.get("tags")):
+            add(tag, "tags")
+    return terms
+
+
+def _read_quiz(path):
+    # Read directly rather than through the QuizCache: indexing the whole tree
+    # would otherwise evict the quizzes learners are actually taking.
+    if path.endswith(BANK_SUFFIX):
+        return open_question_bank(path)
+    return load_json(path)
+
+
+class _Snapshot:
+    """One finished version of the index. Published whole and never changed afterwards."""
+    __slots__ = ("docs", "by_path", "postings", "total_length", "next_id", "vocabulary", "norms", "_owned")
+
+    def __init__(self, docs=None, postings=None, next_id=0):
+        self.docs = docs or {}  # doc id -> (topic, level, quiz, title, signature, length, terms)
+        self.by_path = {doc[:3]: doc_id for doc_id, doc in self.docs.items()}  # (topic, level, quiz) -> doc id
+        self.postings = postings or {}  # term -> {doc id: weighted term frequency}
+        self.total_length = sum(doc[5] for doc in self.docs.values())
+        self.next_id = next_id
+        self.vocabulary = None  # sorted terms for prefix lookups, built lazily
+        self.norms = None  # doc id -> BM25 length normalization, built lazily
+        self._owned = None  # terms whose postings this copy may change, while it is being built
+
+    def copy(self):
+        """A copy to build the next version in; postings are copied only when changed."""
+        snapshot = _Snapshot.__new__(_Snapshot)
+        snapshot.docs = dict(self.docs)
+        snapshot.by_path = dict(self.by_path)
+        snapshot.postings = dict(self.postings)
+        snapshot.total_length = self.total_length
+        snapshot.next_id = self.next_id
+        snapshot.vocabulary = self.vocabulary
+        snapshot.norms = None
+        snapshot._owned = set()
+        return snapshot
+
+    def _writable(self, term):
+        postings = self.postings.get(term)
+        if postings is None:
+            postings = self.postings[term] = {}
+            self._owned.add(term)
+            self.vocabulary = None
+        elif term not in self._owned:
+            postings = self.postings[term] = dict(postings)
+            self._owned.add(term)
+        return postings
+
+    def remove(self, doc_id):
+        topic, level, quiz, _, _, length, terms = self.docs.pop(doc_id)
+        del self.by_path[(topic, level, quiz)]
+        self.total_length -= length
+        for term in terms:
+            postings = self._writable(term)
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                self.vocabulary = None
+
+    def add(self, topic, level, name, title, signature, terms):
+        doc_id = self.next_id
+        self.next_id += 1
+        length = sum(terms.values())
+        self.docs[doc_id] = (topic, level, name, title, signature, length, tuple(terms))
+        self.by_path[(topic, level, name)] = doc_id
+        self.total_length += length
+        for term, frequency in terms.items():
+            self._writable(term)[doc_id] = frequency
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index over one Quiz tree.
+
+    refresh() builds the next snapshot next to the current one and then swaps
+    it in; search() reads whichever snapshot was last published and never
+    waits for a refresh.
+    """
+
+    def __init__(self, base_path="Quiz", cache_dir=CACHE_DIR, check_interval=30.0):
+        self.base_path = base_path
+        self.index_path = os.path.join(cache_dir, "search_index.pickle")
+        # Quiz files are re-stat'ed at most once per interval
+        self.check_interval = check_interval
+        self.checked_at = float("-inf")
+        self.reindexed = 0
+        self._build_lock = threading.Lock()  # one refresh at a time; search() never takes it
+        self._thread = None
+        self._snapshot = self._load() or _Snapshot()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if state.get("base_path") != os.path.abspath(self.base_path):
+            return None
+        return _Snapshot(state["docs"], state["postings"], state["next_id"])
+
+    def _save(self, snapshot):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        state = {
+            "base_path": os.path.abspath(self.base_path),
+            "docs": snapshot.docs,
+            "postings": snapshot.postings,
+            "next_id": snapshot.next_id,
+        }
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def _read(self, topic, level, name):
+        """Title and weighted terms of one quiz file, or None when it cannot be read."""
+        try:
+            quiz = _read_quiz(os.path.join(self.base_path, topic, level, name))
+            terms = quiz_terms(topic, level, quiz)
+            title = quiz.get("title") if isinstance(quiz.get("title"), str) else name
+        except (OSError, ValueError):
+            return None  # malformed files are reported by `quizmaster compile`
+        return title, terms
+
+    def _walk(self):
+        catalog = get_catalog(self.base_path)
+        for topic in catalog.topics():
+            try:
+                for level in catalog.levels(topic):
+                    for name in catalog.quizzes(topic, level):
+                        yield topic, level, name
+            except FileNotFoundError:
+                continue  # removed while we were walking
+
+    def _due(self):
+        return time.monotonic() - self.checked_at >= self.check_interval
+
+    def refresh(self, force=False):
+        """Re-index changed quiz files; at most once per check_interval unless forced."""
+        if not force and not self._due():
+            return False
+        with self._build_lock:
+            if not force and not self._due():
+                return False  # another refresh finished while we waited
+            self.checked_at = time.monotonic()
+            current = self._snapshot
+            snapshot = None
+            seen = set()
+            for topic, level, name in self._walk():
+                key = (topic, level, name)
+                seen.add(key)
+                try:
+                    st = os.stat(os.path.join(self.base_path, topic, level, name))
+                except FileNotFoundError:
+                    continue
+                signature = (st.st_mtime_ns, st.st_size)
+                doc_id = current.by_path.get(key)
+                if doc_id is not None and current.docs[doc_id][4] == signature:
+                    continue
+                if snapshot is None:
+                    snapshot = current.copy()
+                if doc_id is not None:
+                    snapshot.remove(doc_id)
+                document = self._read(topic, level, name)
+                if document is not None:
+                    snapshot.add(topic, level, name, document[0], signature, document[1])
+                    self.reindexed += 1
+            removed = [doc_id for key, doc_id in current.by_path.items() if key not in seen]
+            if removed and snapshot is None:
+                snapshot = current.copy()
+            for doc_id in removed:
+                snapshot.remove(doc_id)
+            if snapshot is None:
+                return False
+            snapshot._owned = None
+            self._snapshot = snapshot
+            self._save(snapshot)
+            return True
+
+    def refresh_in_background(self):
+        """Start refresh() in a daemon thread when one is due and none is running; returns at once."""
+        if not self._due() or self._build_lock.locked():
+            return False
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self._refresh_logged, name="search-index", daemon=True)
+        self._thread.start()
+        return True
+
+    def _refresh_logged(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("search index refresh failed")
+
+    @property
+    def refreshing(self):
+        thread = self._thread
+        return self._build_lock.locked() or (thread is not None and thread.is_alive())
+
+    @staticmethod
+    def _expand(snapshot, prefix):
+        vocabulary = snapshot.vocabulary
+        if vocabulary is None:
+            vocabulary = snapshot.vocabulary = sorted(snapshot.postings)
+        start = bisect.bisect_left(vocabulary, prefix)
+        terms = []
+        for term in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, limit=20):
+        """Rank quizzes for query; answered from memory without touching the files."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        complete_last = query[-1:].isspace()
+        snapshot = self._snapshot
+        n_docs = len(snapshot.docs)
+        if not n_docs:
+            return []
+        norms = snapshot.norms
+        if norms is None:
+            average_length = snapshot.total_length / n_docs
+            norms = snapshot.norms = {
+                doc_id: _BM25_K1 * (1.0 - _BM25_B + _BM25_B * doc[5] / average_length)
+                for doc_id, doc in snapshot.docs.items()}
+        scores = {}
+        matched = {}
+        for position, term in enumerate(terms):
+            if position == len(terms) - 1 and not complete_last:
+                candidates = self._expand(snapshot, term)
+            else:
+                candidates = [term] if term in snapshot.postings else []
+            hits = {}
+            for candidate in candidates:
+                postings = snapshot.postings[candidate]
+                idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                # An exact match outranks the same word reached as a prefix
+                weight = idf * (_BM25_K1 + 1.0) * (1.0 if candidate == term else 0.8)
+                for doc_id, frequency in postings.items():
+                    value = weight * frequency / (frequency + norms[doc_id])
+                    if value > hits.get(doc_id, 0.0):
+                        hits[doc_id] = value
+            for doc_id, value in hits.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + value
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+        # Quizzes matching more of the query terms come first, then by score
+        ranked = heapq.nlargest(limit, scores, key=lambda d: (matched[d], scores[d]))
+        return [SearchResult(*snapshot.docs[d][:4], scores[d]) for d in ranked]
+
+    def __len__(self):
+        return len(self._snapshot.docs)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(base_path="Quiz"):
+    """Return the process-wide SearchIndex for base_path."""
+    key = os.path.abspath(base_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SearchIndex(base_path)
+        return index
@@ -0,0 +1,159 @@
+"""One deadline scheduler per process for timed quizzes.
+
+Streamlit only runs code when a learner interacts, so a time limit checked in
+the script is enforced late or never. The TimerScheduler keeps every active
+deadline in a heap, served by a single background thread, and runs a timer's
+callback (grading the attempt) exactly once: either when the learner submits
+or when the deadline passes, whichever happens first.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_FIRE = 0
+_DROP = 1
+
+
+class _Timer:
+    __slots__ = ("deadline", "callback", "claimed", "expired", "result", "finished")
+
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.claimed = False
+        self.expired = False
+        self.result = None
+        self.finished = threading.Event()
+
+
+class TimerScheduler:
+    """Heap of (deadline, timer) served by one daemon thread."""
+
+    def __init__(self, retention=3600.0):
+        # Finished timers keep their result this long so the next rerun can show it
+        self.retention = retention
+        self.fired = 0
+        self._heap = []
+        self._timers = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _push(self, when, action, key, timer):
+        heapq.heappush(self._heap, (when, next(self._seq), action, key, timer))
+        self._cond.notify()
+
+    def schedule(self, key, deadline, callback):
+        """Run callback() at deadline (epoch seconds) unless submit() runs it first."""
+        with self._cond:
+            timer = _Timer(deadline, callback)
+            self._timers[key] = timer
+            self._push(deadline, _FIRE, key, timer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quiz-timer", daemon=True)
+                self._thread.start()
+        return timer
+
+    def rebind(self, key, callback):
+        """Replace a pending timer's callback; False if there is none or it has run."""
+        with self._cond:
+            timer = self._timers.get(key)
+            if timer is None or timer.claimed:
+                return False
+            timer.callback = callback
+            return True
+
+    def cancel(self, key):
+        with self._cond:
+            self._timers.pop(key, None)
+
+    def deadline(self, key):
+        timer = self._timers.get(key)
+        return None if timer is None else timer.deadline
+
+    def is_finished(self, key):
+        """True once the attempt has been graded, by submit() or by expiry."""
+        timer = self._timers.get(key)
+        return timer is not None and timer.claimed
+
+    def is_expired(self, key):
+        timer = self._timers.get(key)
+        return timer is not None and timer.expired
+
+    def result(self, key, timeout=None):
+        """Return the callback's result, waiting for it if grading is in progress."""
+        timer = self._timers.get(key)
+        if timer is None or not timer.claimed:
+            return None
+        timer.finished.wait(timeout)
+        return timer.result
+
+    def _claim(self, key, expired):
+        # Caller holds self._cond
+        timer = self._timers.get(key)
+        if timer is None or timer.claimed:
+            return timer, False
+        timer.claimed = True
+        timer.expired = expired
+        self._push(time.time() + self.retention, _DROP, key, timer)
+        return timer, True
+
+    def _finish(self, timer):
+        try:
+            timer.result = timer.callback()
+        except Exception:
+            logger.exception("timer callback failed")
+        finally:
+            timer.finished.set()
+
+    def submit(self, key):
+        """Grade the attempt now, unless expiry already did; returns the result either way."""
+        with self._cond:
+            timer = self._timers.get(key)
+            if timer is None:
+                raise KeyError(key)
+            timer, claimed = self._claim(key, expired=time.time() >= timer.deadline)
+        if claimed:
+            self._finish(timer)
+        timer.finished.wait()
+        return timer.result
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                when, _, action, key, timer = self._heap[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if self._timers.get(key) is not timer:
+                    continue  # cancelled or replaced by a newer attempt
+                if action == _DROP:
+                    del self._timers[key]
+                    continue
+                timer, claimed = self._claim(key, expired=True)
+                if not claimed:
+                    continue
+                self.fired += 1
+            self._finish(timer)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_timer_scheduler():
+    """Return the process-wide TimerScheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TimerScheduler()
+    return _scheduler
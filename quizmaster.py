@@ -0,0 +1,242 @@
+"""QuizMaster command line tools.
+
+    python quizmaster.py grade Quiz/Python/Basics/Python_Quiz1.json submissions.jsonl
+    python quizmaster.py bank Quiz/Python/Basics/Python_Quiz1.json
+    python quizmaster.py compile Quiz
+    python quizmaster.py analyze Quiz/Python/Basics/Python_Quiz1.json
+    python quizmaster.py import content_drop.zip
+    python quizmaster.py export -o quizzes.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def read_quiz(path):
+    """Load a quiz from a .json file or a .jsonl question bank."""
+    from question_bank import BANK_SUFFIX, QuestionBank
+    from quiz_cache import load_json
+
+    if path.endswith(BANK_SUFFIX):
+        return QuestionBank(path)
+    return load_json(path)
+
+
+def cmd_grade(args):
+    """Re-grade stored submissions against a quiz's current answer key."""
+    from answer_key import compile_answer_key
+    import batch_grading
+
+    answer_key = compile_answer_key(read_quiz(args.quiz))
+
+    started = time.perf_counter()
+    if args.submissions.endswith(".npz"):
+        encoded = batch_grading.load_encoded(args.submissions)
+    else:
+        encoded = batch_grading.encode_submissions(
+            answer_key, batch_grading.read_submissions(args.submissions)
+        )
+    encoded_at = time.perf_counter()
+    report = batch_grading.grade(answer_key, encoded)
+    graded_at = time.perf_counter()
+
+    if args.save_encoded:
+        batch_grading.save_encoded(args.save_encoded, encoded)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for submission_id, score in zip(report.ids, report.scores.tolist()):
+            out.write(json.dumps({"id": submission_id, "score": score, "total": report.total}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.stats:
+        with open(args.stats, 'w') as file:
+            json.dump({"submissions": len(encoded), "questions": report.question_stats}, file, indent=2)
+
+    print(
+        f"graded {len(encoded)} submissions "
+        f"(encode {encoded_at - started:.3f}s, score {graded_at - encoded_at:.3f}s)",
+        file=sys.stderr,
+    )
+
+
+def cmd_bank(args):
+    """Convert quiz JSON files to memory-mapped JSON Lines banks, or (re)index banks."""
+    from question_bank import BANK_SUFFIX, QuestionBank, write_question_bank
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for path in args.files:
+        if path.endswith(BANK_SUFFIX):
+            bank = QuestionBank(path)
+            target = path
+        else:
+            with open(path, 'r') as file:
+                quiz = json.load(file)
+            if args.output and len(args.files) == 1:
+                target = args.output
+            elif args.output_dir:
+                target = os.path.join(args.output_dir, os.path.basename(path) + "l")
+            else:
+                target = path + "l"
+            bank = write_question_bank(quiz, target)
+            if args.replace and target == path + "l":
+                # The app lists both .json and .jsonl files; the quiz id changes with the suffix
+                os.remove(path)
+        print(f"{target}: {len(bank['questions'])} questions indexed", file=sys.stderr)
+
+
+def cmd_compile(args):
+    """Validate the quiz tree and rebuild the precompiled artifacts that changed."""
+    from quiz_cache import CACHE_DIR
+    from quiz_compiler import compile_tree
+
+    started = time.perf_counter()
+    report = compile_tree(args.base_path, args.cache_dir or CACHE_DIR, jobs=args.jobs, force=args.force)
+    for path, problems in sorted(report.errors.items()):
+        for problem in problems:
+            print(f"{path}: {problem}", file=sys.stderr)
+    print(
+        f"compiled {len(report.compiled)}, unchanged {len(report.unchanged)}, "
+        f"removed {len(report.removed)}, invalid {len(report.errors)} "
+        f"({time.perf_counter() - started:.3f}s)",
+        file=sys.stderr,
+    )
+    return 1 if report.errors else 0
+
+
+def cmd_analyze(args):
+    """Item analysis (difficulty, discrimination, distractors) from stored submissions."""
+    from answer_key import compile_answer_key
+    from item_analysis import ItemAnalysis
+    from submission_store import DEFAULT_DB_PATH, SQLiteSubmissionBackend
+
+    answer_key = compile_answer_key(read_quiz(args.quiz))
+    quiz_id = args.quiz_id or os.path.relpath(args.quiz, args.base_path)
+    started = time.perf_counter()
+    report = ItemAnalysis(SQLiteSubmissionBackend(args.db or DEFAULT_DB_PATH)).report(quiz_id, answer_key)
+    elapsed = time.perf_counter() - started
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        json.dump(report, out, indent=2)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"analyzed {report['submissions']} submissions of {quiz_id} ({elapsed:.3f}s)", file=sys.stderr)
+
+
+def cmd_import(args):
+    """Stream quizzes from archives, JSON Lines or CSV into the tree, skipping duplicates."""
+    from quiz_cache import CACHE_DIR
+    from quiz_import import import_quizzes, refresh_indexes
+
+    cache_dir = args.cache_dir or CACHE_DIR
+    started = time.perf_counter()
+    failed = False
+    try:
+        for source in args.sources:
+            report = import_quizzes(source, args.base_path, cache_dir, jobs=args.jobs,
+                                    overwrite=args.overwrite, dry_run=args.dry_run)
+            for name, problems in report.errors.items():
+                for problem in problems:
+                    print(f"{name}: {problem}", file=sys.stderr)
+            for name, existing in report.duplicates.items():
+                print(f"{name}: duplicate of {existing}, skipped", file=sys.stderr)
+            print(
+                f"{source}: imported {len(report.imported)} (replaced {len(report.replaced)}), "
+                f"duplicates {len(report.duplicates)}, invalid {len(report.errors)}, assets {len(report.assets)}",
+                file=sys.stderr,
+            )
+            failed = failed or bool(report.errors)
+    finally:
+        # Whatever was written before a failure still has to reach the artifacts and search
+        if not args.dry_run and not args.no_refresh and os.path.isdir(args.base_path):
+            report = refresh_indexes(args.base_path, cache_dir, jobs=args.jobs)
+            for path, problems in sorted(report.errors.items()):
+                for problem in problems:
+                    print(f"{path}: {problem}", file=sys.stderr)
+            print(f"compiled {len(report.compiled)}, search index refreshed", file=sys.stderr)
+    print(f"done ({time.perf_counter() - started:.3f}s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_export(args):
+    """Write every quiz in the tree as JSON Lines, one quiz per line, streaming."""
+    from quiz_import import export_jsonl
+
+    started = time.perf_counter()
+    out = open(args.output, 'w', encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = export_jsonl(args.base_path, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"exported {count} quizzes ({time.perf_counter() - started:.3f}s)", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="quizmaster", description="QuizMaster command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    grade = commands.add_parser("grade", help="re-grade stored submissions in bulk")
+    grade.add_argument("quiz", help="quiz .json file or .jsonl bank holding the answer key")
+    grade.add_argument("submissions", help="submissions as JSON Lines, or .npz saved by --save-encoded")
+    grade.add_argument("-o", "--output", help="write per-submission scores (JSON Lines) here instead of stdout")
+    grade.add_argument("--stats", help="write per-question statistics as JSON to this file")
+    grade.add_argument("--save-encoded", help="also store the encoded submissions as .npz for fast re-grades")
+    grade.set_defaults(func=cmd_grade)
+
+    bank = commands.add_parser("bank", help="convert quiz JSON to an indexed JSON Lines question bank")
+    bank.add_argument("files", nargs="+", help="quiz .json files to convert, or .jsonl banks to index")
+    bank.add_argument("-o", "--output", help="bank path when converting a single file (default: <file>.jsonl)")
+    bank.add_argument("--output-dir", help="write <name>.jsonl banks into this directory")
+    bank.add_argument("--replace", action="store_true",
+                      help="remove <file>.json once <file>.jsonl is written (a new quiz id for stored attempts)")
+    bank.set_defaults(func=cmd_bank)
+
+    compile_ = commands.add_parser("compile", help="validate quizzes and precompile them for the app")
+    compile_.add_argument("base_path", nargs="?", default="Quiz", help="quiz tree to compile (default: Quiz)")
+    compile_.add_argument("--cache-dir", help="where artifacts are written (default: QUIZMASTER_CACHE_DIR or .quizmaster)")
+    compile_.add_argument("-j", "--jobs", type=int, help="worker processes for large trees (default: one per CPU)")
+    compile_.add_argument("--force", action="store_true", help="rebuild every artifact, changed or not")
+    compile_.set_defaults(func=cmd_compile)
+
+    analyze = commands.add_parser("analyze", help="item analysis of a quiz from the stored submissions")
+    analyze.add_argument("quiz", help="quiz .json file or .jsonl bank holding the answer key")
+    analyze.add_argument("--db", help="submissions database (default: QUIZMASTER_SUBMISSIONS_DB or .quizmaster)")
+    analyze.add_argument("--base-path", default="Quiz", help="quiz tree the app serves (default: Quiz)")
+    analyze.add_argument("--quiz-id", help="quiz id the submissions were stored under (default: path below --base-path)")
+    analyze.add_argument("-o", "--output", help="write the report as JSON here instead of stdout")
+    analyze.set_defaults(func=cmd_analyze)
+
+    import_ = commands.add_parser("import", help="bulk import quizzes from zip/tar archives, JSON Lines or CSV")
+    import_.add_argument("sources", nargs="+", help=".zip, .tar[.gz|.bz2|.xz], .jsonl or .csv files")
+    import_.add_argument("--base-path", default="Quiz", help="quiz tree to import into (default: Quiz)")
+    import_.add_argument("--cache-dir", help="where digests and artifacts are kept (default: QUIZMASTER_CACHE_DIR or .quizmaster)")
+    import_.add_argument("-j", "--jobs", type=int, help="validation worker processes (default: one per CPU)")
+    import_.add_argument("--overwrite", action="store_true", help="replace existing quizzes whose content differs")
+    import_.add_argument("--dry-run", action="store_true", help="validate and report without writing anything")
+    import_.add_argument("--no-refresh", action="store_true", help="skip recompiling and re-indexing afterwards")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="export every quiz in the tree as JSON Lines")
+    export.add_argument("base_path", nargs="?", default="Quiz", help="quiz tree to export (default: Quiz)")
+    export.add_argument("-o", "--output", help="write here instead of stdout")
+    export.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
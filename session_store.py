@@ -0,0 +1,271 @@
+"""Checkpointing quiz progress outside the Streamlit process.
+
+st.session_state lives in one server process, so a learner is tied to the
+node that served their first request and loses the attempt when it restarts.
+After every rerun the quiz-relevant keys (CHECKPOINT_KEYS) are pickled and
+compared with what was last written for the session; only fields that
+changed are upserted (and removed ones deleted), so a typical rerun writes one
+or two small rows. A new process given the session id (the app keeps it in
+the URL, or derives it from a login cookie) restores the state from the
+backend and carries on.
+
+Backends implement SessionBackend. SQLite (shared by processes on one host or
+a network volume) and an append-only file log are provided; a networked store
+only needs the same three methods.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from quiz_cache import CACHE_DIR
+
+# The answers and current_question_index are restored by the autosaver instead,
+# unless autosave is off: then ANSWER_KEYS are checkpointed along with the rest
+CHECKPOINT_KEYS = (
+    "session_id", "quiz_complete", "score",
+    "is_timed", "start_time", "end_time", "time_limit", "timer_quiz_id", "timer_initialized", "quiz_deadlines",
+    "graded_quiz_id", "graded_score", "grading_job",
+    "exam_seed", "exam_id", "adaptive_seed", "adaptive_attempt", "adaptive_graded",
+    "selected_topic", "selected_level", "selected_mode", "selected_quiz",
+)
+
+ANSWER_KEYS = ("answer_store", "current_question_index")
+
+DEFAULT_SESSION_DB_PATH = os.environ.get(
+    "QUIZMASTER_SESSION_DB", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+
+
+def cookie_session_id(value):
+    """Session id derived from a login cookie's value, for QUIZMASTER_SESSION_COOKIE."""
+    return hashlib.sha256(b"quizmaster-session\0" + value.encode()).hexdigest()[:32]
+
+
+class SessionBackend:
+    """Storage interface used by the SessionCheckpointer; values are pickled bytes."""
+
+    def load(self, session_id):
+        """Return {name: bytes} for a session, or None if it is unknown."""
+        raise NotImplementedError
+
+    def apply(self, session_id, changed, removed):
+        """Upsert changed {name: bytes} and delete the removed names, atomically."""
+        raise NotImplementedError
+
+    def purge(self, before):
+        """Forget sessions not updated since the epoch time before."""
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """One row per (session, field) in a local SQLite database (WAL mode)."""
+
+    def __init__(self, path=DEFAULT_SESSION_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Script threads share the connection; the lock serializes them
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_fields ("
+            " session_id TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " PRIMARY KEY (session_id, name))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " updated_at REAL NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, value FROM session_fields WHERE session_id = ?", (session_id,)).fetchall()
+        return dict(rows) if rows else None
+
+    def apply(self, session_id, changed, removed):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO session_fields (session_id, name, value) VALUES (?, ?, ?)",
+                [(session_id, name, value) for name, value in changed.items()])
+            self._conn.executemany(
+                "DELETE FROM session_fields WHERE session_id = ? AND name = ?",
+                [(session_id, name) for name in removed])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, updated_at) VALUES (?, ?)",
+                (session_id, time.time()))
+
+    def purge(self, before):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM session_fields WHERE session_id IN"
+                " (SELECT session_id FROM sessions WHERE updated_at < ?)", (before,))
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (before,))
+
+    def close(self):
+        self._conn.close()
+
+
+class FileSessionBackend(SessionBackend):
+    """Append-only log of diffs per session, compacted once it grows long."""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "sessions"), compact_after=64):
+        self.directory = directory
+        self.compact_after = compact_after
+        os.makedirs(directory, exist_ok=True)
+        self._appends = {}  # session id -> diffs appended since the last compaction
+        self._lock = threading.Lock()
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.log")
+
+    def _replay(self, path):
+        fields = {}
+        with open(path, 'rb') as file:
+            while True:
+                try:
+                    changed, removed = pickle.load(file)
+                except EOFError:
+                    break
+                except pickle.UnpicklingError:
+                    break  # torn final record from a crash; keep what came before
+                fields.update(changed)
+                for name in removed:
+                    fields.pop(name, None)
+        return fields
+
+    def load(self, session_id):
+        try:
+            return self._replay(self._path(session_id)) or None
+        except FileNotFoundError:
+            return None
+
+    def apply(self, session_id, changed, removed):
+        path = self._path(session_id)
+        with self._lock:
+            with open(path, 'ab') as file:
+                pickle.dump((changed, list(removed)), file, protocol=pickle.HIGHEST_PROTOCOL)
+            appends = self._appends.get(session_id, 0) + 1
+            if appends >= self.compact_after:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as file:
+                    pickle.dump((self._replay(path), []), file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                appends = 0
+            self._appends[session_id] = appends
+
+    def purge(self, before):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".log") and entry.stat().st_mtime < before:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+
+class SessionCheckpointer:
+    """Writes per-rerun diffs of session state to a backend and restores them."""
+
+    def __init__(self, backend, keys=CHECKPOINT_KEYS, max_age=7 * 24 * 3600, remembered=10000):
+        self.backend = backend
+        self.keys = keys
+        self.max_age = max_age
+        self.remembered = remembered
+        self.writes = 0
+        self.fields_written = 0
+        # session id -> {name: pickled bytes} as last written, to compute diffs
+        self._persisted = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def _remember(self, session_id, fields):
+        with self._lock:
+            self._persisted[session_id] = fields
+            self._persisted.move_to_end(session_id)
+            while len(self._persisted) > self.remembered:
+                self._persisted.popitem(last=False)
+
+    def restore(self, session_id, state):
+        """Copy a stored session into state; returns False if the session is unknown."""
+        fields = self.backend.load(session_id)
+        if not fields:
+            return False
+        for name, value in fields.items():
+            state[name] = pickle.loads(value)
+        self._remember(session_id, dict(fields))
+        return True
+
+    def checkpoint(self, session_id, state, keys=None):
+        """Persist the fields of state (keys, default self.keys) that changed since the last checkpoint."""
+        with self._lock:
+            previous = self._persisted.get(session_id)
+        current = {}
+        for name in self.keys if keys is None else keys:
+            if name in state:
+                current[name] = pickle.dumps(state[name], protocol=pickle.HIGHEST_PROTOCOL)
+        if previous is None:
+            # Unknown here (new session, or forgotten): write everything, delete nothing
+            changed, removed = current, ()
+        else:
+            changed = {name: value for name, value in current.items() if previous.get(name) != value}
+            removed = [name for name in previous if name not in current]
+        if changed or removed:
+            self.backend.apply(session_id, changed, removed)
+            self.writes += 1
+            self.fields_written += len(changed)
+        self._remember(session_id, current)
+        now = time.time()
+        if now - self._purged_at > 3600:
+            self._purged_at = now
+            self.backend.purge(now - self.max_age)
+        return len(changed) + len(removed)
+
+
+def default_session_backend():
+    """Backend chosen by QUIZMASTER_SESSION_BACKEND: sqlite (default), file or none."""
+    kind = os.environ.get("QUIZMASTER_SESSION_BACKEND", "sqlite")
+    if kind == "none":
+        return None
+    if kind == "file":
+        return FileSessionBackend()
+    if kind == "sqlite":
+        return SQLiteSessionBackend()
+    raise ValueError(f"unknown QUIZMASTER_SESSION_BACKEND {kind!r}")
+
+
+_checkpointer = None
+_configured = False
+_checkpointer_lock = threading.Lock()
+
+
+def configure_session_store(backend):
+    """Replace the process-wide checkpointer (None disables checkpointing)."""
+    global _checkpointer, _configured
+    with _checkpointer_lock:
+        if _checkpointer is not None:
+            _checkpointer.backend.close()
+        _checkpointer = None if backend is None else SessionCheckpointer(backend)
+        _configured = True
+    return _checkpointer
+
+
+def get_session_checkpointer():
+    """Return the process-wide SessionCheckpointer, or None when disabled."""
+    global _checkpointer, _configured
+    if not _configured:
+        with _checkpointer_lock:
+            if not _configured:
+                backend = default_session_backend()
+                _checkpointer = None if backend is None else SessionCheckpointer(backend)
+                _configured = True
+    return _checkpointer
@@ -1,20 +1,115 @@
 import streamlit as st
+import functools
 import os
-import json
+import random
+import re
+import time
+import uuid
 from datetime import datetime, timedelta
 
+from answer_key import compile_answer_key, mcq_widget_key, scq_widget_key
+from answer_store import AnswerStore
+from asset_cache import AssetError, get_asset_cache
+from autosave import get_autosaver
+from grading_pool import BUSY, get_grading_pool
+from question_bank import load_cached_answer_key, load_cached_quiz
+from question_sampling import QUESTION_TYPES, get_sample_index
+from quiz_cache import get_quiz_cache
+from quiz_catalog import get_catalog
+from quiz_compiler import QuizSchemaError, time_limit
+from quiz_metrics import (get_profiler, instrument, profiling_enabled, register_collector, stage_histogram,
+                          start_exporters, timed)
+from quiz_prewarm import prewarm_once
+from quiz_timer import get_timer_scheduler
+from session_store import ANSWER_KEYS, cookie_session_id, get_session_checkpointer
+from submission_store import Submission, get_submission_writer
+
 
 # === OBO ===
 
-def display_current_question(quiz, current_index):
-    question = quiz["questions"][current_index]
-    st.write(f"{question}")
-    this_question = question["question"]
-    this_no = current_index + 1
-    st.markdown(f"##### Q{this_no}: {this_question}")
+DEFAULT_PAGE_SIZE = 10
+
+
+def get_page_size(quiz):
+    """Questions per page: 1 for one-by-one mode, page_size (default 10) for paged mode."""
+    if quiz.get("question_display", "all") == "1":
+        return 1
+    return max(1, int(quiz.get("page_size", DEFAULT_PAGE_SIZE)))
+
+
+def get_answer_store(quiz_id, total_questions):
+    """Return this session's AnswerStore, starting a fresh one when the quiz changes."""
+    store = st.session_state.get("answer_store")
+    if store is None or store.quiz_id != quiz_id or len(store) != total_questions:
+        store = AnswerStore(quiz_id, total_questions)
+        position = 0
+        autosaver = get_autosaver()
+        saved = None if autosaver is None else autosaver.restore(get_session_id(), quiz_id, total_questions)
+        if saved is not None:
+            # Reconnected (or came back to this quiz): resume where the learner left off
+            answers, position = saved
+            store.update(answers)
+        st.session_state.answer_store = store
+        st.session_state.current_question_index = position
+    return store
+
+
+def _save_scq_answer(question_index, key, options):
+    # Widgets are only rendered for the visible questions and Streamlit drops the
+    # keys of widgets it did not render, so the store is the source of truth.
+    value = st.session_state.get(key)
+    option_no = options.index(value) + 1 if value in options else 0
+    st.session_state.answer_store.set_choice(question_index, option_no)
+
+
+def _save_mcq_answer(question_index, key, option_index):
+    selected = bool(st.session_state.get(key))
+    st.session_state.answer_store.set_selected(question_index, option_index, selected)
+
+
+def display_question_media(question, base_path="Quiz"):
+    """Render a question's image and code snippet; assets come from the shared AssetCache."""
+    assets = get_asset_cache(base_path)
+    try:
+        if question.get("image"):
+            st.image(assets.get(question["image"]).data, caption=question.get("image_caption"))
+        if question.get("code_file"):
+            st.code(assets.get(question["code_file"]).text(), language=question.get("language"))
+        elif question.get("code"):
+            st.code(question["code"], language=question.get("language"))
+    except AssetError as exc:
+        st.warning(f"Missing question asset: {exc}")
+
+
+def display_question(question, question_index, store):
+    """Render one question with widgets bound to the session's AnswerStore."""
+    question_no = question_index + 1
+    st.markdown(f"#### Q{question_no}: {question['question']}")
+    # Only the questions being shown get here, so only their assets are loaded
+    display_question_media(question)
     options = question['options']
+
     if question["type"] == "MCQ":
-        st.markdown(f"##### {options}")
+        # Use checkboxes for MCQ to allow multiple selections
+        for j, option in enumerate(options):
+            key = mcq_widget_key(question_no, j)
+            st.checkbox(option, value=store.is_selected(question_index, j), key=key,
+                        on_change=_save_mcq_answer, args=(question_index, key, j))
+
+    if question["type"] == "SCQ":
+        key = scq_widget_key(question_no)
+        choice = store.choice(question_index)
+        st.radio(question["question"], options, index=choice - 1 if 0 < choice <= len(options) else None,
+                 key=key, on_change=_save_scq_answer, args=(question_index, key, options))
+
+
+def display_current_question(quiz, current_index):
+    """Materialize only the questions on the current page."""
+    store = st.session_state.answer_store
+    questions = quiz["questions"]
+    stop = min(current_index + get_page_size(quiz), len(questions))
+    for question_index in range(current_index, stop):
+        display_question(questions[question_index], question_index, store)
 
 
 def display_progress_with_text(current, total):
@@ -24,15 +119,22 @@ def display_progress_with_text(current, total):
     progress_value = current / total
     st.progress(progress_value)
 
-def display_navigation_buttons(current_index, total_questions):
+
+def _go_to_question(index):
+    st.session_state.current_question_index = index
+
+
+def display_navigation_buttons(current_index, total_questions, page_size=1, on_advance=None):
+    """Previous/Submit/Next row; with on_advance (adaptive tests) the last "Next" calls it
+    to add the following question, and there is no going back."""
     # Create a row with three columns: Previous, Submit, and Next
     prev_col, submit_col, next_col = st.columns([1, 1, 1], gap="small")
 
     # Display "Previous" button if not the first question
     with prev_col:
-        if current_index > 0:
-            if st.button("Previous"):
-                st.session_state.current_question_index -= 1
+        if current_index > 0 and on_advance is None:
+            # Callbacks move the index before the rerun, so the buttons drawn match the page shown
+            st.button("Previous", on_click=_go_to_question, args=(max(0, current_index - page_size),))
 
     # "Submit" button centered in the middle column
     with submit_col:
@@ -41,43 +143,142 @@ def display_navigation_buttons(current_index, total_questions):
 
     # Display "Next" button if not the last question
     with next_col:
-        if current_index < total_questions - 1:
-            if st.button("Next"):
-                st.session_state.current_question_index += 1
+        if current_index + page_size < total_questions:
+            st.button("Next", on_click=_go_to_question, args=(current_index + page_size,))
+        elif on_advance is not None:
+            st.button("Next", on_click=on_advance)
 
     st.write("")
     
 
 
-def display_question_with_navigation(quiz):
-    current_index = st.session_state.get("current_question_index", 0)
+def display_question_with_navigation(quiz, on_advance=None, planned_total=None):
+    page_size = get_page_size(quiz)
     total_questions = len(quiz["questions"])
-    # Display progress bar with text
-    display_progress_with_text(current_index + 1, total_questions)
+    # Snap to the start of a page in case the page size changed
+    current_index = st.session_state.get("current_question_index", 0)
+    current_index = min(current_index, total_questions - 1) // page_size * page_size
+    # Reserve the progress bar's place; it is filled once navigation has moved the index
+    progress_slot = st.container()
     # Display navigation buttons
-    display_navigation_buttons(current_index, total_questions)
+    display_navigation_buttons(current_index, total_questions, page_size, on_advance)
+    current_index = st.session_state.get("current_question_index", current_index)
+    with progress_slot:
+        # Display progress bar with text
+        display_progress_with_text(min(current_index + page_size, total_questions), planned_total or total_questions)
     display_current_question(quiz, current_index)
 
 
-def setup_quiz_environment(quiz):
-    """Setup initial quiz state including timing and progress, ensuring timer is initialized only once."""
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def get_session_id():
+    """Stable id for this browser session, used to key process-wide state.
+
+    The id is kept in the URL (?session=...), so a reload served by another
+    process or node resumes the checkpointed attempt and the autosaved answers
+    (with or without a session backend). Whoever has the URL can
+    resume it, though. With QUIZMASTER_SESSION_COOKIE naming a login cookie
+    (e.g. set by an authenticating proxy), the id is derived from that cookie
+    instead and never put in the URL.
+    """
+    cookie_name = os.environ.get("QUIZMASTER_SESSION_COOKIE")
+    if "session_id" not in st.session_state:
+        checkpointer = get_session_checkpointer()
+        if cookie_name:
+            cookie = st.context.cookies.get(cookie_name)
+            if not isinstance(cookie, str):
+                cookie = None  # no request cookies, e.g. under AppTest
+            session_id = cookie_session_id(cookie) if cookie else uuid.uuid4().hex
+            if cookie and checkpointer is not None:
+                checkpointer.restore(session_id, st.session_state)
+        else:
+            session_id = st.query_params.get("session", "")
+            if not _SESSION_ID.fullmatch(session_id):
+                session_id = uuid.uuid4().hex
+            elif checkpointer is not None:
+                # The autosaver keys answers by this id too, so it is kept even with nothing to restore
+                checkpointer.restore(session_id, st.session_state)
+        st.session_state.session_id = session_id
+    if cookie_name:
+        if "session" in st.query_params:
+            del st.query_params["session"]  # links copied from the address bar carry no session
+    elif st.query_params.get("session") != st.session_state.session_id:
+        st.query_params["session"] = st.session_state.session_id
+    return st.session_state.session_id
+
+
+def autosave_answers():
+    """Hand the answers changed in this rerun, and the current position, to the autosaver."""
+    autosaver = get_autosaver()
+    store = st.session_state.get("answer_store")
+    if autosaver is not None and store is not None and "session_id" in st.session_state:
+        autosaver.record(st.session_state.session_id, store, st.session_state.get("current_question_index", 0))
+
+
+def checkpoint_session():
+    """Write this rerun's changes to the quiz-relevant session state to the session store."""
+    checkpointer = get_session_checkpointer()
+    if checkpointer is not None and "session_id" in st.session_state:
+        # Without an autosaver the answers and position are only kept by the checkpoint
+        keys = checkpointer.keys if get_autosaver() is not None else checkpointer.keys + ANSWER_KEYS
+        with timed("checkpoint"):
+            checkpointer.checkpoint(st.session_state.session_id, st.session_state, keys)
+
+
+def setup_quiz_environment(quiz, quiz_id=None, grade_attempt=None):
+    """Setup initial quiz state including timing and progress.
+
+    A timed quiz's deadline is fixed when the session first opens it and kept
+    per quiz in quiz_deadlines (which is checkpointed), so leaving the quiz and
+    coming back continues the same clock. grade_attempt() is registered with
+    the process-wide timer scheduler under (session, quiz), which runs it
+    exactly once: on submit or when time runs out, even while the learner is
+    on another quiz. Only once an attempt has been graded does reopening the
+    quiz start a new one, with a new deadline.
+    """
     if 'current_question_index' not in st.session_state:
         st.session_state.current_question_index = 0  # Start with the first question
         st.session_state.score = 0  # Initial score
 
-    # Check if the timer has already been initialized to avoid resetting it
-    if 'timer_initialized' not in st.session_state:
-        # Setup timing based on quiz specification
-        if quiz.get("timed", "no") != "no":
-            st.session_state.is_timed = True
-            st.session_state.start_time = datetime.now()
-            st.session_state.time_limit = quiz["timed"]
-            st.session_state.end_time = st.session_state.start_time + timedelta(seconds=st.session_state.time_limit)
-        else:
-            st.session_state.is_timed = False
-        
-        # Mark the timer as initialized to prevent re-initialization
-        st.session_state.timer_initialized = True
+    limit = time_limit(quiz)
+    st.session_state.is_timed = limit is not None
+    st.session_state.timer_quiz_id = quiz_id
+    if limit is None:
+        return
+    key = (get_session_id(), quiz_id)
+    scheduler = get_timer_scheduler()
+    deadlines = st.session_state.setdefault("quiz_deadlines", {})
+    deadline = scheduler.deadline(key)
+    if scheduler.is_finished(key):
+        pass  # graded; run_quiz shows the result
+    elif deadline is not None:
+        # Pending: make sure expiry grades the answer store this rerun is using
+        scheduler.rebind(key, grade_attempt)
+        deadlines[quiz_id] = deadline
+    else:
+        deadline = deadlines.get(quiz_id)
+        if deadline is None:
+            # A new attempt (the first, or after the previous one was graded)
+            deadline = (datetime.now() + timedelta(seconds=limit)).timestamp()
+            if st.session_state.get("graded_quiz_id") == quiz_id:
+                del st.session_state.graded_quiz_id
+                st.session_state.answer_store.clear()
+        # Otherwise resumed in a process that has no timer for this attempt yet
+        scheduler.schedule(key, deadline, grade_attempt)
+        deadlines[quiz_id] = deadline
+    st.session_state.time_limit = limit
+    st.session_state.end_time = datetime.fromtimestamp(deadline)
+    st.session_state.start_time = st.session_state.end_time - timedelta(seconds=limit)
+    st.session_state.timer_initialized = True
+
+
+def mark_graded(quiz_id, job_id):
+    """Record a submitted (or expired) attempt; a timed quiz gets a new deadline when reopened."""
+    st.session_state.graded_quiz_id = quiz_id
+    st.session_state.graded_score = None
+    st.session_state.grading_job = job_id
+    st.session_state.get("quiz_deadlines", {}).pop(quiz_id, None)
 
 
 def display_progress(current, total):
@@ -85,158 +286,420 @@ def display_progress(current, total):
     progress_value = current / total
     st.progress(progress_value)
 
+
+COUNTDOWN_HTML = """
+<div id="countdown" style="font-family: 'Source Sans Pro', sans-serif; font-size: 1rem;"></div>
+<script>
+const end = Date.now() + REMAINING_MS;
+const el = document.getElementById("countdown");
+const pad = (n) => String(n).padStart(2, "0");
+function tick() {
+  const left = Math.max(0, Math.round((end - Date.now()) / 1000));
+  el.textContent = left > 0
+    ? `Time left: ${pad(Math.floor(left / 3600))}:${pad(Math.floor(left % 3600 / 60))}:${pad(left % 60)}`
+    : "Time's up!";
+  if (left > 0) setTimeout(tick, 250);
+}
+tick();
+</script>
+"""
+
+
+def embed_html(html, height):
+    """Embed trusted HTML/JS in an iframe (st.iframe on newer Streamlit releases)."""
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=height)
+    else:
+        import streamlit.components.v1 as components
+        components.html(html, height=height)
+
+
 def display_timer(quiz):
-    """Displays a timer if the quiz is timed."""
-    # var1 = quiz.get("timed", "no") != "no"
-    # var2 = 'end_time' in st.session_state
-    # st.sidebar.write(f"===== VAR1 {var1} {var2}")
-    if quiz.get("timed", "no") != "no" and 'end_time'  in st.session_state:
-        #st.sidebar.write("==========TIMER=============")
+    """Displays a timer if the quiz is timed.
+
+    The countdown runs in the browser, so no server reruns are needed to keep it current.
+    """
+    if time_limit(quiz) is not None and 'end_time'  in st.session_state:
         time_left = st.session_state.end_time - datetime.now()
-        total_seconds = int(time_left.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
         if time_left.total_seconds() > 0:
-            st.sidebar.write(f"Time left: {hours:02d}:{minutes:02d}:{seconds:02d}")
+            with st.sidebar:
+                embed_html(COUNTDOWN_HTML.replace("REMAINING_MS", str(int(time_left.total_seconds() * 1000))),
+                           height=32)
         else:
             st.sidebar.write("Time's up!")
 
 
-# Update display_questions_and_collect_answers to show one question at a time, and evaluate_answers_and_display_score as needed
+# Update display_questions_and_collect_answers to show one question at a time
 
 
+@instrument("catalog")
 def list_topics(base_path="Quiz"):
     """List all quiz topics."""
-    return [name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name))]
+    return get_catalog(base_path).topics()
 
+@instrument("catalog")
 def list_levels(topic, base_path="Quiz"):
     """List all levels within a topic."""
-    topic_path = os.path.join(base_path, topic)
-    return [name for name in os.listdir(topic_path) if os.path.isdir(os.path.join(topic_path, name))]
+    return get_catalog(base_path).levels(topic)
 
+@instrument("catalog")
 def list_quizzes(topic, level, base_path="Quiz"):
     """List all quizzes within a level of a topic."""
-    level_path = os.path.join(base_path, topic, level)
-    return [name for name in os.listdir(level_path) if name.endswith('.json')]
+    return get_catalog(base_path).quizzes(topic, level)
 
+@instrument("load_quiz")
 def load_quiz(topic, level, quiz_file, base_path="Quiz"):
-    """Load a specific quiz JSON file."""
+    """Load a specific quiz JSON file (shared, read-only across sessions)."""
     quiz_path = os.path.join(base_path, topic, level, quiz_file)
-    with open(quiz_path, 'r') as file:
-        return json.load(file)
+    return load_cached_quiz(quiz_path)
 
 
 def display_questions_and_collect_answers(quiz):
-    for i, question in enumerate(quiz["questions"], start=1):
-        key = f"question_{i}"
-        st.markdown(f"#### Q{i}: {question['question']}")
-
-        if question["type"] == "MCQ":
-            options = question['options']
-            # Use checkboxes for MCQ to allow multiple selections
-            user_responses = []
-            for i, option in enumerate(options):
-                if st.checkbox(option, key=f"{key}_option_{i}"):
-                    user_responses.append(i + 1)  # Store 1-based index of selected options
-            
-
-        if question["type"] == "SCQ":
-            options = question['options']
-            # Use checkboxes for MCQ to allow multiple selections
-            user_input = st.radio(question["question"], options, key=key)
-            #print(f">>> === {user_input} === <<<")
-            
-def evaluate_answers_and_display_score(quiz):
-    score = 0
-    mcq_answers = {}  # To aggregate MCQ answers since they're spread across multiple keys
-
-    for key, value in st.session_state.items():
-        if key.startswith("question_"):
-            question_num = int(key.split("_")[1])
-            question = quiz["questions"][question_num - 1]
-            
-            # Handle MCQs: Aggregate answers based on question number
-            if question["type"] == "MCQ" and "option" in key:
-                if question_num not in mcq_answers:
-                    mcq_answers[question_num] = []
-                if value:  # If the option was selected (True), store its index
-                    option_index = int(key.split("_")[-1]) + 1
-                    mcq_answers[question_num].append(option_index)
-            
-            # Handle SCQs: Direct comparison since only one answer per question
-            elif question["type"] == "SCQ":
-                correct_answer = question["answer"]
-                selected_answer = None
-                if isinstance(value, str):  # Assuming the answer is stored as the option text
-                    selected_answer = question["options"].index(value) + 1
-                elif isinstance(value, int):  # Or if the answer is stored as an index
-                    selected_answer = value
-                
-                if selected_answer == correct_answer:
-                    score += 1
-
-    # Evaluate MCQs now that all options are aggregated
-    for question_num, selected_options in mcq_answers.items():
-        question = quiz["questions"][question_num - 1]
-        correct_answers = question["answers"]
-        print(f">>> === MCQ{correct_answers} === <<<")
-        if sorted(selected_options) == sorted(correct_answers):
-            score += 1
-            #print(f">>> === MCQ{score} === <<<")
-            
-
-    # Display the score
-    total_questions = len(quiz['questions'])
-    st.metric(label="Score", value=f"{score} / {total_questions}")
-    
-
+    store = st.session_state.answer_store
+    for question_index, question in enumerate(quiz["questions"]):
+        display_question(question, question_index, store)
+
+
+def load_answer_key(topic, level, quiz_file, base_path="Quiz"):
+    """Return the compiled answer key for a quiz, built once per version of the file."""
+    return load_cached_answer_key(os.path.join(base_path, topic, level, quiz_file))
+
+
+def display_score(score, max_score):
+    st.metric(label="Score", value=f"{score} / {max_score}")
+
+
+def grade_attempt(session_id, answer_store, get_answer_key):
+    """Queue an attempt for grading and return the grading job's id.
+
+    Safe to call from the timer thread: it makes no Streamlit calls, the
+    scoring happens in the grading pool and the write to disk later, in the
+    submission writer's thread. The "grade" stage times each attempt from here
+    until its score is known.
+    """
+    started = time.perf_counter()
+    answer_key = get_answer_key()
+    quiz_id, answers = answer_store.quiz_id, answer_store.to_bytes()
+
+    def store(job):
+        stage_histogram("grade").observe(time.perf_counter() - started)
+        get_submission_writer().submit(Submission(quiz_id, session_id, job.score, job.total, answers))
+
+    return get_grading_pool().submit(answer_key, answer_store.responses(), on_done=store).job_id
+
+
+def _poll_grading_job(job_id):
+    # Fragment body: reruns on its own until the job is resolved, then reruns the page
+    pool = get_grading_pool()
+    job = pool.job(job_id)
+    if job is None or pool.poll(job):
+        st.rerun()
+    st.caption("Grading your answers...")
+
+
+def display_graded_score(max_score, regrade):
+    """Show the score of the submitted attempt, polling its grading job while it runs.
+
+    regrade() resubmits the attempt if the job is unknown here, e.g. after the
+    session moved to another process before its job was resolved, and when the
+    learner resubmits a job the pool turned away or that failed.
+    """
+    if st.session_state.get("graded_score") is None:
+        pool = get_grading_pool()
+        job = pool.job(st.session_state.get("grading_job"))
+        if job is None:
+            st.session_state.grading_job = regrade()
+            job = pool.job(st.session_state.grading_job)
+        if not pool.poll(job):
+            st.fragment(_poll_grading_job, run_every=0.25)(job.job_id)
+            return
+        if job.failed:
+            st.warning("Grading is busy right now; your answers are kept. Please submit again."
+                       if job.status == BUSY else "Grading your answers failed. Please submit again.")
+            st.button("Submit again", key="resubmit", on_click=_resubmit, args=(regrade,))
+            return
+        st.session_state.graded_score = job.score
+    display_score(st.session_state.graded_score, max_score)
+
+
+def _resubmit(regrade):
+    st.session_state.graded_score = None
+    st.session_state.grading_job = regrade()
+
+
+def select_random_exam(topic, level):
+    """Sidebar controls for a random exam drawn from every quiz in a level."""
+    sample_index = get_sample_index()
+    available = sample_index.counts(topic, level)
+    counts = {}
+    for kind in QUESTION_TYPES:
+        if available.get(kind):
+            counts[kind] = st.sidebar.number_input(
+                f"{kind} questions", min_value=0, max_value=available[kind],
+                value=min(5, available[kind]), key=f"exam_count_{kind}")
+
+    # The seed is kept per session so the same exam can be rebuilt on every rerun
+    if "exam_seed" not in st.session_state or st.sidebar.button("New exam"):
+        st.session_state.exam_seed = random.getrandbits(32)
+    seed = st.session_state.exam_seed
+
+    quiz_id = f"{topic}/{level}/random-{seed}-" + "-".join(f"{k}{n}" for k, n in sorted(counts.items()))
+    if st.session_state.get("exam_id") != quiz_id or "exam" not in st.session_state:
+        exam = sample_index.draw(topic, level, counts, seed)
+        st.session_state.exam = exam
+        st.session_state.exam_id = quiz_id
+        st.session_state.exam_answer_key = compile_answer_key(exam)
+    return st.session_state.exam, quiz_id, st.session_state.exam_answer_key
+
+
+def display_item_analysis(quiz_id, answer_key):
+    """Difficulty, discrimination and distractor counts from the running aggregates."""
+    from item_analysis import get_item_analysis
+
+    report = get_item_analysis().report(quiz_id, answer_key)
+    st.subheader("Item analysis")
+    if not report["submissions"]:
+        st.info("No submissions yet.")
+        return
+    st.write(f"{report['submissions']} submissions, mean score {report['mean_score']:.2f} "
+             f"(sd {report['score_std']:.2f})")
+    st.bar_chart(report["score_distribution"], x="score", y="submissions")
+    st.dataframe([
+        {"Question": q["question"], "Type": q["type"], "p-value": round(q["p_value"], 3),
+         "Discrimination": None if q["discrimination"] is None else round(q["discrimination"], 3),
+         "Answered": q["answered"], "Option counts": ", ".join(map(str, q["option_counts"]))}
+        for q in report["questions"]
+    ], hide_index=True)
+
+
+def select_adaptive_test(topic, level):
+    """Sidebar controls for an adaptive test starting at the chosen level."""
+    from adaptive_testing import get_adaptive_engine
+
+    length = st.sidebar.number_input("Questions", min_value=1, max_value=200, value=10, key="adaptive_length")
+    # Like random exams, the seed makes an attempt reproducible from its answers
+    if "adaptive_seed" not in st.session_state or st.sidebar.button("New test"):
+        st.session_state.adaptive_seed = random.getrandbits(32)
+    attempt_id = f"{topic}/{level}/adaptive-{st.session_state.adaptive_seed}-{length}"
+    attempt = st.session_state.get("adaptive_attempt")
+    if attempt is None or attempt.attempt_id != attempt_id:
+        attempt = get_adaptive_engine().start(attempt_id, topic, level, st.session_state.adaptive_seed, length)
+        st.session_state.adaptive_attempt = attempt
+    return attempt
+
+
+def _advance_adaptive_test():
+    # Button callback: runs before the next rerun renders, so the new question shows at once
+    from adaptive_testing import get_adaptive_engine
+
+    attempt = st.session_state.adaptive_attempt
+    response = st.session_state.answer_store.get(len(attempt.outcomes))
+    get_adaptive_engine().answer(attempt, response)
+    st.session_state.current_question_index = len(attempt.items) - 1
+
+
+def run_adaptive_test(attempt):
+    """One question at a time; each answer moves the ability estimate and picks the next question."""
+    from adaptive_testing import get_adaptive_engine
+
+    engine = get_adaptive_engine()
+    quiz = engine.quiz(attempt)
+    st.title(quiz["title"])
+    if not quiz["questions"]:
+        st.info("This topic has no questions.")
+        return
+    # Sized for the planned length, so the store survives the topic running out early
+    answer_store = get_answer_store(attempt.attempt_id, attempt.length)
+    if attempt.finished:
+        answer_key = compile_answer_key(quiz)
+        # Grade the questions actually asked, under the same rules as any quiz
+        regrade = functools.partial(grade_attempt, get_session_id(), answer_store.head(len(quiz["questions"])),
+                                    lambda: answer_key)
+        if st.session_state.get("adaptive_graded") != attempt.attempt_id:
+            st.session_state.adaptive_graded = attempt.attempt_id
+            st.session_state.graded_score = None
+            st.session_state.grading_job = regrade()
+        display_graded_score(answer_key.max_score, regrade)
+        st.metric("Ability estimate", round(attempt.ability))
+        return
+    display_question_with_navigation(quiz, on_advance=_advance_adaptive_test, planned_total=attempt.length)
+
+
+def run_quiz(quiz, quiz_id, get_answer_key):
+    """Display a quiz and score it on submit; get_answer_key() returns its AnswerKey."""
+    st.title(quiz["title"])
+    if not quiz["questions"]:
+        st.info("This quiz has no questions.")
+        return
+
+     # Setup initial state if not already set
+    if 'current_question_index' not in st.session_state:
+        st.session_state.current_question_index = 0
+        st.session_state.quiz_complete = False
+
+    session_id = get_session_id()
+    answer_store = get_answer_store(quiz_id, len(quiz["questions"]))
+    grade = functools.partial(grade_attempt, session_id, answer_store, get_answer_key)  # returns a job id
+    setup_quiz_environment(quiz, quiz_id, grade)  # Initialize quiz environment including timing
+    display_timer(quiz)  # Display the timer
+
+    timer = get_timer_scheduler()
+    timer_key = (session_id, quiz_id)
+    if st.session_state.is_timed and timer.is_finished(timer_key):
+        # Graded already, by the Submit button or by the deadline passing
+        if timer.is_expired(timer_key):
+            st.warning("Time's up! Your answers were submitted automatically.")
+        if st.session_state.get("graded_quiz_id") != quiz_id:
+            mark_graded(quiz_id, timer.result(timer_key))
+    if st.session_state.is_timed and st.session_state.get("graded_quiz_id") == quiz_id:
+        display_graded_score(get_answer_key().max_score, grade)
+        return
+
+    question_display_mode = quiz.get("question_display", "all")
+
+    # Check if we are displaying questions one at a time
+    with timed("render"):
+        if question_display_mode in ("1", "page"):
+            display_question_with_navigation(quiz)
+        elif question_display_mode == "all":
+            display_questions_and_collect_answers(quiz)
+
+    # Button to submit answers and evaluate the quiz
+    if st.button('Submit Quiz'):
+        if st.session_state.is_timed and timer.deadline(timer_key) is not None:
+            # Grades exactly once even if the deadline fires at the same moment
+            job_id = timer.submit(timer_key)
+        else:
+            job_id = grade()
+        mark_graded(quiz_id, job_id)
+    if st.session_state.get("graded_quiz_id") == quiz_id:
+        # The latest submission's score, until the learner submits again
+        display_graded_score(get_answer_key().max_score, grade)
+
+
+def component_metrics():
+    """Gauges and counters from the process-wide components, for the metrics exporters."""
+    cache = get_quiz_cache().stats()
+    for name in ("hits", "misses", "evictions"):
+        yield f"quizmaster_quiz_cache_{name}_total", "counter", f"Quiz cache {name}.", cache[name]
+    yield "quizmaster_quiz_cache_entries", "gauge", "Quizzes held by the cache.", cache["entries"]
+    yield "quizmaster_quiz_cache_bytes", "gauge", "Estimated size of the cached quizzes.", cache["bytes"]
+    assets = get_asset_cache().stats()
+    yield "quizmaster_asset_cache_hits_total", "counter", "Asset cache hits.", assets["hits"]
+    yield "quizmaster_asset_cache_misses_total", "counter", "Asset cache misses.", assets["misses"]
+    yield "quizmaster_asset_cache_bytes", "gauge", "Asset bytes held in memory.", assets["bytes"]
+    yield "quizmaster_catalog_scans_total", "counter", "Directory rescans by the catalog.", get_catalog().scans
+    yield "quizmaster_timer_expired_total", "counter", "Attempts graded by their deadline.", get_timer_scheduler().fired
+    grading = get_grading_pool().stats()
+    yield "quizmaster_grading_in_flight", "gauge", "Grading jobs waiting for a pool worker.", grading["in_flight"]
+    for via in ("pool", "inline", "busy", "timeout", "failed"):
+        yield f"quizmaster_grading_{via}_total", "counter", f"Grading jobs resolved: {via}.", grading[via]
+    autosaver = get_autosaver()
+    if autosaver is not None:
+        autosave = autosaver.stats()
+        yield "quizmaster_autosave_pending", "gauge", "Attempts with unsaved answer changes.", autosave["pending"]
+        yield "quizmaster_autosave_recorded_total", "counter", "Answer changes handed to the autosaver.", autosave["recorded"]
+        yield "quizmaster_autosave_written_total", "counter", "Answers written after coalescing.", autosave["written"]
+        yield "quizmaster_autosave_flushes_total", "counter", "Autosave batches written.", autosave["flushes"]
+    writer = get_submission_writer().metrics()
+    yield "quizmaster_submission_queue_depth", "gauge", "Submissions waiting to be written.", writer["queue_depth"]
+    yield "quizmaster_submissions_written_total", "counter", "Submissions written.", writer["written"]
+    yield "quizmaster_submission_flushes_total", "counter", "Submission batches written.", writer["flushes"]
+    yield "quizmaster_submission_failures_total", "counter", "Failed submission batch writes.", writer["failures"]
+    yield ("quizmaster_submissions_dead_lettered_total", "counter", "Submissions moved to the dead-letter file.",
+           writer["dead_lettered"])
+    for name in ("last", "max", "mean"):
+        yield (f"quizmaster_submission_flush_{name}_seconds", "gauge", f"Submission batch write time ({name}).",
+               writer[f"{name}_flush_seconds"])
 
 
 def main():
+    """Run one rerun; with QUIZMASTER_PROFILE=1, ?profile=1 in the URL samples this session's reruns."""
+    start_exporters()
+    register_collector("components", component_metrics)
+    prewarm_once()  # starts the warm-up thread on the first rerun in this process; never waits
+    session_id = get_session_id()  # restores a checkpointed session before any widget is created
+    try:
+        if profiling_enabled() and st.query_params.get("profile") == "1":
+            with get_profiler().profile(session_id), timed("rerun"):
+                render_app()
+        else:
+            with timed("rerun"):
+                render_app()
+    finally:
+        autosave_answers()
+        checkpoint_session()
+
+
+def _open_search_result(topic, level, quiz_file):
+    # Runs before the selectboxes are created, so they pick up the new values
+    st.session_state.selected_topic = topic
+    st.session_state.selected_level = level
+    st.session_state.selected_mode = "Quiz"
+    st.session_state.selected_quiz = quiz_file
+
+
+def display_search(base_path="Quiz", limit=10):
+    """Sidebar search box; each ranked result opens its quiz."""
+    query = st.sidebar.text_input("Search quizzes", key="search_query")
+    if not query.strip():
+        return
+    from quiz_search import get_search_index
+
+    index = get_search_index(base_path)
+    index.refresh_in_background()  # throttled; re-reads only quiz files that changed
+    with timed("search"):
+        results = index.search(query, limit)
+    if not results:
+        st.sidebar.caption("Indexing quizzes..." if index.refreshing and not len(index) else "No matching quizzes.")
+    for i, result in enumerate(results):
+        st.sidebar.button(f"{result.title} ({result.topic} / {result.level})", key=f"search_result_{i}",
+                          on_click=_open_search_result, args=(result.topic, result.level, result.quiz))
+
+
+def render_app():
     st.sidebar.title("QuizMaster")
+    display_search()
 
     # Adjusted Topic selection to include a "Select" prompt
     topics = ["Select"] + list_topics()  # Prepend "Select" to the list of topics
-    selected_topic = st.sidebar.selectbox("Select a Topic", topics)
+    selected_topic = st.sidebar.selectbox("Select a Topic", topics, key="selected_topic")
 
     # Adjusted Level selection to include a "Select" prompt and conditional display
     if selected_topic and selected_topic != "Select":
         levels = ["Select"] + list_levels(selected_topic)
-        selected_level = st.sidebar.selectbox("Select a Level", levels)
+        selected_level = st.sidebar.selectbox("Select a Level", levels, key="selected_level")
 
-        # Adjusted Quiz selection to include a "Select" prompt and conditional display
         if selected_level and selected_level != "Select":
+            mode = st.sidebar.radio("Mode", ["Quiz", "Random exam", "Adaptive test"], horizontal=True,
+                                    key="selected_mode")
+            if mode == "Adaptive test":
+                run_adaptive_test(select_adaptive_test(selected_topic, selected_level))
+                return
+            if mode == "Random exam":
+                exam, quiz_id, answer_key = select_random_exam(selected_topic, selected_level)
+                run_quiz(exam, quiz_id, lambda: answer_key)
+                return
+
+            # Adjusted Quiz selection to include a "Select" prompt and conditional display
             quizzes = ["Select"] + list_quizzes(selected_topic, selected_level)
-            selected_quiz = st.sidebar.selectbox("Select a Quiz", quizzes)
+            selected_quiz = st.sidebar.selectbox("Select a Quiz", quizzes, key="selected_quiz")
 
             # Load and display the selected quiz, ensuring "Select" is not treated as a valid selection
             if selected_quiz and selected_quiz != "Select":
-                quiz = load_quiz(selected_topic, selected_level, selected_quiz)
-                st.title(quiz["title"])
-                
-                 # Setup initial state if not already set
-                if 'current_question_index' not in st.session_state:
-                    st.session_state.current_question_index = 0
-                    st.session_state.quiz_complete = False
-
-                                       
-                setup_quiz_environment(quiz)  # Initialize quiz environment including timing
-                display_timer(quiz)  # Display the timer
-        
-                question_display_mode = quiz.get("question_display", "all")
-                total_questions = len(quiz["questions"])
-        
-                # Check if we are displaying questions one at a time
-                if question_display_mode == "1":
-                    display_question_with_navigation(quiz)
-                    print(f"One question by question")
-                elif question_display_mode == "all":
-                    display_questions_and_collect_answers(quiz) 
-                            
-                # Button to submit answers and evaluate the quiz
-                if st.button('Submit Quiz'):
-                    print(f">>> === {st.session_state}=== <<<")
-                    evaluate_answers_and_display_score(quiz)    
+                try:
+                    quiz = load_quiz(selected_topic, selected_level, selected_quiz)
+                except QuizSchemaError as exc:
+                    st.error(f"This quiz file is malformed: {exc}")
+                    return
+                quiz_id = os.path.join(selected_topic, selected_level, selected_quiz)
+                if (os.environ.get("QUIZMASTER_ITEM_ANALYSIS") == "1"
+                        and st.sidebar.toggle("Item analysis", key="show_item_analysis")):
+                    display_item_analysis(
+                        quiz_id, load_answer_key(selected_topic, selected_level, selected_quiz))
+                    return
+                run_quiz(quiz, quiz_id,
+                         lambda: load_answer_key(selected_topic, selected_level, selected_quiz))
 
 
 # Ensure the main function is called when the script is run
@@ -0,0 +1,287 @@
+"""Write-behind persistence for graded attempts.
+
+Submitting a quiz only appends a Submission to an in-process queue; a single
+background writer drains the queue and writes whole batches per transaction
+through a pluggable backend (SQLite by default). A burst of thousands of
+"Submit Quiz" clicks therefore never waits on disk syncs in the script thread.
+
+A batch that keeps failing is retried a bounded number of times with growing
+delays, then appended to a dead-letter JSON Lines file and logged. Rows the
+backend rejects outright (e.g. a constraint violation) are split out and
+dead-lettered at once, so the rest of their batch is still written.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from quiz_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get(
+    "QUIZMASTER_SUBMISSIONS_DB", os.path.join(CACHE_DIR, "submissions.sqlite3"))
+DEFAULT_DEAD_LETTER_PATH = os.environ.get(
+    "QUIZMASTER_SUBMISSIONS_DEAD_LETTER", os.path.join(CACHE_DIR, "submissions.deadletter.jsonl"))
+
+
+class Submission:
+    """One graded attempt; answers is AnswerStore.to_bytes()."""
+    __slots__ = ("quiz_id", "session_id", "score", "total", "answers", "submitted_at")
+
+    def __init__(self, quiz_id, session_id, score, total, answers, submitted_at=None):
+        self.quiz_id = quiz_id
+        self.session_id = session_id
+        self.score = score
+        self.total = total
+        self.answers = answers
+        self.submitted_at = time.time() if submitted_at is None else submitted_at
+
+
+class SubmissionBackend:
+    """Storage interface used by the SubmissionWriter."""
+
+    # Errors that retrying the same rows cannot fix
+    permanent_errors = (TypeError, ValueError)
+
+    def write_batch(self, submissions):
+        """Persist a list of Submissions atomically."""
+        raise NotImplementedError
+
+    def iter_submissions(self, quiz_id=None):
+        """Yield stored Submissions, optionally for one quiz only."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _number(value):
+    """A REAL column's value as the app shows it: whole numbers as int."""
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+class SQLiteSubmissionBackend(SubmissionBackend):
+    """Submissions table in a local SQLite database (WAL mode)."""
+
+    permanent_errors = SubmissionBackend.permanent_errors + (sqlite3.IntegrityError, sqlite3.InterfaceError)
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " id INTEGER PRIMARY KEY,"
+            " quiz_id TEXT NOT NULL,"
+            " session_id TEXT NOT NULL,"
+            " score REAL NOT NULL,"  # partial credit and penalties give fractional scores
+            " total REAL NOT NULL,"
+            " answers BLOB NOT NULL,"
+            " submitted_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS submissions_quiz ON submissions (quiz_id)")
+        self._conn.commit()
+
+    def _connect(self):
+        # Only the writer thread uses this connection after construction
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def write_batch(self, submissions):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO submissions (quiz_id, session_id, score, total, answers, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(s.quiz_id, s.session_id, s.score, s.total, s.answers, s.submitted_at)
+                 for s in submissions])
+
+    def iter_submissions(self, quiz_id=None):
+        conn = sqlite3.connect(self.path)
+        try:
+            sql = "SELECT quiz_id, session_id, score, total, answers, submitted_at FROM submissions"
+            rows = (conn.execute(sql + " WHERE quiz_id = ? ORDER BY id", (quiz_id,)) if quiz_id
+                    else conn.execute(sql + " ORDER BY id"))
+            for row in rows:
+                yield Submission(row[0], row[1], _number(row[2]), _number(row[3]), row[4], row[5])
+        finally:
+            conn.close()
+
+    def close(self):
+        self._conn.close()
+
+
+class SubmissionWriter:
+    """Queue plus background thread that flushes submissions in batches."""
+
+    def __init__(self, backend, batch_size=500, flush_interval=0.2, retry_delay=1.0, max_retries=5,
+                 dead_letter_path=DEFAULT_DEAD_LETTER_PATH):
+        self.backend = backend
+        self.batch_size = batch_size
+        # A batch is flushed once it is full or its oldest record waited this long
+        self.flush_interval = flush_interval
+        # Failed writes are retried after retry_delay, doubling each time, max_retries times
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.flushes = 0
+        self.failures = 0
+        self.written = 0
+        self.dead_lettered = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.listeners = []  # called with each flushed batch, from the writer thread
+        self._queue = queue.Queue()
+        self._stopping = object()
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, submission):
+        """Queue a submission; never blocks on I/O."""
+        self._queue.put(submission)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "written": self.written,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "mean_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+        }
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written (or timeout)."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        self._queue.put(self._stopping)
+        self._thread.join(timeout)
+        self.backend.close()
+
+    def _collect(self):
+        """Wait for one item, then gather more until the batch is full or the interval ends."""
+        first = self._queue.get()
+        items = [first]
+        deadline = time.monotonic() + self.flush_interval
+        # A flush marker or the stop sentinel ends the batch early
+        while len(items) < self.batch_size and isinstance(items[-1], Submission):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _write(self, batch):
+        written = self._write_rows(batch)
+        if not written:
+            return
+        for listener in self.listeners:
+            try:
+                listener(written)
+            except Exception:
+                logger.exception("submission listener failed")
+
+    def _write_rows(self, batch):
+        """Write batch, retrying transient errors; returns the submissions that were written."""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                self.backend.write_batch(batch)
+            except self.backend.permanent_errors as exc:
+                self.failures += 1
+                if len(batch) == 1:
+                    self._dead_letter(batch, exc)
+                    return []
+                # Split the batch to isolate the rows that can never be written
+                middle = len(batch) // 2
+                return self._write_rows(batch[:middle]) + self._write_rows(batch[middle:])
+            except Exception as exc:
+                self.failures += 1
+                if attempt == self.max_retries:
+                    self._dead_letter(batch, exc)
+                    return []
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning("writing %d submissions failed (%s); retrying in %.1fs", len(batch), exc, delay)
+                time.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.written += len(batch)
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return batch
+
+    def _dead_letter(self, submissions, error):
+        """Append submissions that could not be written to the dead-letter file, one JSON object per line."""
+        self.dead_lettered += len(submissions)
+        logger.error("dead-lettering %d submissions to %s: %r", len(submissions), self.dead_letter_path, error)
+        try:
+            if os.path.dirname(self.dead_letter_path):
+                os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, 'a') as file:
+                for s in submissions:
+                    file.write(json.dumps({
+                        "quiz_id": s.quiz_id, "session_id": s.session_id, "score": s.score, "total": s.total,
+                        "answers": bytes(s.answers).hex() if isinstance(s.answers, (bytes, bytearray, memoryview))
+                        else s.answers,
+                        "submitted_at": s.submitted_at, "error": repr(error),
+                    }, default=str) + "\n")
+        except OSError:
+            logger.exception("writing the submission dead-letter file failed; %d submissions lost", len(submissions))
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            batch = [item for item in items if isinstance(item, Submission)]
+            if batch:
+                self._write(batch)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if items[-1] is self._stopping:
+                return
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure_submission_store(backend):
+    """Replace the process-wide writer with one using backend (call before first use)."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = SubmissionWriter(backend)
+    return _writer
+
+
+def get_submission_writer():
+    """Return the process-wide SubmissionWriter, backed by SQLite by default."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SubmissionWriter(SQLiteSubmissionBackend())
+                atexit.register(_writer.flush, 5.0)
+    return _writer
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Caches, databases and snapshots are placed at import time; keep them out of the checkout
+os.environ["QUIZMASTER_CACHE_DIR"] = tempfile.mkdtemp(prefix="quizmaster-tests-")
+os.environ.setdefault("QUIZMASTER_PREWARM_BUDGET", "0")
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """Run from the repository root, where the app finds the shipped Quiz tree."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture
+def write_quiz(tmp_path):
+    """Write a quiz dict to <tmp>/Quiz/<topic>/<level>/<name> and return its path."""
+    import json
+
+    def write(quiz, topic="Topic", level="Level", name="quiz.json"):
+        path = tmp_path / "Quiz" / topic / level / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(quiz))
+        return str(path)
+    return write
@@ -0,0 +1,48 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+from adaptive_testing import get_adaptive_engine
+from submission_store import DEFAULT_DB_PATH, SQLiteSubmissionBackend, get_submission_writer
+
+
+def _answer_current_question(at):
+    # First option everywhere: right for some questions of Python/Basics, wrong for others
+    if at.main.radio:
+        at.main.radio[0].set_value(at.main.radio[0].options[0]).run()
+    else:
+        at.main.checkbox[0].check().run()
+
+
+def test_topic_running_out_keeps_the_answer_store(repo_root):
+    engine = get_adaptive_engine()
+    attempt = engine.start("Python/Basics/adaptive-test", "Python", "Basics", 7, 10)
+    while not attempt.finished:
+        engine.answer(attempt, 1)
+    assert attempt.exhausted
+    assert attempt.length == 10  # the planned size the answer store was created with
+    assert len(attempt.outcomes) == len(attempt.items) == 5
+
+
+def test_stored_score_matches_the_page(repo_root):
+    at = AppTest.from_file(os.path.join(repo_root, "streamlit_app.py"), default_timeout=30).run()
+    at.sidebar.selectbox[0].select("Python").run()
+    at.sidebar.selectbox[1].select("Basics").run()
+    at.sidebar.radio[0].set_value("Adaptive test").run()
+    session_id = at.session_state.session_id
+    for _ in range(10):
+        if at.metric:
+            break
+        _answer_current_question(at)
+        [button for button in at.main.button if button.label == "Next"][0].click().run()
+    assert not at.exception
+    shown, max_score = at.metric[0].value.split(" / ")
+    assert int(max_score) == 5
+
+    get_submission_writer().flush(5.0)
+    stored = [s for s in SQLiteSubmissionBackend(DEFAULT_DB_PATH).iter_submissions()
+              if s.session_id == session_id]
+    assert len(stored) == 1
+    assert stored[0].score == float(shown) and stored[0].total == 5
+    assert stored[0].score > 0
+    assert len(stored[0].answers) == 8 * 5  # the questions asked, not the planned 10
@@ -0,0 +1,28 @@
+import pytest
+
+from answer_key import answers_to_mask, compile_answer_key
+
+
+def _mcq(answers, options=8, **rule):
+    return dict({"type": "MCQ", "question": "q", "options": [f"o{j}" for j in range(1, options + 1)],
+                 "answers": answers}, **rule)
+
+
+@pytest.mark.parametrize("points", [0.25, 0.5, 0.33, 1.5])
+@pytest.mark.parametrize("count", range(1, 9))
+def test_fully_correct_partial_credit_scores_full_points(count, points):
+    answers = list(range(1, count + 1))
+    answer_key = compile_answer_key({"questions": [_mcq(answers, points=points, partial_credit=True)]})
+    assert answer_key.score([answers_to_mask(answers)]) == points
+    assert answer_key.max_score == points
+
+
+def test_partial_credit_shares_stay_exact_across_questions():
+    quiz = {"questions": [
+        _mcq([1, 2, 3], points=1, partial_credit=True),
+        _mcq([1, 2, 3, 4], points=0.5, partial_credit=True),
+        {"type": "SCQ", "question": "q", "options": ["a", "b"], "answer": 1},
+    ]}
+    answer_key = compile_answer_key(quiz)
+    assert answer_key.score([answers_to_mask([1, 2, 3]), answers_to_mask([1, 2, 3, 4]), 1]) == 2.5
+    assert answer_key.score([answers_to_mask([1]), answers_to_mask([1, 2]), 0]) == 0.58
@@ -0,0 +1,36 @@
+import pickle
+
+from answer_store import AnswerStore
+
+
+def test_bytes_round_trip_keeps_every_answer():
+    store = AnswerStore("t/l/q.json", 4)
+    store.set_choice(0, 3)
+    store.set_selected(2, 0, True)
+    store.set_selected(2, 63, True)  # the highest option bit survives too
+    data = store.to_bytes()
+    assert len(data) == 8 * 4
+
+    restored = AnswerStore.from_bytes("t/l/q.json", data)
+    assert restored.quiz_id == "t/l/q.json" and len(restored) == 4
+    assert list(restored.responses()) == [3, 0, 1 | 1 << 63, 0]
+    assert restored.take_changes() == []  # a restored attempt has nothing unsaved
+    assert pickle.loads(pickle.dumps(store)).to_bytes() == data
+
+
+def test_answers_from_a_different_length_are_not_misread():
+    old = AnswerStore("t/l/q.json", 3)
+    for i in range(3):
+        old.set_choice(i, i + 1)
+
+    # The quiz lost a question: the stored bytes describe three answers, not two
+    assert len(AnswerStore.from_bytes("t/l/q.json", old.to_bytes())) == 3
+    assert old.head(2).to_bytes() == old.to_bytes()[:16]
+
+    # Saved answers beyond a shorter quiz are dropped instead of raising
+    shorter = AnswerStore("t/l/q.json", 2)
+    shorter.update(dict(enumerate(old.responses())))
+    assert list(shorter.responses()) == [1, 2]
+    longer = AnswerStore("t/l/q.json", 5)
+    longer.update(dict(enumerate(old.responses())))
+    assert list(longer.responses()) == [1, 2, 3, 0, 0]
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from asset_cache import AssetCache, AssetError
+
+
+def write(tmp_path, relative_path, data):
+    path = tmp_path / "Quiz" / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    write(tmp_path, "Python/Basics/assets/loop.png", b"image bytes")
+    write(tmp_path, "Django/Basics/assets/copy.png", b"image bytes")
+    cache = AssetCache(str(tmp_path / "Quiz"))
+    first = cache.get("Python/Basics/assets/loop.png")
+    second = cache.get("Django/Basics/assets/copy.png")
+    assert first is second
+    assert first.mime_type == "image/png" and first.etag.strip('"') == first.digest
+    assert cache.stats()["assets"] == 1 and cache.stats()["bytes"] == len(b"image bytes")
+
+    assert cache.get("Python/Basics/assets/loop.png") is first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_changed_files_get_a_new_digest(tmp_path):
+    path = write(tmp_path, "Python/Basics/assets/loop.py", b"for i in range(3): pass\n")
+    cache = AssetCache(str(tmp_path / "Quiz"))
+    before = cache.get("Python/Basics/assets/loop.py")
+    path.write_bytes(b"while True: break\n")
+    os.utime(path, ns=(1, 1))  # a different mtime even on coarse clocks
+    after = cache.get("Python/Basics/assets/loop.py")
+    assert after.digest != before.digest and after.text() == "while True: break\n"
+
+
+def test_least_recently_used_content_is_evicted(tmp_path):
+    for name in ("a", "b", "c"):
+        write(tmp_path, f"T/L/assets/{name}.txt", name.encode() * 10)
+    cache = AssetCache(str(tmp_path / "Quiz"), max_bytes=25)
+    cache.get("T/L/assets/a.txt")
+    cache.get("T/L/assets/b.txt")
+    cache.get("T/L/assets/a.txt")  # b is now the least recently used
+    cache.get("T/L/assets/c.txt")
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 20
+    misses = cache.stats()["misses"]
+    cache.get("T/L/assets/a.txt")
+    assert cache.stats()["misses"] == misses
+    cache.get("T/L/assets/b.txt")
+    assert cache.stats()["misses"] == misses + 1
+
+
+def test_paths_outside_the_tree_are_refused(tmp_path):
+    write(tmp_path, "T/L/assets/a.txt", b"a")
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    cache = AssetCache(str(tmp_path / "Quiz"))
+    for path in ("../secret.txt", str(tmp_path / "secret.txt"), "T/L/assets/missing.txt"):
+        with pytest.raises(AssetError):
+            cache.get(path)
@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+import batch_grading
+from answer_key import compile_answer_key
+
+OPTIONS = ["a", "b", "c", "d", "e"]
+
+QUIZZES = {
+    "default": {"questions": [
+        {"type": "SCQ", "question": "1", "options": OPTIONS, "answer": 3},
+        {"type": "MCQ", "question": "2", "options": OPTIONS, "answers": [1, 4]},
+    ]},
+    "negative marking": {"scoring": {"penalty": 0.25}, "questions": [
+        {"type": "SCQ", "question": "1", "options": OPTIONS, "answer": 2},
+        {"type": "MCQ", "question": "2", "options": OPTIONS, "answers": [2, 3, 5], "points": 1.5},
+        {"type": "SCQ", "question": "3", "options": OPTIONS[:3], "answer": 1, "min_points": 0},
+    ]},
+    "partial credit": {"questions": [
+        {"type": "MCQ", "question": "1", "options": OPTIONS, "answers": [1, 2, 3], "partial_credit": True},
+        {"type": "MCQ", "question": "2", "options": OPTIONS, "answers": [5], "partial_credit": True,
+         "penalty": 0.5, "min_points": -0.5},
+        {"type": "MCQ", "question": "3", "options": OPTIONS, "answers": [2, 4], "partial_credit": True,
+         "points": 0.33, "penalty": 0.1},
+        {"type": "SCQ", "question": "4", "options": OPTIONS, "answer": 4, "points": 2},
+    ]},
+    "unknown question type": {"questions": [
+        {"type": "TEXT", "question": "1"},
+        {"type": "SCQ", "question": "2", "options": OPTIONS, "answer": 1},
+    ]},
+}
+
+
+def random_rows(answer_key, count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        row = []
+        for question in answer_key.questions:
+            if question.kind == "MCQ":
+                row.append(rng.choice([0, question.correct, rng.getrandbits(question.n_options + 1)]))
+            else:
+                row.append(rng.choice([0, question.correct or 0, rng.randrange(question.n_options + 3)]))
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("name", sorted(QUIZZES))
+def test_batch_scores_match_the_interactive_answer_key(name):
+    answer_key = compile_answer_key(QUIZZES[name])
+    rows = random_rows(answer_key, 300, seed=len(name))
+    encoded = batch_grading.encode_rows(answer_key, list(range(len(rows))), rows)
+    units = batch_grading.score_units(answer_key, encoded)
+    assert units.tolist() == [answer_key.score_units(row) for row in rows]
+    report = batch_grading.grade(answer_key, encoded)
+    assert report.total == answer_key.max_score
+    # Rounded to 1/100 point the same way too, halves included
+    scores = np.asarray(report.scores).tolist()
+    expected = [answer_key.score(row) for row in rows]
+    assert scores == expected
+    assert [type(score) for score in scores] == [type(score) for score in expected]  # 3, not 3.0
+
+
+def test_stored_answer_formats_encode_like_the_widgets():
+    answer_key = compile_answer_key(QUIZZES["negative marking"])
+    submissions = [
+        {"id": "numbers", "answers": [2, [2, 3, 5], 1]},
+        {"id": "texts", "answers": ["b", ["b", "c", "e"], "a"]},
+        {"id": "widgets", "answers": {"question_1": "b", "question_2_option_1": True, "question_2_option_2": True,
+                                      "question_2_option_4": True, "question_3": "a"}},
+        {"id": "short", "answers": ["c"]},
+    ]
+    report = batch_grading.grade(answer_key, batch_grading.encode_submissions(answer_key, submissions))
+    assert list(report.scores) == [3.5, 3.5, 3.5, -0.25]
+
+
+def test_encoded_submissions_keep_their_id_types(tmp_path):
+    answer_key = compile_answer_key(QUIZZES["default"])
+    submissions = [{"id": 7, "answers": [3, [1, 4]]}, {"id": "s-8", "answers": [1, []]}, {"answers": [3, [1]]}]
+    encoded = batch_grading.encode_submissions(answer_key, submissions)
+    path = str(tmp_path / "encoded.npz")
+    batch_grading.save_encoded(path, encoded)
+    loaded = batch_grading.load_encoded(path)
+    assert loaded.ids == [7, "s-8", 2]
+    assert loaded.scq.tolist() == encoded.scq.tolist() and loaded.mcq.tolist() == encoded.mcq.tolist()
@@ -0,0 +1,43 @@
+import threading
+
+from answer_key import compile_answer_key
+from grading_pool import BUSY, DONE, FAILED, GradingPool
+
+QUIZ = {"questions": [{"type": "SCQ", "question": "q", "options": ["a", "b"], "answer": 1}] * 60}
+
+
+def test_small_keys_are_graded_inline():
+    pool = GradingPool(workers=1, inline_below=100)
+    stored = []
+    job = pool.submit(compile_answer_key(QUIZ), [1] * 60, on_done=stored.append)
+    assert job.status == DONE and job.via == "inline" and job.score == 60
+    assert stored == [job]
+
+
+def test_full_pool_turns_jobs_away_instead_of_grading_inline():
+    pool = GradingPool(workers=1, max_pending=1, inline_below=0, timeout=60)
+    stored = []
+    done = threading.Event()
+    try:
+        answer_key = compile_answer_key(QUIZ)
+        first = pool.submit(answer_key, [1] * 60, on_done=lambda job: (stored.append(job), done.set()))
+        second = pool.submit(answer_key, [1] * 30 + [0] * 30, on_done=stored.append)
+        assert second.status == BUSY and second.failed and second.score is None
+        assert done.wait(60) and pool.result(first) == 60 and first.via == "pool"
+        assert stored == [first]
+        assert pool.stats()["busy"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_timed_out_job_fails_without_a_score():
+    pool = GradingPool(workers=1, inline_below=0, timeout=0.0)
+    stored = []
+    try:
+        job = pool.submit(compile_answer_key(QUIZ), [1] * 60, on_done=stored.append)
+        assert pool.poll(job)
+        assert job.status == FAILED and job.via == "timeout" and job.score is None
+        assert pool.result(job) is None
+        assert stored == []
+    finally:
+        pool.shutdown()
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from answer_key import compile_answer_key
+from item_analysis import ItemAnalysis
+from submission_store import Submission, SubmissionBackend
+
+QUIZ = {
+    "scoring": {"penalty": 0.25},
+    "questions": [
+        {"type": "SCQ", "question": "a", "options": ["x", "y", "z"], "answer": 2},
+        {"type": "MCQ", "question": "b", "options": ["p", "q", "r"], "answers": [1, 3],
+         "partial_credit": True, "points": 2},
+        {"type": "SCQ", "question": "c", "options": ["x", "y"], "answer": 1, "min_points": 0},
+    ],
+}
+RESPONSES = [(2, 0b101, 1), (1, 0b001, 2), (0, 0b010, 1), (3, 0b111, 0), (2, 0b100, 2)]
+
+
+def submissions(answer_key):
+    return [
+        Submission("t/l/q.json", f"s{n}", 0, answer_key.total,
+                   b"".join(value.to_bytes(8, "little") for value in row), submitted_at=float(n))
+        for n, row in enumerate(RESPONSES)
+    ]
+
+
+class SlowBackend(SubmissionBackend):
+    def __init__(self, rows):
+        self.rows = rows
+        self.reading = threading.Event()
+        self.release = threading.Event()
+        self.reads = 0
+
+    def iter_submissions(self, quiz_id=None):
+        self.reads += 1
+        self.reading.set()
+        self.release.wait(5)
+        return iter(self.rows)
+
+
+def test_scores_follow_the_scoring_rules():
+    answer_key = compile_answer_key(QUIZ)
+    backend = SlowBackend(submissions(answer_key))
+    backend.release.set()
+    report = ItemAnalysis(backend).report("t/l/q.json", answer_key)
+    scores = [answer_key.score(row) for row in RESPONSES]
+    assert report["mean_score"] == pytest.approx(sum(scores) / len(scores))
+    expected = {}
+    for score in scores:
+        expected[score] = expected.get(score, 0) + 1
+    assert {d["score"]: d["submissions"] for d in report["score_distribution"]} == expected
+
+
+def test_overlapping_backfills_share_one_read():
+    answer_key = compile_answer_key(QUIZ)
+    backend = SlowBackend(submissions(answer_key))
+    engine = ItemAnalysis(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.backfill("t/l/q.json", answer_key)))
+               for _ in range(2)]
+    threads[0].start()
+    assert backend.reading.wait(5)
+    threads[1].start()
+    engine.on_batch([Submission("t/l/q.json", "late", 0, answer_key.total, bytes(8 * answer_key.total), 99.0)])
+    backend.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert backend.reads == 1
+    assert len(results) == 2 and results[0] is results[1]
+    assert results[0].submissions == len(RESPONSES) + 1
+    assert engine.aggregate("t/l/q.json", answer_key) is results[0]
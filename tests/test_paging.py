@@ -0,0 +1,40 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+PAGED = {"title": "Paged", "question_display": "page", "page_size": 2, "questions": [
+    {"type": "SCQ", "question": f"Question {n}", "options": ["a", "b", "c"], "answer": 1} for n in range(1, 6)
+]}
+
+
+def _click(at, label):
+    [button for button in at.main.button if button.label == label][0].click().run()
+
+
+def _shown(at):
+    return [radio.label for radio in at.main.radio]
+
+
+def test_page_mode_shows_page_size_questions_per_page(repo_root, tmp_path, write_quiz, monkeypatch):
+    write_quiz(PAGED)
+    monkeypatch.chdir(tmp_path)
+    at = AppTest.from_file(os.path.join(repo_root, "streamlit_app.py"), default_timeout=30).run()
+    at.sidebar.selectbox[0].select("Topic").run()
+    at.sidebar.selectbox[1].select("Level").run()
+    at.sidebar.selectbox[2].select("quiz.json").run()
+    assert not at.exception
+    assert _shown(at) == ["Question 1", "Question 2"]
+    at.main.radio[1].set_value("b").run()
+
+    _click(at, "Next")
+    assert _shown(at) == ["Question 3", "Question 4"]
+    assert "4 / 5" in [markdown.value for markdown in at.main.markdown]
+    _click(at, "Next")
+    assert _shown(at) == ["Question 5"]
+    assert "Next" not in [button.label for button in at.main.button]
+
+    _click(at, "Previous")
+    _click(at, "Previous")
+    assert _shown(at) == ["Question 1", "Question 2"]
+    assert at.main.radio[1].value == "b"  # answers survive paging
+    assert at.session_state.answer_store.choice(1) == 2
@@ -0,0 +1,69 @@
+import random
+
+from answer_key import compile_answer_key
+from question_sampling import MAX_REJECTIONS, SampleIndex, TypeGroup, build_level_index
+from quiz_cache import get_quiz_cache
+
+
+def test_level_index_build_leaves_the_quiz_cache_alone(tmp_path, write_quiz):
+    paths = [write_quiz({"title": f"Quiz {n}", "questions": [
+        {"type": "SCQ", "question": f"q{n}", "options": ["a", "b"], "answer": 1, "weight": n + 1},
+        {"type": "MCQ", "question": f"m{n}", "options": ["a", "b"], "answers": [1, 2]},
+    ]}, name=f"quiz{n}.json") for n in range(3)]
+    index = build_level_index(str(tmp_path / "Quiz"), "Topic", "Level")
+    assert len(index.groups["SCQ"]) == len(index.groups["MCQ"]) == 3
+    assert all(get_quiz_cache().peek(path) is None for path in paths)
+
+
+def test_weighted_draws_are_distinct_on_both_paths():
+    group = TypeGroup()
+    for i in range(10):
+        group.file_ids.append(0)
+        group.question_nos.append(i)
+        group.weights.append(float(i + 1))
+    group.finish()
+    for count in (3, 8):  # alias-table rejection, then the keyed fallback
+        picked = group.draw(random.Random(count), count)
+        assert len(picked) == len(set(picked)) == count
+
+
+def test_random_exam_scores_like_its_source_quiz(tmp_path, write_quiz):
+    quiz = {"title": "Scored", "scoring": {"partial_credit": True, "points": 2, "penalty": 0.5}, "questions": [
+        {"type": "MCQ", "question": "m1", "options": ["a", "b", "c"], "answers": [1, 3]},
+        {"type": "MCQ", "question": "m2", "options": ["a", "b", "c"], "answers": [2], "points": 1},
+        {"type": "SCQ", "question": "s1", "options": ["a", "b"], "answer": 2},
+    ]}
+    write_quiz(quiz)
+    exam = SampleIndex(str(tmp_path / "Quiz"), cache_dir=str(tmp_path / "cache")).draw(
+        "Topic", "Level", {"MCQ": 2, "SCQ": 1}, seed=3)
+    source_key = compile_answer_key(quiz)
+    exam_key = compile_answer_key(exam)
+    assert exam_key.max_score == source_key.max_score
+    by_question = {q["question"]: i for i, q in enumerate(quiz["questions"])}
+    order = [by_question[q["question"]] for q in exam["questions"]]
+    rng = random.Random(0)
+    for _ in range(50):
+        row = [rng.getrandbits(3) if q["type"] == "MCQ" else rng.randrange(3) for q in quiz["questions"]]
+        assert exam_key.score([row[i] for i in order]) == source_key.score(row)
+
+
+class CountingRandom(random.Random):
+    calls = 0
+
+    def randrange(self, *args):
+        self.calls += 1
+        return super().randrange(*args)
+
+
+def test_a_dominant_weight_does_not_stall_the_draw():
+    group = TypeGroup()
+    for i in range(1000):
+        group.file_ids.append(0)
+        group.question_nos.append(i)
+        group.weights.append(1e9 if i < 3 else 1.0)
+    group.finish()
+    rng = CountingRandom(1)
+    picked = group.draw(rng, 10)
+    assert len(picked) == len(set(picked)) == 10
+    assert {0, 1, 2} <= set(picked)
+    assert rng.calls <= 10 + MAX_REJECTIONS + 1
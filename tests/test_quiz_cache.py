@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from quiz_cache import QuizCache, freeze, thaw
+
+
+def test_failed_load_releases_its_loading_entry(tmp_path):
+    path = tmp_path / "quiz.json"
+    path.write_text("{not json")
+    cache = QuizCache()
+
+    def failing(p):
+        raise ValueError("malformed")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            cache.get(str(path), failing)
+    assert not cache._loading
+    path.write_text('{"title": "ok"}')
+    assert cache.get(str(path))["title"] == "ok"
+    assert not cache._loading
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.json"
+        path.write_text('{"title": "%s"}' % (name * 20))
+        paths.append(str(path))
+    size = os.path.getsize(paths[0])
+    cache = QuizCache(max_bytes=2 * size)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # b is now the least recently used
+    cache.get(paths[2])
+    assert cache.peek(paths[1]) is None
+    assert cache.peek(paths[0]) is not None and cache.peek(paths[2]) is not None
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "entries": 2, "bytes": 2 * size}
+
+
+def test_changed_files_are_reloaded(tmp_path):
+    path = tmp_path / "quiz.json"
+    path.write_text('{"title": "one"}')
+    cache = QuizCache()
+    assert cache.get(str(path))["title"] == "one"
+    path.write_text('{"title": "two!"}')
+    assert cache.get(str(path))["title"] == "two!"
+    assert cache.get(str(path))["title"] == "two!"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_cached_quizzes_are_read_only():
+    quiz = freeze({"title": "t", "questions": [{"options": ["a"]}]})
+    with pytest.raises(TypeError):
+        quiz["title"] = "changed"
+    with pytest.raises(TypeError):
+        quiz["questions"][0].update(options=[])
+    with pytest.raises(TypeError):
+        del quiz["title"]
+    assert isinstance(quiz["questions"], tuple)
+    private = thaw(quiz)
+    private["questions"][0]["options"].append("b")
+    assert quiz["questions"][0]["options"] == ("a",)
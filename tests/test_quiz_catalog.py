@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from quiz_catalog import QuizCatalog
+
+
+def test_listings_are_rechecked_only_after_the_interval(tmp_path, write_quiz):
+    write_quiz({"questions": []}, name="first.json")
+    catalog = QuizCatalog(str(tmp_path / "Quiz"), check_interval=3600)
+    assert catalog.quizzes("Topic", "Level") == ["first.json"]
+    write_quiz({"questions": []}, name="second.json")
+    assert catalog.quizzes("Topic", "Level") == ["first.json"]  # served from memory
+    scans = catalog.scans
+
+    catalog.check_interval = 0.0
+    assert sorted(catalog.quizzes("Topic", "Level")) == ["first.json", "second.json"]
+    assert catalog.scans == scans + 1
+    catalog.quizzes("Topic", "Level")
+    assert catalog.scans == scans + 1  # unchanged mtime: a stat, no rescan
+
+
+def test_deleted_files_and_directories_are_dropped(tmp_path, write_quiz):
+    keep = write_quiz({"questions": []}, name="keep.json")
+    gone = write_quiz({"questions": []}, name="gone.json")
+    write_quiz({"questions": []}, topic="Other", name="only.json")
+    catalog = QuizCatalog(str(tmp_path / "Quiz"), check_interval=0.0)
+    assert sorted(catalog.topics()) == ["Other", "Topic"]
+    assert sorted(catalog.quizzes("Topic", "Level")) == ["gone.json", "keep.json"]
+    assert catalog.quizzes("Other", "Level") == ["only.json"]
+
+    os.remove(gone)
+    assert catalog.quizzes("Topic", "Level") == [os.path.basename(keep)]
+    os.remove(tmp_path / "Quiz" / "Other" / "Level" / "only.json")
+    os.rmdir(tmp_path / "Quiz" / "Other" / "Level")
+    os.rmdir(tmp_path / "Quiz" / "Other")
+    assert catalog.topics() == ["Topic"]
+    with pytest.raises(FileNotFoundError):
+        catalog.quizzes("Other", "Level")
+    assert ("Other", "Level") not in catalog.snapshot()
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from answer_key import compile_answer_key
+from quiz_compiler import QuizSchemaError, compile_quiz_file
+
+
+def scq(**fields):
+    return {"type": "SCQ", "question": "Pick one", "options": ["a", "b", "c"], "answer": 2, **fields}
+
+
+def mcq(**fields):
+    return {"type": "MCQ", "question": "Pick some", "options": ["a", "b", "c"], "answers": [1, 3], **fields}
+
+
+def valid(**fields):
+    return {"title": "Quiz", "questions": [scq(), mcq()], **fields}
+
+
+MALFORMED = {
+    "no title": ({"questions": [scq()]}, "title"),
+    "questions not a list": (valid(questions={"q": scq()}), "questions"),
+    "bad timed": (valid(timed="soon"), "timed"),
+    "bad question_display": (valid(question_display="some"), "question_display"),
+    "unknown type": (valid(questions=[scq(type="TEXT")]), "questions[1].type"),
+    "missing question text": (valid(questions=[scq(question=None)]), "questions[1].question"),
+    "no options": (valid(questions=[scq(options=[])]), "questions[1].options"),
+    "non-string option": (valid(questions=[scq(options=["a", 2])]), "questions[1].options"),
+    "too many options": (valid(questions=[scq(options=[str(i) for i in range(65)])]), "questions[1].options"),
+    "SCQ answer out of range": (valid(questions=[scq(answer=4)]), "questions[1].answer"),
+    "SCQ answer not a number": (valid(questions=[scq(answer="b")]), "questions[1].answer"),
+    "MCQ answers empty": (valid(questions=[mcq(answers=[])]), "questions[1].answers"),
+    "MCQ duplicate answers": (valid(questions=[mcq(answers=[1, 1])]), "questions[1].answers"),
+    "negative weight": (valid(questions=[scq(weight=-1)]), "questions[1].weight"),
+}
+
+
+def write(tmp_path, content):
+    path = tmp_path / "quiz.json"
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    return str(path)
+
+
+@pytest.mark.parametrize("case", sorted(MALFORMED))
+def test_malformed_quizzes_are_rejected(tmp_path, case):
+    quiz, field = MALFORMED[case]
+    with pytest.raises(QuizSchemaError) as error:
+        compile_quiz_file(write(tmp_path, quiz))
+    assert any(problem.startswith(field) for problem in error.value.problems), error.value.problems
+
+
+def test_invalid_json_is_rejected(tmp_path):
+    with pytest.raises(QuizSchemaError, match="invalid JSON"):
+        compile_quiz_file(write(tmp_path, '{"title": "Quiz", "questions": ['))
+
+
+def test_every_problem_is_reported_at_once(tmp_path):
+    quiz = {"questions": [scq(answer=9), mcq(answers=[7])]}
+    with pytest.raises(QuizSchemaError) as error:
+        compile_quiz_file(write(tmp_path, quiz))
+    assert len(error.value.problems) == 3
+
+
+def test_valid_quiz_compiles_with_its_answer_key(tmp_path):
+    quiz = valid(scoring={"penalty": 0.5})
+    compiled = compile_quiz_file(write(tmp_path, quiz))
+    assert compiled.quiz["title"] == "Quiz"
+    expected = compile_answer_key(quiz)
+    responses = [2, 0b101]
+    assert compiled.answer_key.score(responses) == expected.score(responses) == 2
+    assert compiled.answer_key.score([1, 0b001]) == expected.score([1, 0b001]) == -1
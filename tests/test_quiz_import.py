@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import zipfile
+
+from question_bank import write_question_bank
+from quiz_import import export_jsonl, import_quizzes
+
+
+def quiz(title):
+    return {"title": title, "questions": [
+        {"type": "SCQ", "question": "Pick one", "options": ["a", "b"], "answer": 1}]}
+
+
+def write_jsonl(path, *records):
+    with open(path, 'w') as file:
+        for name, q in records:
+            file.write(json.dumps({"topic": "Topic", "level": "Level", "name": name, "quiz": q}) + "\n")
+    return str(path)
+
+
+def test_overwrite_forgets_the_replaced_digest(tmp_path):
+    base_path, cache_dir = str(tmp_path / "Quiz"), str(tmp_path / "cache")
+    first = write_jsonl(tmp_path / "v1.jsonl", ("quiz.json", quiz("Version 1")))
+    assert len(import_quizzes(first, base_path, cache_dir).imported) == 1
+
+    # Version 1 moves to other.json in the same drop that overwrites quiz.json;
+    # it must not count as a duplicate of quiz.json, which no longer holds it
+    drop = write_jsonl(tmp_path / "drop.jsonl", ("quiz.json", quiz("Version 2")), ("other.json", quiz("Version 1")))
+    report = import_quizzes(drop, base_path, cache_dir, overwrite=True)
+    assert not report.duplicates
+    assert len(report.replaced) == 1 and len(report.imported) == 2
+    with open(tmp_path / "Quiz" / "Topic" / "Level" / "other.json") as file:
+        assert json.load(file)["title"] == "Version 1"
+
+
+def export_text(base_path):
+    out = io.StringIO()
+    export_jsonl(base_path, out)
+    return out.getvalue()
+
+
+def test_export_import_round_trip(tmp_path, write_quiz):
+    write_quiz(quiz("Loops"), topic="Python", level="Basics", name="loops.json")
+    write_quiz(quiz("Models"), topic="Django", level="Basics", name="models.json")
+    bank = {"title": "Bank", "timed": 60, "questions": quiz("Bank")["questions"] * 3}
+    write_question_bank(bank, str(tmp_path / "Quiz" / "Python" / "Basics" / "bank.jsonl"))
+    exported = export_text(str(tmp_path / "Quiz"))
+    assert len(exported.splitlines()) == 3
+    source = tmp_path / "export.jsonl"
+    source.write_text(exported)
+
+    target, cache_dir = str(tmp_path / "Copy"), str(tmp_path / "cache")
+    report = import_quizzes(str(source), target, cache_dir)
+    assert len(report.imported) == 3 and not report.errors
+    assert sorted(export_text(target).splitlines()) == sorted(exported.splitlines())
+
+    # Importing the same drop again finds every quiz already in the tree
+    report = import_quizzes(str(source), target, cache_dir)
+    assert not report.imported and len(report.duplicates) == 3
+
+
+def test_duplicates_are_detected_by_content(tmp_path):
+    base_path, cache_dir = str(tmp_path / "Quiz"), str(tmp_path / "cache")
+    archive = tmp_path / "drop.zip"
+    reordered = json.loads(json.dumps(quiz("Loops"), sort_keys=True))
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr("Python/Basics/loops.json", json.dumps(quiz("Loops")))
+        zf.writestr("Python/Basics/loops_copy.json", json.dumps(reordered, indent=2))
+        zf.writestr("Python/Basics/other.json", json.dumps(quiz("Other")))
+    report = import_quizzes(str(archive), base_path, cache_dir)
+    assert sorted(os.path.basename(path) for path in report.imported) == ["loops.json", "other.json"]
+    [(source, kept)] = report.duplicates.items()
+    assert source.endswith("loops_copy.json") and kept.endswith("loops.json")
+
+    # A different quiz at an existing path is refused without --overwrite
+    drop = write_jsonl(tmp_path / "drop.jsonl", ("quiz.json", quiz("New")))
+    import_quizzes(drop, base_path, cache_dir)
+    changed = write_jsonl(tmp_path / "changed.jsonl", ("quiz.json", quiz("Changed")))
+    report = import_quizzes(changed, base_path, cache_dir)
+    assert not report.imported and len(report.errors) == 1
+
+
+def test_unreadable_sources_are_reported(tmp_path):
+    base_path, cache_dir = str(tmp_path / "Quiz"), str(tmp_path / "cache")
+    report = import_quizzes(str(tmp_path / "missing.zip"), base_path, cache_dir)
+    assert list(report.errors) == [str(tmp_path / "missing.zip")]
+    bad_csv = tmp_path / "bad.csv"
+    bad_csv.write_text("topic,level\nPython,Basics\n")
+    report = import_quizzes(str(bad_csv), base_path, cache_dir)
+    assert "missing CSV columns" in report.errors[str(bad_csv)][0]
+
+
+def test_assets_wait_for_their_level_and_do_not_clobber(tmp_path):
+    base_path, cache_dir = str(tmp_path / "Quiz"), str(tmp_path / "cache")
+    archive = tmp_path / "drop.zip"
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr("Python/Basics/assets/loop.png", b"new image")
+        zf.writestr("Python/Basics/loops.json", json.dumps(quiz("Loops")))
+        zf.writestr("Django/Basics/assets/model.png", b"model")
+        zf.writestr("Django/Basics/broken.json", json.dumps({"title": "Broken"}))
+    existing = tmp_path / "Quiz" / "Python" / "Basics" / "assets" / "loop.png"
+    existing.parent.mkdir(parents=True)
+    existing.write_bytes(b"old image")
+
+    report = import_quizzes(str(archive), base_path, cache_dir)
+    assert existing.read_bytes() == b"old image"
+    assert not (tmp_path / "Quiz" / "Django" / "Basics" / "assets" / "model.png").exists()
+    assert not report.assets and len(report.imported) == 1
+    assert sorted(name.rsplit(":", 1)[1] for name in report.errors) == [
+        "Django/Basics/assets/model.png", "Django/Basics/broken.json", "Python/Basics/assets/loop.png"]
+
+    report = import_quizzes(str(archive), base_path, cache_dir, overwrite=True)
+    assert existing.read_bytes() == b"new image"
+    assert report.assets == [str(existing)]
@@ -0,0 +1,93 @@
+import time
+
+from quiz_metrics import SamplingProfiler, profiling_enabled, stage_histogram
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def read_counts(path):
+    with open(path) as file:
+        return {stack: int(count) for stack, _, count in (line.rstrip("\n").rpartition(" ") for line in file)}
+
+
+def test_profiling_needs_the_environment_switch(monkeypatch):
+    monkeypatch.delenv("QUIZMASTER_PROFILE", raising=False)
+    assert not profiling_enabled()
+    monkeypatch.setenv("QUIZMASTER_PROFILE", "1")
+    assert profiling_enabled()
+
+
+def test_flush_merges_samples_into_the_file_and_empties_memory(tmp_path):
+    profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path), flush_interval=3600.0)
+    with profiler.profile("s1"):
+        busy(0.05)
+    [path] = profiler.flush()
+    first = sum(read_counts(path).values())
+    assert first > 0 and not profiler._stacks
+    with profiler.profile("s1"):
+        busy(0.05)
+    profiler.flush()
+    assert sum(read_counts(path).values()) > first
+    assert profiler.flush() == []
+
+
+def test_distinct_stacks_are_bounded(tmp_path):
+    profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path), flush_interval=3600.0, max_stacks=1)
+    def nested(depth):
+        if depth:
+            return nested(depth - 1)
+        busy(0.02)
+
+    with profiler.profile("s2"):
+        for depth in range(5):
+            nested(depth)
+    stacks = profiler._stacks["s2"]
+    assert len(stacks) == 2 and stacks["[other stacks]"] > 0
+
+
+class _Job:
+    job_id = "job"
+    score = 1
+    total = 1
+
+
+class _PendingPool:
+    """Keeps the submitted job unresolved until the test resolves it."""
+
+    def submit(self, answer_key, responses, on_done=None):
+        self.on_done = on_done
+        return _Job()
+
+
+def test_grade_stage_runs_from_submit_to_score(monkeypatch):
+    import streamlit_app
+    from answer_store import AnswerStore
+
+    pool = _PendingPool()
+    stored = []
+    monkeypatch.setattr(streamlit_app, "get_grading_pool", lambda: pool)
+    monkeypatch.setattr(streamlit_app, "get_submission_writer",
+                        lambda: type("Writer", (), {"submit": staticmethod(stored.append)})())
+    histogram = stage_histogram("grade")
+    before = histogram.snapshot()
+
+    streamlit_app.grade_attempt("s", AnswerStore("t/l/q.json", 1), lambda: None)
+    assert histogram.snapshot() == before  # queued, not graded yet
+    time.sleep(0.05)
+    pool.on_done(_Job())
+    _, total, count = histogram.snapshot()
+    assert count == before[2] + 1
+    assert total - before[1] >= 0.05
+    assert len(stored) == 1
+
+
+def test_submission_flush_latency_is_exported():
+    import streamlit_app
+
+    names = {metric for metric, *_ in streamlit_app.component_metrics()}
+    assert {"quizmaster_submission_flush_last_seconds", "quizmaster_submission_flush_max_seconds",
+            "quizmaster_submission_flush_mean_seconds"} <= names
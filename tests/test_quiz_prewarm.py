@@ -0,0 +1,65 @@
+import threading
+import time
+
+import quiz_prewarm
+from quiz_catalog import QuizCatalog, get_catalog
+
+
+def test_restore_adopts_listings_without_scanning(tmp_path, write_quiz):
+    for topic in ("A", "B", "C"):
+        write_quiz({"questions": []}, topic=topic)
+    base_path = str(tmp_path / "Quiz")
+    snapshot = QuizCatalog(base_path).build().snapshot()
+    assert len(snapshot) == 7  # root, three topics, three levels
+
+    write_quiz({"questions": []}, topic="C", name="new.json")
+    catalog = QuizCatalog(base_path)
+    assert catalog.restore(snapshot) == 7
+    assert catalog.scans == 0
+    assert catalog.quizzes("A", "Level") == ["quiz.json"]
+    assert catalog.scans == 0  # unchanged since the snapshot: one stat, no scan
+    assert sorted(catalog.quizzes("C", "Level")) == ["new.json", "quiz.json"]
+    assert catalog.scans == 1
+
+
+def test_first_get_catalog_restores_and_builds_in_the_background(tmp_path, write_quiz, monkeypatch):
+    for topic in ("A", "B"):
+        write_quiz({"questions": []}, topic=topic)
+    base_path = str(tmp_path / "Quiz")
+    snapshot = QuizCatalog(base_path).build().snapshot()
+    builds = []
+    monkeypatch.setattr(quiz_prewarm, "catalog_snapshot", lambda base_path: snapshot)
+    monkeypatch.setattr(QuizCatalog, "build_in_background", lambda self: builds.append(self))
+
+    catalog = get_catalog(base_path)
+    assert builds == [catalog]
+    assert catalog.scans == 0
+    assert catalog.topics() == snapshot[()][1]
+    assert catalog.scans == 0
+
+
+def test_prewarm_once_does_not_wait_for_the_warm_up(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow_prewarm(base_path, budget):
+        release.wait(5)
+        finished.set()
+        return quiz_prewarm.PrewarmReport(budget)
+
+    monkeypatch.setattr(quiz_prewarm, "prewarm", slow_prewarm)
+    monkeypatch.setattr(quiz_prewarm, "start_snapshot_writer", lambda base_path: None)
+    monkeypatch.setattr(quiz_prewarm, "_started", False)
+    monkeypatch.setattr(quiz_prewarm, "_report", None)
+    monkeypatch.setenv("QUIZMASTER_PREWARM_BUDGET", "5")
+
+    started = time.perf_counter()
+    assert quiz_prewarm.prewarm_once() is None
+    assert quiz_prewarm.prewarm_once() is None  # still running; not started twice
+    assert time.perf_counter() - started < 1.0
+    release.set()
+    assert finished.wait(5)
+    deadline = time.monotonic() + 5
+    while quiz_prewarm.prewarm_once() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert quiz_prewarm.prewarm_once().budget == 5.0
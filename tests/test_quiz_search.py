@@ -0,0 +1,65 @@
+import os
+import threading
+
+import pytest
+
+import quiz_search
+from quiz_catalog import get_catalog
+from quiz_search import SearchIndex
+
+
+def quiz(title, question):
+    return {"title": title, "questions": [
+        {"type": "SCQ", "question": question, "options": ["yes", "no"], "answer": 1}]}
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog(tmp_path):
+    # New files must show up at once, not after the catalog's re-stat interval
+    (tmp_path / "Quiz").mkdir()
+    get_catalog(str(tmp_path / "Quiz")).check_interval = 0.0
+
+
+def test_search_reads_the_last_snapshot_while_a_refresh_runs(tmp_path, write_quiz, monkeypatch):
+    write_quiz(quiz("Loops", "What does a for loop do?"), name="loops.json")
+    index = SearchIndex(str(tmp_path / "Quiz"), str(tmp_path / "cache"), check_interval=0.0)
+    assert index.refresh()
+    assert [r.quiz for r in index.search("loop")] == ["loops.json"]
+
+    write_quiz(quiz("Generators", "When does a generator yield?"), name="generators.json")
+    reading = threading.Event()
+    release = threading.Event()
+    read_quiz = quiz_search._read_quiz
+
+    def slow_read(path):
+        reading.set()
+        release.wait(5)
+        return read_quiz(path)
+
+    monkeypatch.setattr(quiz_search, "_read_quiz", slow_read)
+    assert index.refresh_in_background()
+    assert reading.wait(5)
+    # The refresh holds its build lock, but searching still answers from the old snapshot
+    assert index.refreshing
+    assert [r.quiz for r in index.search("loop")] == ["loops.json"]
+    assert index.search("generator") == []
+    release.set()
+    index._thread.join(5)
+    assert [r.quiz for r in index.search("generator")] == ["generators.json"]
+    assert [r.quiz for r in index.search("loop")] == ["loops.json"]
+
+
+def test_refresh_drops_removed_quizzes_and_persists(tmp_path, write_quiz):
+    path = write_quiz(quiz("Loops", "What does a for loop do?"), name="loops.json")
+    write_quiz(quiz("Loop tricks", "Why use while?"), name="tricks.json")
+    index = SearchIndex(str(tmp_path / "Quiz"), str(tmp_path / "cache"), check_interval=0.0)
+    index.refresh()
+    before = index._snapshot
+    import os
+    os.remove(path)
+    assert index.refresh()
+    assert [r.quiz for r in index.search("loop")] == ["tricks.json"]
+    # The published snapshot was not modified in place
+    assert len(before.docs) == 2 and len(before.postings["loop"]) == 2
+    reloaded = SearchIndex(str(tmp_path / "Quiz"), str(tmp_path / "cache"))
+    assert [r.quiz for r in reloaded.search("loop")] == ["tricks.json"]
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from quiz_timer import TimerScheduler, get_timer_scheduler
+
+
+def _open(at, topic, quiz):
+    at.sidebar.selectbox[0].select(topic).run()
+    at.sidebar.selectbox[1].select("Basics").run()
+    at.sidebar.selectbox[2].select(quiz).run()
+
+
+def test_deadline_survives_a_quiz_switch(repo_root):
+    at = AppTest.from_file(os.path.join(repo_root, "streamlit_app.py"), default_timeout=30).run()
+    _open(at, "Python", "Python_Quiz1.json")  # timed
+    end_time = at.session_state.end_time
+    time.sleep(0.05)
+    _open(at, "Django", "Django_Quiz1.json")  # untimed
+    _open(at, "Python", "Python_Quiz1.json")
+    assert not at.exception
+    assert at.session_state.end_time == end_time
+
+    # Reopening a submitted attempt shows its score while the scheduler holds the result...
+    [button for button in at.button if button.label == "Submit Quiz"][0].click().run()
+    assert at.metric
+    _open(at, "Django", "Django_Quiz1.json")
+    _open(at, "Python", "Python_Quiz1.json")
+    assert at.metric and at.session_state.end_time == end_time
+
+    # ...and starts a new attempt with a new clock once the result is gone
+    get_timer_scheduler().cancel((at.session_state.session_id, "Python/Basics/Python_Quiz1.json"))
+    _open(at, "Django", "Django_Quiz1.json")
+    _open(at, "Python", "Python_Quiz1.json")
+    assert not at.metric and at.session_state.end_time > end_time
+
+
+def test_expiry_runs_the_rebound_callback_once():
+    scheduler = TimerScheduler()
+    calls = []
+    done = threading.Event()
+    scheduler.schedule("attempt", time.time() + 0.2, lambda: calls.append("old"))
+    assert scheduler.rebind("attempt", lambda: (calls.append("new"), done.set()))
+    assert done.wait(5.0)
+    assert scheduler.is_expired("attempt")
+    assert not scheduler.rebind("attempt", lambda: calls.append("late"))
+    scheduler.submit("attempt")
+    assert calls == ["new"]
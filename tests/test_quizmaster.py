@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+import quizmaster
+from question_bank import QuestionBank
+from quiz_catalog import QuizCatalog
+from quiz_compiler import QuizSchemaError
+
+QUIZ = {"title": "Bank", "questions": [
+    {"type": "SCQ", "question": "Pick one", "options": ["a", "b"], "answer": 1},
+    {"type": "MCQ", "question": "Pick two", "options": ["a", "b", "c"], "answers": [1, 3]},
+]}
+
+
+def test_bank_keeps_the_source_by_default(tmp_path, write_quiz):
+    path = write_quiz(QUIZ, name="bank.json")
+    quizmaster.main(["bank", path])
+    assert os.path.exists(path) and os.path.exists(path + "l")
+    quizmaster.main(["bank", "--output-dir", str(tmp_path / "banks"), path])
+    assert os.path.exists(path)
+    assert os.path.exists(tmp_path / "banks" / "bank.jsonl")
+
+
+def test_bank_replaces_the_converted_quiz_when_asked(tmp_path, write_quiz):
+    path = write_quiz(QUIZ, name="bank.json")
+    quizmaster.main(["bank", "--replace", path])
+    assert not os.path.exists(path)
+    assert QuizCatalog(str(tmp_path / "Quiz")).quizzes("Topic", "Level") == ["bank.jsonl"]
+    assert len(quizmaster.read_quiz(path + "l")["questions"]) == 2
+
+
+def test_malformed_bank_raises_a_schema_error(tmp_path):
+    path = tmp_path / "broken.jsonl"
+    path.write_text("not json\n{}\n")
+    with pytest.raises(QuizSchemaError):
+        QuestionBank(str(path))
@@ -0,0 +1,75 @@
+import os
+import re
+
+from streamlit.testing.v1 import AppTest
+
+import autosave
+import session_store
+from session_store import cookie_session_id
+
+
+def test_resume_keeps_answers_without_autosave(repo_root, monkeypatch):
+    monkeypatch.setattr(autosave, "_autosaver", None)
+    monkeypatch.setattr(autosave, "_configured", True)
+    script = os.path.join(repo_root, "streamlit_app.py")
+    at = AppTest.from_file(script, default_timeout=30).run()
+    at.sidebar.selectbox[0].select("Django").run()
+    at.sidebar.selectbox[1].select("Basics").run()
+    at.sidebar.selectbox[2].select("Django_Quiz1.json").run()
+    at.main.radio[0].set_value(at.main.radio[0].options[1]).run()
+    assert not at.exception
+    session_id = at.session_state.session_id
+    answers = at.session_state.answer_store.to_bytes()
+    assert any(answers)
+
+    # A new browser session (or app process) opening the same link
+    resumed = AppTest.from_file(script, default_timeout=30)
+    resumed.query_params["session"] = session_id
+    resumed.run()
+    assert not resumed.exception
+    assert resumed.session_state.session_id == session_id
+    assert resumed.session_state.answer_store.to_bytes() == answers
+    assert resumed.main.radio[0].value == at.main.radio[0].options[1]
+
+
+def test_session_cookie_mode_ignores_the_url(repo_root, monkeypatch):
+    script = os.path.join(repo_root, "streamlit_app.py")
+    at = AppTest.from_file(script, default_timeout=30).run()
+    session_id = at.session_state.session_id
+    assert at.query_params["session"] == session_id
+
+    monkeypatch.setenv("QUIZMASTER_SESSION_COOKIE", "login")
+    shared = AppTest.from_file(script, default_timeout=30)
+    shared.query_params["session"] = session_id
+    shared.run()
+    assert not shared.exception
+    assert shared.session_state.session_id != session_id
+    assert "session" not in shared.query_params
+
+
+def test_cookie_session_ids_are_stable_and_well_formed():
+    assert cookie_session_id("token") == cookie_session_id("token") != cookie_session_id("other")
+    assert re.fullmatch(r"[0-9a-f]{32}", cookie_session_id("token"))
+
+
+def test_url_session_resumes_autosaved_answers_without_a_session_backend(repo_root, monkeypatch):
+    monkeypatch.setattr(session_store, "_checkpointer", None)
+    monkeypatch.setattr(session_store, "_configured", True)
+    assert autosave.get_autosaver() is not None
+    script = os.path.join(repo_root, "streamlit_app.py")
+    at = AppTest.from_file(script, default_timeout=30).run()
+    at.sidebar.selectbox[0].select("Django").run()
+    at.sidebar.selectbox[1].select("Basics").run()
+    at.sidebar.selectbox[2].select("Django_Quiz1.json").run()
+    at.main.radio[0].set_value(at.main.radio[0].options[1]).run()
+    session_id = at.session_state.session_id
+
+    resumed = AppTest.from_file(script, default_timeout=30)
+    resumed.query_params["session"] = session_id
+    resumed.run()
+    resumed.sidebar.selectbox[0].select("Django").run()
+    resumed.sidebar.selectbox[1].select("Basics").run()
+    resumed.sidebar.selectbox[2].select("Django_Quiz1.json").run()
+    assert not resumed.exception
+    assert resumed.session_state.session_id == session_id
+    assert resumed.main.radio[0].value == at.main.radio[0].options[1]
@@ -0,0 +1,93 @@
+import json
+import sqlite3
+
+from submission_store import SQLiteSubmissionBackend, Submission, SubmissionBackend, SubmissionWriter
+
+
+class FlakyBackend(SubmissionBackend):
+    """Fails the first `failures` writes, and rejects rows of quiz "bad" outright."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.rows = []
+
+    def write_batch(self, submissions):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        if any(s.quiz_id == "bad" for s in submissions):
+            raise ValueError("rejected")
+        self.rows.extend(submissions)
+
+
+def submission(quiz_id="q", n=0):
+    return Submission(quiz_id, f"s{n}", 1, 2, bytes(16), submitted_at=float(n))
+
+
+def dead_letters(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def writer_for(backend, tmp_path, **kwargs):
+    return SubmissionWriter(backend, flush_interval=0.01, retry_delay=0.001,
+                            dead_letter_path=str(tmp_path / "dead.jsonl"), **kwargs)
+
+
+def test_transient_failures_are_retried(tmp_path):
+    backend = FlakyBackend(failures=2)
+    writer = writer_for(backend, tmp_path)
+    writer.submit(submission())
+    assert writer.flush(5)
+    assert len(backend.rows) == 1 and writer.failures == 2 and writer.dead_lettered == 0
+
+
+def test_retries_are_capped_then_dead_lettered(tmp_path):
+    backend = FlakyBackend(failures=100)
+    writer = writer_for(backend, tmp_path, max_retries=3)
+    writer.submit(submission(n=7))
+    assert writer.flush(5)
+    assert writer.failures == 4 and writer.dead_lettered == 1
+    [row] = dead_letters(tmp_path / "dead.jsonl")
+    assert row["session_id"] == "s7" and bytes.fromhex(row["answers"]) == bytes(16)
+    # The writer keeps going after giving up on a batch
+    backend.failures = 0
+    writer.submit(submission(n=8))
+    assert writer.flush(5)
+    assert [s.session_id for s in backend.rows] == ["s8"]
+
+
+def test_rejected_rows_are_split_out_of_the_batch(tmp_path):
+    backend = FlakyBackend()
+    writer = writer_for(backend, tmp_path)
+    batches = []
+    writer.listeners.append(batches.append)
+    for n in range(6):
+        writer.submit(submission("bad" if n == 3 else "q", n))
+    assert writer.flush(5)
+    assert sorted(s.session_id for s in backend.rows) == ["s0", "s1", "s2", "s4", "s5"]
+    assert [row["session_id"] for row in dead_letters(tmp_path / "dead.jsonl")] == ["s3"]
+    assert sorted(s.session_id for batch in batches for s in batch) == ["s0", "s1", "s2", "s4", "s5"]
+
+
+def test_sqlite_integrity_errors_are_permanent(tmp_path):
+    backend = SQLiteSubmissionBackend(str(tmp_path / "submissions.sqlite3"))
+    writer = writer_for(backend, tmp_path)
+    writer.submit(submission(n=1))
+    writer.submit(Submission("q", None, 1, 2, bytes(16)))  # NOT NULL session_id
+    assert writer.flush(5)
+    assert [s.session_id for s in backend.iter_submissions()] == ["s1"]
+    assert writer.dead_lettered == 1
+    writer.close()
+
+
+def test_fractional_scores_are_stored_exactly(tmp_path):
+    path = str(tmp_path / "submissions.sqlite3")
+    backend = SQLiteSubmissionBackend(path)
+    backend.write_batch([Submission("q", "s1", 2.75, 3.5, bytes(16)), Submission("q", "s2", 3, 4, bytes(16))])
+    stored = [(s.score, s.total) for s in backend.iter_submissions("q")]
+    assert stored == [(2.75, 3.5), (3, 4)]
+    assert [type(score) for score, _ in stored] == [float, int]
+    columns = {row[1]: row[2] for row in sqlite3.connect(path).execute("PRAGMA table_info(submissions)")}
+    assert columns["score"] == columns["total"] == "REAL"
+    backend.close()